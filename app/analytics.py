@@ -0,0 +1,394 @@
+"""
+Market statistics computed for the analysis endpoints.
+
+The functions take the 'properties' collection as an argument so they can be used (and
+benchmarked) outside of a request.
+"""
+
+import math
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from pymongo.collection import Collection
+
+from scraper_mongodb.categories import DEFAULT_CATEGORY, category_filter
+
+
+# Numeric fields the analysis page can summarize
+MEDIAN_FIELDS = {"price", "size_m2", "price_per_m2", "number_of_rooms"}
+
+# `$median` is available from MongoDB 7.0
+MEDIAN_OPERATOR_VERSION: List[int] = [7, 0]
+
+# Client id -> whether its server supports `$median`, checked once per client
+_median_operator_support: Dict[int, bool] = {}
+
+
+def supports_median_operator(collection: Collection) -> bool:
+    """
+    Check whether the server behind `collection` supports the `$median` accumulator.
+
+    Args:
+        collection (Collection): Any collection on the server.
+
+    Returns:
+        bool: True for MongoDB 7.0 and later.
+    """
+    client = collection.database.client
+    if id(client) not in _median_operator_support:
+        version = client.server_info().get("versionArray", [0])
+        _median_operator_support[id(client)] = list(version[:2]) >= MEDIAN_OPERATOR_VERSION
+    return _median_operator_support[id(client)]
+
+
+def _median_match(field: str, city: Optional[str], category: str) -> Dict[str, Any]:
+    """Filter of the listings of `category` that take part in a median: the field and city must be set."""
+    match: Dict[str, Any] = {**category_filter(category), field: {"$ne": None}, "city": {"$ne": None}}
+    if city:
+        match["city"] = city
+    return match
+
+
+def _trim_stages(limit: int) -> List[Dict[str, Any]]:
+    """
+    Stages keeping only the `limit` highest and `limit` lowest rows of the sorted medians.
+
+    Mirrors the pandas version: nothing is trimmed unless there are more than `2 * limit` rows.
+    """
+    return [
+        {"$group": {"_id": None, "rows": {"$push": "$$ROOT"}}},
+        {"$project": {"rows": {"$cond": [
+            {"$gt": [{"$size": "$rows"}, limit * 2]},
+            {"$concatArrays": [{"$slice": ["$rows", limit]}, {"$slice": ["$rows", -limit]}]},
+            "$rows"
+        ]}}},
+        {"$unwind": "$rows"},
+        {"$replaceRoot": {"newRoot": "$rows"}},
+    ]
+
+
+def median_pipeline(
+    field: str,
+    city: Optional[str] = None,
+    limit: int = 0,
+    use_operator: bool = False,
+    category: str = DEFAULT_CATEGORY
+) -> List[Dict[str, Any]]:
+    """
+    Build the aggregation pipeline returning the median of `field` per city, over the
+    listings of one category.
+
+    By default the values are sorted, pushed into one array per city, and the middle element
+    (or the mean of the two middle elements) is picked, like the `market_stats` cube does.
+    This matches pandas exactly and runs on any server. Every value of a city is held in one
+    `$group` array, and a `$group` stage may use at most 100 MB of memory, so the pipeline
+    must run with `allowDiskUse` (as `medians_by_city` does) to spill larger groups to disk.
+
+    With `use_operator` the median is computed by the `$median` accumulator (MongoDB 7.0+),
+    which keeps a small summary per city instead of all values. Its "approximate" method
+    returns one of the observed values, so for an even number of values it can differ from
+    pandas by up to half the gap between the two middle values.
+
+    Args:
+        field (str): Numeric field to summarize.
+        city (Optional[str]): Restrict to one city.
+        limit (int): If > 0 and no city is given, keep the `limit` highest and lowest cities.
+        use_operator (bool): Use the approximate `$median` rather than the exact sorted `$push`.
+        category (str): Listing category to summarize.
+
+    Returns:
+        List[Dict[str, Any]]: Pipeline producing {"city", "value"} rows, highest value first.
+    """
+    pipeline: List[Dict[str, Any]] = [{"$match": _median_match(field, city, category)}]
+
+    if use_operator:
+        pipeline.append(
+            {"$group": {"_id": "$city", "value": {"$median": {"input": f"${field}", "method": "approximate"}}}}
+        )
+    else:
+        pipeline += [
+            {"$sort": {field: 1}},
+            {"$group": {"_id": "$city", "values": {"$push": f"${field}"}}},
+            {"$project": {"value": {"$let": {
+                "vars": {"n": {"$size": "$values"}},
+                "in": {"$avg": [
+                    {"$arrayElemAt": ["$values", {"$floor": {"$divide": [{"$subtract": ["$$n", 1]}, 2]}}]},
+                    {"$arrayElemAt": ["$values", {"$floor": {"$divide": ["$$n", 2]}}]},
+                ]}
+            }}}},
+        ]
+
+    pipeline += [
+        {"$project": {"_id": 0, "city": "$_id", "value": 1}},
+        {"$sort": {"value": -1, "city": 1}},
+    ]
+
+    if limit > 0 and not city:
+        pipeline += _trim_stages(limit)
+    return pipeline
+
+
+def medians_by_city(
+    collection: Collection,
+    field: str,
+    city: Optional[str] = None,
+    limit: int = 0,
+    use_operator: bool = False,
+    category: str = DEFAULT_CATEGORY
+) -> List[Dict[str, Any]]:
+    """
+    Compute the median of `field` per city on the server, exactly as pandas does.
+
+    Runs with `allowDiskUse` so the sorted `$push` of large cities can go past the 100 MB
+    memory limit of `$group`.
+
+    Args:
+        collection (Collection): The 'properties' collection.
+        field (str): Numeric field to summarize.
+        city (Optional[str]): Restrict to one city.
+        limit (int): If > 0 and no city is given, keep the `limit` highest and lowest cities.
+        use_operator (bool): Use the approximate `$median` accumulator instead (see
+                             `median_pipeline`); check `supports_median_operator` first.
+        category (str): Listing category to summarize.
+
+    Returns:
+        List[Dict[str, Any]]: {"city", "value"} rows, highest value first.
+    """
+    pipeline = median_pipeline(field, city, limit, use_operator, category)
+    return list(collection.aggregate(pipeline, allowDiskUse=True))
+
+
+def medians_by_city_pandas(
+    collection: Collection,
+    field: str,
+    city: Optional[str] = None,
+    limit: int = 0,
+    category: str = DEFAULT_CATEGORY
+) -> List[Dict[str, Any]]:
+    """
+    Compute the median of `field` per city in this process with pandas.
+
+    This was the original implementation. It loads every matching document, so it is only
+    used as a fallback when the aggregation fails and as the reference in tests.
+
+    Args:
+        collection (Collection): The 'properties' collection.
+        field (str): Numeric field to summarize.
+        city (Optional[str]): Restrict to one city.
+        limit (int): If > 0 and no city is given, keep the `limit` highest and lowest cities.
+        category (str): Listing category to summarize.
+
+    Returns:
+        List[Dict[str, Any]]: {"city", "value"} rows, highest value first.
+    """
+    query: Dict[str, Any] = category_filter(category)
+    if city:
+        query["city"] = city
+
+    cursor = collection.find(query, {"_id": 0, field: 1, "city": 1})
+    return _medians_from_frame(pd.DataFrame(list(cursor)), field, city, limit)
+
+
+def medians_by_city_parquet(
+    export_dir: str,
+    field: str,
+    city: Optional[str] = None,
+    limit: int = 0,
+    category: str = DEFAULT_CATEGORY
+) -> List[Dict[str, Any]]:
+    """
+    Compute the median of `field` per city from a Parquet export instead of the database.
+
+    Only the city and `field` columns (and the columns needed to keep the latest row of
+    each listing) are read, and only the partition of `city` when one is given.
+
+    Args:
+        export_dir (str): Dataset directory written by `scraper_mongodb.parquet_export`.
+        field (str): Numeric field to summarize.
+        city (Optional[str]): Restrict to one city.
+        limit (int): If > 0 and no city is given, keep the `limit` highest and lowest cities.
+        category (str): Listing category to summarize.
+
+    Returns:
+        List[Dict[str, Any]]: {"city", "value"} rows, highest value first.
+    """
+    # pyarrow is only needed when the analysis runs on an export
+    from scraper_mongodb.parquet_export import read_properties
+
+    df = read_properties(export_dir, ["city", field], city, category=category)
+    return _medians_from_frame(df, field, city, limit)
+
+
+def _medians_from_frame(df: pd.DataFrame, field: str, city: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    """Median of `field` per city of the listings in `df`, trimmed like the aggregation."""
+    if df.empty or field not in df.columns:
+        return []
+
+    df = df.dropna(subset=[field])
+
+    medians = (
+        df.groupby("city")[field]
+        .median()
+        .sort_values(ascending=False)
+        .reset_index()
+        .rename(columns={field: "value"})
+    )
+
+    if limit > 0 and len(medians) > limit * 2 and not city:
+        top = medians.head(limit)
+        bottom = medians.tail(limit)
+        medians = pd.concat([top, bottom])
+
+    return medians.to_dict(orient="records")
+
+
+def medians_from_stats(
+    rows: List[Dict[str, Any]],
+    field: str,
+    limit: int = 0,
+    city: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Read the per-city medians from city-level `market_stats` rows.
+
+    Args:
+        rows (List[Dict[str, Any]]): City-level cube rows.
+        field (str): Numeric field to summarize.
+        limit (int): If > 0 and no city is given, keep the `limit` highest and lowest cities.
+        city (Optional[str]): The city the rows were filtered on, if any.
+
+    Returns:
+        List[Dict[str, Any]]: {"city", "value"} rows, highest value first.
+    """
+    medians = sorted(
+        ({"city": row["city"], "value": row[field]["median"]} for row in rows if field in row),
+        key=lambda row: row["value"],
+        reverse=True
+    )
+    if limit > 0 and len(medians) > limit * 2 and not city:
+        medians = medians[:limit] + medians[-limit:]
+    return medians
+
+
+# Numeric fields the distribution endpoint can bin
+DISTRIBUTION_FIELDS = {"price", "size_m2", "price_per_m2"}
+
+
+def _distribution_match(query: Dict[str, Any], field: str) -> Dict[str, Any]:
+    """`query` restricted to the listings that have `field`."""
+    condition = query.get(field)
+    if isinstance(condition, dict):
+        return {**query, field: {**condition, "$ne": None}}
+    if condition is not None:
+        return query
+    return {**query, field: {"$ne": None}}
+
+
+def distribution_pipeline(
+    query: Dict[str, Any],
+    field: str,
+    bins: int,
+    mode: str = "fixed",
+    boundaries: Optional[List[float]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Build the aggregation binning `field` of the listings matching `query` on the server.
+
+    "fixed" bins are `$bucket`s between the given `boundaries`; "quantile" bins are
+    `$bucketAuto` buckets holding roughly the same number of listings each.
+
+    Args:
+        query (Dict[str, Any]): MongoDB filter of the listings.
+        field (str): Numeric field to bin.
+        bins (int): Number of bins.
+        mode (str): "fixed" or "quantile".
+        boundaries (Optional[List[float]]): `bins + 1` ascending bin edges, required for "fixed".
+
+    Returns:
+        List[Dict[str, Any]]: Pipeline producing one {"_id", "count"} row per non-empty bin.
+    """
+    pipeline: List[Dict[str, Any]] = [{"$match": _distribution_match(query, field)}]
+    if mode == "quantile":
+        pipeline.append({"$bucketAuto": {"groupBy": f"${field}", "buckets": bins, "output": {"count": {"$sum": 1}}}})
+    else:
+        pipeline.append({"$bucket": {"groupBy": f"${field}", "boundaries": boundaries, "output": {"count": {"$sum": 1}}}})
+    return pipeline
+
+
+def distribution(
+    collection: Collection,
+    query: Dict[str, Any],
+    field: str,
+    bins: int = 20,
+    mode: str = "fixed"
+) -> Dict[str, Any]:
+    """
+    Histogram of `field` over the listings matching `query`, binned on the server.
+
+    Only the bins leave the database, so the response size depends on `bins`, not on the
+    number of matching listings.
+
+    Args:
+        collection (Collection): The 'properties' collection.
+        query (Dict[str, Any]): MongoDB filter of the listings.
+        field (str): Numeric field to bin.
+        bins (int): Number of bins.
+        mode (str): "fixed" (equal width) or "quantile" (roughly equal counts).
+
+    Returns:
+        Dict[str, Any]: The field, mode, total count and {"min", "max", "count"} bins.
+    """
+    result: Dict[str, Any] = {"field": field, "mode": mode, "count": 0, "bins": []}
+
+    if mode == "quantile":
+        rows = list(collection.aggregate(distribution_pipeline(query, field, bins, mode)))
+        result["bins"] = [{"min": row["_id"]["min"], "max": row["_id"]["max"], "count": row["count"]} for row in rows]
+        result["count"] = sum(row["count"] for row in rows)
+        return result
+
+    stats = list(collection.aggregate([
+        {"$match": _distribution_match(query, field)},
+        {"$group": {"_id": None, "low": {"$min": f"${field}"}, "high": {"$max": f"${field}"}}},
+    ]))
+    if not stats:
+        return result
+
+    low, high = stats[0]["low"], stats[0]["high"]
+    if high <= low:
+        # A single distinct value makes one bin
+        edges = [low, high]
+    else:
+        width = (high - low) / bins
+        # In a very narrow range neighbouring edges can round to the same float; keep each once
+        edges = sorted(set([low + width * i for i in range(bins)] + [high]))
+    bins = len(edges) - 1
+    # The last boundary is just above the maximum so that the maximum falls into the last bin
+    boundaries = edges[:-1] + [math.nextafter(high, math.inf)]
+
+    counts = {row["_id"]: row["count"] for row in collection.aggregate(
+        distribution_pipeline(query, field, bins, mode, boundaries)
+    )}
+    # `$bucket` leaves out empty bins
+    result["bins"] = [{"min": edges[i], "max": edges[i + 1], "count": counts.get(edges[i], 0)} for i in range(bins)]
+    result["count"] = sum(counts.values())
+    return result
+
+
+def distribution_from_histogram(field: str, histogram: Dict[str, List[float]]) -> Dict[str, Any]:
+    """
+    Shape a NumPy histogram (`ListingSnapshot.histogram`) like the result of `distribution`.
+
+    Args:
+        field (str): The binned field.
+        histogram (Dict[str, List[float]]): Bin `edges` and `counts`.
+
+    Returns:
+        Dict[str, Any]: The field, "fixed" mode, total count and bins.
+    """
+    edges, counts = histogram["edges"], histogram["counts"]
+    return {
+        "field": field,
+        "mode": "fixed",
+        "count": int(sum(counts)),
+        "bins": [{"min": edges[i], "max": edges[i + 1], "count": int(count)} for i, count in enumerate(counts)],
+    }
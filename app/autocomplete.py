@@ -0,0 +1,206 @@
+"""
+In-memory city, district and street index for the autocomplete endpoints.
+"""
+
+import heapq
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from pymongo.database import Database
+
+from scraper_mongodb.crawl_meta import crawl_version
+
+
+# Placeholder stored by the parser when a part of the address is missing
+MISSING_NAME: str = "N/A"
+
+
+def fold(text: str) -> str:
+    """
+    Normalize a name for matching: casefolded, with diacritics removed ("Žirmūnai" -> "zirmunai").
+
+    Args:
+        text (str): A place name or typed prefix.
+
+    Returns:
+        str: The folded key.
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class RankedNames:
+    """
+    Names sorted by their folded form, for accent- and case-insensitive prefix lookups by
+    binary search. Matches are ranked by listing count.
+    """
+    def __init__(self, counts: Dict[str, int]) -> None:
+        entries = sorted((fold(name), name) for name in counts)
+        self._folded: List[str] = [folded for folded, _ in entries]
+        self._names: List[str] = [name for _, name in entries]
+        self._counts: List[int] = [counts[name] for name in self._names]
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def prefix(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """
+        Return the names starting with `query`, ignoring case and accents.
+
+        Args:
+            query (str): Typed prefix; an empty prefix matches every name.
+            limit (Optional[int]): Return at most this many names.
+
+        Returns:
+            List[str]: Matching names, most listings first, then alphabetically.
+        """
+        folded = fold(query)
+        start = bisect_left(self._folded, folded)
+        end = start
+        while end < len(self._folded) and self._folded[end].startswith(folded):
+            end += 1
+
+        # Entries are already in folded order, so the index breaks count ties alphabetically
+        ranked: List[Tuple[int, int]] = [(-self._counts[i], i) for i in range(start, end)]
+        best = heapq.nsmallest(limit, ranked) if limit is not None else sorted(ranked)
+        return [self._names[i] for _, i in best]
+
+
+class AutocompleteIndex:
+    """
+    Cached city -> district -> street index of the stored listings, with listing counts.
+
+    Lookups never touch MongoDB. Once `ttl` seconds have passed, the next lookup reads the
+    crawl version stamp (one small query) and reloads the index only if a crawl finished since
+    it was built; otherwise the cached index is kept for another `ttl` seconds.
+    """
+    def __init__(self, ttl: float = 300.0) -> None:
+        self.ttl: float = ttl
+        self.version: Optional[int] = None
+        self._checked_at: Optional[float] = None
+        self._cities: RankedNames = RankedNames({})
+        self._districts: Dict[str, RankedNames] = {}
+        self._streets: Dict[Tuple[str, Optional[str]], RankedNames] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def _load(self, db: Database) -> None:
+        """Build the index from one aggregation counting listings per (city, district, street)."""
+        groups = db.properties.aggregate([
+            {"$group": {"_id": {"city": "$city", "district": "$district", "street": "$street"},
+                        "count": {"$sum": 1}}}
+        ])
+
+        cities: Counter = Counter()
+        districts: Dict[str, Counter] = {}
+        # Streets per city (district None) and per (city, district)
+        streets: Dict[Tuple[str, Optional[str]], Counter] = {}
+
+        for group in groups:
+            city, district, street = (group["_id"].get(key) for key in ("city", "district", "street"))
+            if not isinstance(city, str) or city == MISSING_NAME:
+                continue
+            count = group["count"]
+            cities[city] += count
+
+            has_district = isinstance(district, str) and district != MISSING_NAME
+            if has_district:
+                districts.setdefault(city, Counter())[district] += count
+
+            if isinstance(street, str) and street != MISSING_NAME:
+                streets.setdefault((city, None), Counter())[street] += count
+                if has_district:
+                    streets.setdefault((city, district), Counter())[street] += count
+
+        self._cities = RankedNames(cities)
+        self._districts = {city: RankedNames(names) for city, names in districts.items()}
+        self._streets = {key: RankedNames(names) for key, names in streets.items()}
+
+    def _is_current(self) -> bool:
+        """Return True while the last version check is less than `ttl` seconds old."""
+        return self._checked_at is not None and time.monotonic() - self._checked_at < self.ttl
+
+    def refresh(self, db: Database) -> None:
+        """
+        Reload the index if the TTL expired and the crawl version changed.
+
+        Args:
+            db (Database): The scraper database.
+        """
+        if self._is_current():
+            return
+
+        with self._lock:
+            # Another request may have refreshed while this one waited for the lock
+            if self._is_current():
+                return
+            version = crawl_version(db)
+            if version != self.version:
+                self._load(db)
+                self.version = version
+            self._checked_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Force a reload on the next lookup."""
+        self.version = None
+        self._checked_at = None
+
+    def cities(self, db: Database, query: str = "", limit: Optional[int] = None) -> List[str]:
+        """
+        Cities starting with `query`, ignoring case and accents.
+
+        Args:
+            db (Database): The scraper database, used only when the index needs refreshing.
+            query (str): Typed prefix.
+            limit (Optional[int]): Maximum number of suggestions.
+
+        Returns:
+            List[str]: Matching cities, most listings first.
+        """
+        self.refresh(db)
+        return self._cities.prefix(query, limit)
+
+    def districts(self, db: Database, city: str, query: str = "", limit: Optional[int] = None) -> List[str]:
+        """
+        Districts of `city` starting with `query`, ignoring case and accents.
+
+        Args:
+            db (Database): The scraper database, used only when the index needs refreshing.
+            city (str): City name as stored.
+            query (str): Typed prefix.
+            limit (Optional[int]): Maximum number of suggestions.
+
+        Returns:
+            List[str]: Matching districts, most listings first; empty for an unknown city.
+        """
+        self.refresh(db)
+        names = self._districts.get(city)
+        return names.prefix(query, limit) if names is not None else []
+
+    def streets(
+        self,
+        db: Database,
+        city: str,
+        district: Optional[str] = None,
+        query: str = "",
+        limit: Optional[int] = None
+    ) -> List[str]:
+        """
+        Streets of `city` (and `district`, if given) starting with `query`, ignoring case and accents.
+
+        Args:
+            db (Database): The scraper database, used only when the index needs refreshing.
+            city (str): City name as stored.
+            district (Optional[str]): District name as stored.
+            query (str): Typed prefix.
+            limit (Optional[int]): Maximum number of suggestions.
+
+        Returns:
+            List[str]: Matching streets, most listings first; empty for an unknown city or district.
+        """
+        self.refresh(db)
+        names = self._streets.get((city, district or None))
+        return names.prefix(query, limit) if names is not None else []
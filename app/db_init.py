@@ -1,16 +1,25 @@
-from flask import Flask
+from typing import Any, Dict
+
+from flask import Flask, has_request_context, session
 from flask_login import UserMixin
 from bson.objectid import ObjectId
+from pymongo.errors import OperationFailure
 
 from .extensions import login_manager, mongo, bcrypt, csrf
+from .user_cache import UserCache, create_user_cache
+from scraper_mongodb.mongo_settings import client_options, database_uri, mongo_settings
 
 # Initialize Flask application
 app = Flask(__name__)
-app.config["MONGO_URI"] = "mongodb://localhost:27017/aruodas_apartments"
+# Same connection settings (URI, pool, timeouts, read preference, write concern) as the scraper
+app.config["MONGO_URI"] = database_uri(mongo_settings())
 app.config["SECRET_KEY"] = "secret_key"
+# Copy the username into the signed session cookie so requests can skip the users lookup
+# (a deleted user then stays logged in until logout)
+app.config["USER_SESSION_FIELDS"] = False
 
 # Initialize Flask extensions
-mongo.init_app(app)
+mongo.init_app(app, **client_options())
 bcrypt.init_app(app)
 csrf.init_app(app)
 login_manager.init_app(app)
@@ -29,7 +38,45 @@ class User(UserMixin):
     def __init__(self, user_data: dict) -> None:
         self.id: str = str(user_data["_id"])
         self.username: str = user_data["username"]
-        self.password: str = user_data["password"]
+        # Not stored in the session, and only needed at login
+        self.password: str = user_data.get("password", "")
+
+
+# Users loaded in the last few minutes, so authenticated requests skip the users collection;
+# sized by the USER_CACHE_SIZE and USER_CACHE_TTL environment variables
+user_cache: UserCache = create_user_cache()
+
+# Session key holding the user fields when USER_SESSION_FIELDS is enabled
+SESSION_USER_KEY: str = "user_fields"
+
+
+def remember_user(user_data: Dict[str, Any]) -> User:
+    """
+    Cache a user document just read at login (and copy its fields into the session if enabled).
+
+    Args:
+        user_data (Dict[str, Any]): The user document.
+
+    Returns:
+        User: The user to log in.
+    """
+    user_id = str(user_data["_id"])
+    user_cache.set(user_id, user_data)
+    if app.config.get("USER_SESSION_FIELDS"):
+        session[SESSION_USER_KEY] = {"id": user_id, "username": user_data["username"]}
+    return User(user_data)
+
+
+def forget_user(user_id: str) -> None:
+    """
+    Drop a user from the cache and the session, on logout or when their document changes.
+
+    Args:
+        user_id (str): User ID.
+    """
+    user_cache.invalidate(user_id)
+    if has_request_context():
+        session.pop(SESSION_USER_KEY, None)
 
 
 @login_manager.user_loader
@@ -37,16 +84,48 @@ def load_user(user_id: str) -> User | None:
     """
     Load a user by ID for Flask-Login session management.
 
+    The user comes from the session fields if enabled, then from the user cache, and only
+    then from MongoDB.
+
     Args:
         user_id (str): User ID from session.
 
     Returns:
         User or None: A User instance if found, else None.
     """
-    user_data = mongo.db.users.find_one({"_id": ObjectId(user_id)})
-    if user_data:
-        return User(user_data)
-    return None
+    if app.config.get("USER_SESSION_FIELDS") and has_request_context():
+        fields = session.get(SESSION_USER_KEY)
+        if fields and fields.get("id") == user_id:
+            return User({"_id": user_id, "username": fields["username"]})
+
+    user_data = user_cache.get(user_id)
+    if user_data is None:
+        user_data = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        if not user_data:
+            return None
+        user_cache.set(user_id, user_data)
+    return User(user_data)
+
+
+_user_indexes_ready: bool = False
+
+
+def ensure_user_indexes() -> None:
+    """
+    Create the unique `users.username` index once per process.
+
+    Registration relies on it to reject duplicate usernames atomically.
+    """
+    global _user_indexes_ready
+    if _user_indexes_ready:
+        return
+    try:
+        mongo.db.users.create_index("username", unique=True, name="username_unique")
+    except OperationFailure as e:
+        # E.g. existing duplicate usernames; they have to be cleaned up by hand
+        print(f"Could not create the unique username index: {e}")
+        return
+    _user_indexes_ready = True
 
 
 # Access to MongoDB 'properties' collection
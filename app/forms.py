@@ -1,7 +1,8 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, IntegerField
+from wtforms import StringField, PasswordField, SubmitField, IntegerField, SelectField
 from wtforms.validators import DataRequired, Length, Optional, NumberRange, Regexp
 from wtforms.widgets import TextInput
+from scraper_mongodb.categories import DEFAULT_CATEGORY, categories
 
 
 class RegisterForm(FlaskForm):
@@ -58,6 +59,7 @@ class PropertySearchForm(FlaskForm):
     Search form to filter properties based on multiple criteria.
 
     Fields:
+        - category: Listing category, apartments for sale by default.
         - city: Optional city field with JS autocomplete.
         - district: Optional district.
         - price_min / price_max: Price range in Euros.
@@ -66,6 +68,12 @@ class PropertySearchForm(FlaskForm):
         - price_m2_min / price_m2_max: Price per m² range.
         - submit: Search button.
     """
+    category: SelectField = SelectField(
+        "Category",
+        choices=[(name, name.replace("_", " ").capitalize()) for name in categories],
+        default=DEFAULT_CATEGORY
+    )
+
     city: StringField = StringField(
         "City",
         widget=TextInput(),
@@ -0,0 +1,257 @@
+"""
+Live search updates: one change stream on 'properties' per process, fanned out to the
+server-sent event streams of open search pages.
+
+`ChangeStreamHub` runs a single background consumer while anyone is subscribed. Each
+subscription is a search query compiled with `scraper_mongodb.alerts.compile_query` and
+filed under its category/city/district bucket, so an incoming listing is only tested against
+the subscriptions of the (at most four) buckets it can match. Matching listings are put on the
+subscribers' bounded queues; a subscriber that does not keep up loses events rather than
+holding back the others.
+
+Change streams need a replica set; a single-node one (`mongod --replSet rs0`, then
+`rs.initiate()`) is enough locally.
+"""
+
+import math
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from pymongo.collection import Collection
+from pymongo.errors import OperationFailure, PyMongoError
+
+from scraper_mongodb.alerts import BucketKey, bucket_keys, compile_query, range_fields
+from scraper_mongodb.properties_mongo_db import content_hash_fields
+
+
+# Server error code for `$changeStream` on a standalone server
+CHANGE_STREAM_UNSUPPORTED: int = 40573
+
+# Server error code for a resume token that has already rolled off the oplog
+CHANGE_STREAM_HISTORY_LOST: int = 286
+
+# Fields whose change is worth showing; crawls also rewrite `last_seen` of every listing they see
+live_fields: List[str] = ["category", "city", "district", *content_hash_fields]
+
+
+def change_stream_pipeline() -> List[Dict[str, Any]]:
+    """
+    Build the `$match` stage keeping inserts, replacements and updates of `live_fields`.
+
+    Returns:
+        List[Dict[str, Any]]: The change stream pipeline.
+    """
+    updated = [{f"updateDescription.updatedFields.{field}": {"$exists": True}} for field in live_fields]
+    return [{"$match": {"$or": [
+        {"operationType": {"$in": ["insert", "replace"]}},
+        {"operationType": "update", "$or": updated},
+    ]}}]
+
+
+class Subscription:
+    """
+    One open live search: its compiled query and the queue of listings waiting to be sent.
+
+    Attributes:
+        key (BucketKey): Category/city/district bucket of the query.
+        ranges (List[Tuple[float, float]]): Closed range per field in `range_fields`.
+        dropped (int): Events lost because the queue was full.
+    """
+    def __init__(self, query: Dict[str, Any], queue_size: int) -> None:
+        self.key: BucketKey
+        self.ranges: List[Tuple[float, float]]
+        self.key, self.ranges = compile_query(query)
+        self.queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=queue_size)
+        self.dropped: int = 0
+
+    def accepts(self, values: List[float]) -> bool:
+        """Whether listing values (NaN = missing) fall inside every range of the query."""
+        for value, (low, high) in zip(values, self.ranges):
+            if math.isnan(value):
+                if low != -math.inf or high != math.inf:
+                    return False
+            elif not low <= value <= high:
+                return False
+        return True
+
+    def offer(self, event: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the next listing.
+
+        Args:
+            timeout (float): Seconds to wait.
+
+        Returns:
+            Optional[Dict[str, Any]]: The listing event, or None on timeout.
+        """
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ChangeStreamHub:
+    """
+    Shared change stream consumer fanning listing changes out to live search subscriptions.
+
+    The consumer thread starts with the first subscription and stops after the last one is
+    gone; a later subscription starts a fresh stream, so old changes are not replayed as live.
+    While running, it resumes after errors from the last seen resume token, so a failover or
+    a dropped connection does not lose events. If that token is no longer in the oplog, the
+    stream starts again from the current changes. If the server cannot open change streams
+    (not a replica set), `error` is set and no further stream is attempted.
+
+    Attributes:
+        error (Optional[str]): Why live updates are unavailable, if they are.
+        delivered (int): Listing events put on subscriber queues.
+    """
+    def __init__(
+        self,
+        collection_getter: Callable[[], Collection],
+        queue_size: int = 100,
+        max_await_ms: int = 1000,
+        retry_delay: float = 2.0
+    ) -> None:
+        self._collection_getter = collection_getter
+        self.queue_size: int = queue_size
+        self.max_await_ms: int = max_await_ms
+        self.retry_delay: float = retry_delay
+        self.error: Optional[str] = None
+        self.delivered: int = 0
+        self.events: int = 0
+        self._buckets: Dict[BucketKey, Set[Subscription]] = {}
+        self._count: int = 0
+        self._resume_token: Optional[Dict[str, Any]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def subscribe(self, query: Dict[str, Any]) -> Subscription:
+        """
+        Register a live search and make sure the consumer is running.
+
+        Args:
+            query (Dict[str, Any]): A search query as built by the search form.
+
+        Returns:
+            Subscription: The subscription to read listings from.
+
+        Raises:
+            UnsupportedQuery: If the query cannot be matched against single listings.
+        """
+        subscription = Subscription(query, self.queue_size)
+        with self._lock:
+            self._buckets.setdefault(subscription.key, set()).add(subscription)
+            self._count += 1
+            if self._thread is None and self.error is None:
+                self._thread = threading.Thread(target=self._consume, name="change-stream-hub", daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            bucket = self._buckets.get(subscription.key)
+            if bucket is not None and subscription in bucket:
+                bucket.discard(subscription)
+                self._count -= 1
+                if not bucket:
+                    del self._buckets[subscription.key]
+
+    def publish(self, listing: Dict[str, Any]) -> int:
+        """
+        Offer a listing to every subscription whose query it matches.
+
+        Args:
+            listing (Dict[str, Any]): The listing event (document fields).
+
+        Returns:
+            int: Number of subscriptions it was offered to.
+        """
+        values = [
+            float(value) if isinstance(value, (int, float)) else math.nan
+            for value in (listing.get(field) for field in range_fields)
+        ]
+        with self._lock:
+            candidates = [
+                subscription
+                for key in bucket_keys(listing)
+                for subscription in self._buckets.get(key, ())
+            ]
+
+        matched = [subscription for subscription in candidates if subscription.accepts(values)]
+        for subscription in matched:
+            subscription.offer(listing)
+        self.events += 1
+        self.delivered += len(matched)
+        return len(matched)
+
+    def _should_stop(self) -> bool:
+        """Called by the consumer; clears `_thread` and the resume token so `subscribe` starts afresh."""
+        with self._lock:
+            if self._count == 0:
+                self._thread = None
+                self._resume_token = None
+                return True
+            return False
+
+    def _consume(self) -> None:
+        """Consumer thread: read the change stream until nobody is subscribed."""
+        while not self._should_stop():
+            try:
+                with self._collection_getter().watch(
+                    change_stream_pipeline(),
+                    full_document="updateLookup",
+                    resume_after=self._resume_token,
+                    max_await_time_ms=self.max_await_ms
+                ) as stream:
+                    while not self._should_stop():
+                        change = stream.try_next()
+                        self._resume_token = stream.resume_token
+                        if change is not None and change.get("fullDocument") is not None:
+                            self.publish(_listing_event(change))
+                    return
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_UNSUPPORTED:
+                    print(f"Live search updates are unavailable: {e}")
+                    with self._lock:
+                        self.error = "Change streams need a replica set"
+                        self._thread = None
+                    return
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    print(f"Change stream history lost, restarting from the current changes: {e}")
+                    self._resume_token = None
+                    continue
+                print(f"Change stream failed, resuming: {e}")
+            except PyMongoError as e:
+                print(f"Change stream failed, resuming: {e}")
+            time.sleep(self.retry_delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Subscriptions, buckets, events read and delivered, events dropped by slow subscribers."""
+        with self._lock:
+            subscriptions = [subscription for bucket in self._buckets.values() for subscription in bucket]
+            return {
+                "subscriptions": len(subscriptions),
+                "buckets": len(self._buckets),
+                "running": self._thread is not None,
+                "events": self.events,
+                "delivered": self.delivered,
+                "dropped": sum(subscription.dropped for subscription in subscriptions),
+                "error": self.error,
+            }
+
+
+def _listing_event(change: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a change event into the listing sent to subscribers."""
+    document = change["fullDocument"]
+    event = {field: document.get(field) for field in ("url", "street", *live_fields)}
+    event["id"] = str(document["_id"])
+    event["operation"] = change["operationType"]
+    return event
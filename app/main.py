@@ -1,16 +1,28 @@
 # USE THIS TO RUN python -m app.main from real_estate_project dir
 
-from flask import render_template, redirect, url_for, flash, request, jsonify
+from flask import render_template, redirect, url_for, flash, request, jsonify, Response, stream_with_context
 from flask_login import login_required, login_user, logout_user, current_user
 from .forms import RegisterForm, LoginForm, PropertySearchForm
-from .db_init import app, mongo, bcrypt, User
-import pandas as pd
+from .db_init import app, mongo, bcrypt, User, ensure_user_indexes, forget_user, remember_user
+from .autocomplete import AutocompleteIndex
+from .result_cache import ResultCache, create_backend
+from .live_updates import ChangeStreamHub
+from .analytics import (
+    DISTRIBUTION_FIELDS, MEDIAN_FIELDS, distribution, distribution_from_histogram, medians_by_city,
+    medians_by_city_pandas, medians_by_city_parquet, medians_from_stats, supports_median_operator
+)
+from scraper_mongodb.market_stats import live_market_stats, market_stats_is_fresh, read_market_stats, stats_levels
+from scraper_mongodb.mongo_settings import mongo_settings, pool_stats
+from scraper_mongodb.listing_snapshot import load_snapshot
+from scraper_mongodb.alerts import UnsupportedQuery
+from scraper_mongodb.categories import DEFAULT_CATEGORY, category_filter
 
 from flask_wtf.csrf import generate_csrf
 import json
 from datetime import datetime
 from bson import ObjectId
-from typing import Any, Dict, List
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 
 @app.context_processor
@@ -44,6 +56,7 @@ def logout() -> Any:
     Returns:
         Response: Redirect to homepage.
     """
+    forget_user(current_user.id)
     logout_user()
     return redirect(url_for("index"))
 
@@ -69,13 +82,15 @@ def register_user() -> str:
         username = form.username.data
         password = form.password.data
 
-        if users_collection.find_one({"username": username}):
+        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+        # The unique username index makes the insert itself reject duplicates
+        ensure_user_indexes()
+        try:
+            users_collection.insert_one({"username": username, "password": hashed_password})
+        except DuplicateKeyError:
             flash("Username already exists", "danger")
             return redirect(url_for('register_user'))
 
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
-        users_collection.insert_one({"username": username, "password": hashed_password})
-
         flash("Registration successful!", "success")
         return redirect(url_for('login'))
 
@@ -100,7 +115,7 @@ def login() -> str:
         user = users_collection.find_one({"username": username})
 
         if user and bcrypt.check_password_hash(user["password"], password):
-            login_user(User(user))
+            login_user(remember_user(user))
             return redirect(url_for("search_properties"))
         else:
             flash("Invalid username or password", "danger")
@@ -108,6 +123,155 @@ def login() -> str:
     return render_template("login.html", form=form)
 
 
+# Fields rendered by search.html; everything else stays in the database
+SEARCH_RESULT_FIELDS: Dict[str, int] = {
+    "city": 1, "district": 1, "price": 1, "size_m2": 1,
+    "number_of_rooms": 1, "price_per_m2": 1, "url": 1,
+}
+SEARCH_PAGE_SIZE: int = 50
+SEARCH_PAGE_SIZE_MAX: int = 200
+# Documents fetched per round trip while streaming NDJSON
+SEARCH_STREAM_BATCH_SIZE: int = 500
+
+# Search form field -> (document field, range operator or None for equality); the
+# category is always filtered on, see `build_search_query`
+SEARCH_FILTERS: Dict[str, Tuple[str, Optional[str]]] = {
+    "city": ("city", None),
+    "district": ("district", None),
+    "price_min": ("price", "$gte"),
+    "price_max": ("price", "$lte"),
+    "size_min": ("size_m2", "$gte"),
+    "size_max": ("size_m2", "$lte"),
+    "price_m2_min": ("price_per_m2", "$gte"),
+    "price_m2_max": ("price_per_m2", "$lte"),
+    "number_of_rooms": ("number_of_rooms", None),
+}
+
+# Type of each search form field, for filters that arrive as query parameters or JSON
+SEARCH_FILTER_TYPES: Dict[str, Callable[[Any], Any]] = {
+    "category": str,
+    "city": str,
+    "district": str,
+    "price_min": float,
+    "price_max": float,
+    "size_min": float,
+    "size_max": float,
+    "price_m2_min": float,
+    "price_m2_max": float,
+    "number_of_rooms": int,
+}
+
+
+def coerce_search_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert search filters from a JSON body to the types of the search form fields.
+
+    Args:
+        filters (Dict[str, Any]): Values keyed by search form field name, e.g. {"price_min": "100000"}.
+
+    Returns:
+        Dict[str, Any]: The non-empty known filters, converted.
+
+    Raises:
+        ValueError: If a value cannot be converted.
+    """
+    coerced: Dict[str, Any] = {}
+    for name, convert in SEARCH_FILTER_TYPES.items():
+        value = filters.get(name)
+        if value is None or value == "":
+            continue
+        if isinstance(value, (dict, list, bool)):
+            raise ValueError(f"Invalid value for '{name}'")
+        coerced[name] = convert(value)
+    return coerced
+
+
+def build_search_query(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn search form values into a MongoDB query, ignoring empty fields.
+
+    The query always selects one listing category: `category`, or apartments if it is empty.
+
+    Args:
+        filters (Dict[str, Any]): Values keyed by search form field name.
+
+    Returns:
+        Dict[str, Any]: The MongoDB filter.
+    """
+    query: Dict[str, Any] = category_filter(filters.get("category") or DEFAULT_CATEGORY)
+    for name, (field, operator) in SEARCH_FILTERS.items():
+        value = filters.get(name)
+        if not value:
+            continue
+        if operator is None:
+            query[field] = value
+        else:
+            query.setdefault(field, {})[operator] = value
+    return query
+
+
+def find_results_page(
+    query: Dict[str, Any],
+    after: Optional[str] = None,
+    page_size: int = SEARCH_PAGE_SIZE
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Fetch one page of search results using keyset pagination on `_id`.
+
+    Instead of skipping over earlier pages, the next page starts after the last `_id` of the
+    previous one, so every page costs the same and at most `page_size` documents are held in
+    memory. Only the fields shown on the results page are returned.
+
+    Args:
+        query (Dict[str, Any]): MongoDB filter.
+        after (Optional[str]): `_id` of the last result on the previous page.
+        page_size (int): Results per page, capped at `SEARCH_PAGE_SIZE_MAX`.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Optional[str]]: The results, and the cursor for the next
+                                                    page (None on the last page).
+    """
+    page_size = max(1, min(page_size, SEARCH_PAGE_SIZE_MAX))
+    page_query = dict(query)
+    if after:
+        page_query["_id"] = {"$gt": ObjectId(after)}
+
+    # One extra document tells whether there is a next page
+    results = list(
+        mongo.db.properties.find(page_query, SEARCH_RESULT_FIELDS)
+        .sort("_id", 1)
+        .limit(page_size + 1)
+    )
+    if len(results) <= page_size:
+        return results, None
+    results = results[:page_size]
+    return results, str(results[-1]["_id"])
+
+
+# Search result pages, keyed by canonical query and cleared when a crawl finishes
+result_cache: ResultCache = ResultCache(create_backend(app.config))
+
+
+def cached_results_page(
+    query: Dict[str, Any],
+    after: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    `find_results_page` through `result_cache`.
+
+    Args:
+        query (Dict[str, Any]): MongoDB filter.
+        after (Optional[str]): `_id` of the last result on the previous page.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Optional[str]]: The results and the next page cursor.
+    """
+    results, next_after = result_cache.get_or_compute(
+        mongo.db, lambda: find_results_page(query, after), query=query, after=after, page_size=SEARCH_PAGE_SIZE
+    )
+    return results, next_after
+
+
 @app.route("/search", methods=["GET", "POST"])
 @login_required
 def search_properties() -> str:
@@ -115,53 +279,136 @@ def search_properties() -> str:
     Search properties using multiple filters.
 
     Returns:
-        str: Rendered search page with results.
+        str: Rendered search page with the first page of results.
     """
     form = PropertySearchForm()
     results: List[Dict[str, Any]] = []
+    next_after: Optional[str] = None
     query: Dict[str, Any] = {}
 
     if request.method == "POST":
-        if form.city.data:
-            query["city"] = form.city.data
-        if form.district.data:
-            query["district"] = form.district.data
+        query = build_search_query(form.data)
+
+        # Only search once something beyond the default category is chosen
+        if query != build_search_query({}):
+            results, next_after = cached_results_page(query)
+
+    return render_template("search.html", form=form, results=results, query=query, next_after=next_after)
+
+
+@app.route("/api/search", methods=["GET"])
+@login_required
+def search_properties_stream() -> Response:
+    """
+    Stream search results as newline-delimited JSON, one listing per line.
+
+    Filters use the search form field names as query parameters (`city`, `price_min`, ...).
+    `after` resumes after a given listing id and `limit` stops after that many results.
+    Documents are read from the cursor in batches while the response is written, so memory
+    use does not depend on the number of matches.
+
+    Returns:
+        Response: An `application/x-ndjson` streaming response.
+    """
+    filters: Dict[str, Any] = {
+        name: request.args.get(name, type=convert) for name, convert in SEARCH_FILTER_TYPES.items()
+    }
+
+    query = build_search_query(filters)
+    after = request.args.get("after")
+    if after:
+        if not ObjectId.is_valid(after):
+            return jsonify({"error": "Invalid 'after' cursor"}), 400
+        query["_id"] = {"$gt": ObjectId(after)}
+
+    cursor = (
+        mongo.db.properties.find(query, SEARCH_RESULT_FIELDS)
+        .sort("_id", 1)
+        .batch_size(SEARCH_STREAM_BATCH_SIZE)
+    )
+    limit = request.args.get("limit", 0, type=int)
+    if limit > 0:
+        cursor = cursor.limit(limit)
+
+    def generate() -> Iterator[str]:
+        for doc in cursor:
+            doc["id"] = str(doc.pop("_id"))
+            yield json.dumps(doc, ensure_ascii=False) + "\n"
 
-        if form.price_min.data or form.price_max.data:
-            query["price"] = {}
-            if form.price_min.data:
-                query["price"]["$gte"] = form.price_min.data
-            if form.price_max.data:
-                query["price"]["$lte"] = form.price_max.data
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
-        if form.size_min.data or form.size_max.data:
-            query["size_m2"] = {}
-            if form.size_min.data:
-                query["size_m2"]["$gte"] = form.size_min.data
-            if form.size_max.data:
-                query["size_m2"]["$lte"] = form.size_max.data
 
-        if form.price_m2_min.data or form.price_m2_max.data:
-            query["price_per_m2"] = {}
-            if form.price_m2_min.data:
-                query["price_per_m2"]["$gte"] = form.price_m2_min.data
-            if form.price_m2_max.data:
-                query["price_per_m2"]["$lte"] = form.price_m2_max.data
+# One change stream on 'properties' per process, shared by all open live searches
+live_hub: ChangeStreamHub = ChangeStreamHub(
+    lambda: mongo.db.properties, queue_size=app.config.get("LIVE_QUEUE_SIZE", 100)
+)
+# Seconds between keep-alive comments on an idle event stream
+LIVE_HEARTBEAT: float = 15.0
 
-        if form.number_of_rooms.data:
-            query["number_of_rooms"] = form.number_of_rooms.data
 
-        if query:
-            results = list(mongo.db.properties.find(query))
+@app.route("/api/search/live", methods=["GET"])
+@login_required
+def search_live_updates() -> Response:
+    """
+    Stream listings inserted or changed after the request as server-sent events, for a search
+    page that stays open while the scraper runs.
 
-    return render_template("search.html", form=form, results=results, query=query)
+    `query` is the page's search query as JSON (the form `search.html` renders). Each
+    matching listing is sent as a `listing` event with the fields shown on the results page,
+    its `id` and the `operation` (insert, update or replace).
+
+    Returns:
+        Response: A `text/event-stream` response, or 400/503 JSON if the query cannot be
+                  followed or change streams are unavailable.
+    """
+    try:
+        query = json.loads(request.args.get("query") or "{}")
+        subscription = live_hub.subscribe(query)
+    except (ValueError, AttributeError, UnsupportedQuery):
+        return jsonify({"error": "Query cannot be followed live"}), 400
+    if live_hub.error:
+        live_hub.unsubscribe(subscription)
+        return jsonify({"error": live_hub.error}), 503
+
+    def generate() -> Iterator[str]:
+        try:
+            yield ": connected\n\n"
+            while True:
+                event = subscription.get(timeout=LIVE_HEARTBEAT)
+                if event is None and live_hub.error:
+                    yield f"event: unavailable\ndata: {json.dumps(live_hub.error)}\n\n"
+                    return
+                if event is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"event: listing\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            live_hub.unsubscribe(subscription)
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Keep reverse proxies from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 
 @app.route("/analyze_median", methods=["POST"])
 @login_required
 def analyze_selected_median() -> Any:
     """
-    Return median value per city for a selected numeric field.
+    Return median value per city for a selected numeric field, over the listings of one
+    `category` (apartments by default).
+
+    `MEDIAN_BACKEND` picks where they come from. By default (or with "cube") they are read
+    from the `market_stats` cube while it is fresh, and otherwise computed by an aggregation
+    pipeline on the server ("aggregate" always does this). That pipeline is the exact sorted
+    `$push`, unless `MEDIAN_OPERATOR` is set and the server supports the approximate
+    `$median` accumulator (MongoDB 7.0+). If the aggregation fails, or the backend is
+    "pandas", they are computed here with pandas. With "parquet" they are read
+    from the Parquet export in `PARQUET_EXPORT_DIR` and the database is not queried. With
+    "snapshot" they are computed from the memory-mapped listing snapshot in `SNAPSHOT_DIR`
+    (by default the `snapshot_dir` setting the crawler writes to, see `mongo_settings`);
+    while there is none, the default path is used.
 
     Returns:
         JSON: Median values grouped by city.
@@ -169,37 +416,171 @@ def analyze_selected_median() -> Any:
     data = request.get_json()
     field = data.get("field")
     city_filter = data.get("city")
+    category = data.get("category") or DEFAULT_CATEGORY
     limit = int(data.get("limit", 0))
 
-    if field not in {"price", "size_m2", "price_per_m2", "number_of_rooms"}:
+    if field not in MEDIAN_FIELDS:
         return jsonify({"error": "Invalid field"}), 400
+    if not isinstance(category, str):
+        return jsonify({"error": "Invalid category"}), 400
 
-    query: Dict[str, Any] = {}
-    if city_filter:
-        query["city"] = city_filter
+    backend = app.config.get("MEDIAN_BACKEND")
+    if backend == "snapshot":
+        snapshot = load_snapshot(app.config.get("SNAPSHOT_DIR") or mongo_settings()["snapshot_dir"])
+        if snapshot is not None and snapshot.category == category:
+            return jsonify(snapshot.medians_by_city(field, city_filter, limit))
+        backend = None
 
-    cursor = mongo.db.properties.find(query, {"_id": 0, field: 1, "city": 1})
-    df = pd.DataFrame(list(cursor))
+    if backend == "parquet":
+        export_dir = app.config.get("PARQUET_EXPORT_DIR", "exports/properties")
+        return jsonify(medians_by_city_parquet(export_dir, field, city_filter, limit, category))
 
-    if df.empty or field not in df.columns:
-        return jsonify([])
+    if backend in (None, "cube") and market_stats_is_fresh(mongo.db):
+        rows = read_market_stats(mongo.db, "city", category, city=city_filter)
+        return jsonify(medians_from_stats(rows, field, limit, city_filter))
 
-    df = df.dropna(subset=[field])
+    if backend in (None, "cube", "aggregate"):
+        try:
+            use_operator = bool(app.config.get("MEDIAN_OPERATOR")) and supports_median_operator(mongo.db.properties)
+            return jsonify(medians_by_city(
+                mongo.db.properties, field, city_filter, limit, use_operator=use_operator, category=category
+            ))
+        except OperationFailure as e:
+            print(f"Median aggregation failed, falling back to pandas: {e}")
 
-    medians = (
-        df.groupby("city")[field]
-        .median()
-        .sort_values(ascending=False)
-        .reset_index()
-        .rename(columns={field: "value"})
-    )
+    return jsonify(medians_by_city_pandas(mongo.db.properties, field, city_filter, limit, category))
+
+
+DISTRIBUTION_BINS: int = 20
+DISTRIBUTION_BINS_MAX: int = 100
+
+
+@app.route("/analyze_distribution", methods=["POST"])
+@login_required
+def analyze_distribution() -> Any:
+    """
+    Return a histogram of price, size_m2 or price_per_m2 for the listings matching a search.
+
+    The JSON body holds the `field`, the search `filters` (search form field names, as for
+    `/api/search`), the number of `bins` and the binning `mode`: "fixed" (equal width) or
+    "quantile" (roughly equal counts). Binning runs in MongoDB (`$bucket`/`$bucketAuto`), or
+    on the listing snapshot when `MEDIAN_BACKEND` is "snapshot", the snapshot holds the
+    searched category and the search only filters on the city. Results are cached per query
+    until the next crawl.
+
+    Returns:
+        JSON: The field, mode, total count and {"min", "max", "count"} bins.
+    """
+    data = request.get_json() or {}
+    field = data.get("field")
+    mode = data.get("mode", "fixed")
+    filters = data.get("filters") or {}
+    try:
+        bins = int(data.get("bins", DISTRIBUTION_BINS))
+    except (TypeError, ValueError):
+        bins = 0
+
+    if field not in DISTRIBUTION_FIELDS:
+        return jsonify({"error": "Invalid field"}), 400
+    if mode not in ("fixed", "quantile") or not 1 <= bins <= DISTRIBUTION_BINS_MAX:
+        return jsonify({"error": f"'mode' must be fixed or quantile and 'bins' 1-{DISTRIBUTION_BINS_MAX}"}), 400
+    if not isinstance(filters, dict):
+        return jsonify({"error": "Invalid filters"}), 400
+    try:
+        filters = coerce_search_filters(filters)
+    except ValueError as e:
+        return jsonify({"error": str(e) or "Invalid filters"}), 400
+    query = build_search_query(filters)
+    category = filters.get("category") or DEFAULT_CATEGORY
+
+    def compute() -> Dict[str, Any]:
+        snapshot_query = set(query) <= {"category", "city"}
+        if app.config.get("MEDIAN_BACKEND") == "snapshot" and mode == "fixed" and snapshot_query:
+            snapshot = load_snapshot(app.config.get("SNAPSHOT_DIR") or mongo_settings()["snapshot_dir"])
+            if snapshot is not None and snapshot.category == category:
+                return distribution_from_histogram(field, snapshot.histogram(field, bins, query.get("city")))
+        return distribution(mongo.db.properties, query, field, bins, mode)
+
+    return jsonify(result_cache.get_or_compute(
+        mongo.db, compute, kind="distribution", query=query, field=field, bins=bins, mode=mode
+    ))
+
+
+@app.route("/stats", methods=["GET"])
+@login_required
+def market_stats() -> Any:
+    """
+    Return market statistics (count, mean, median, p10/p90, min/max of price, size, price
+    per m² and rooms) per city, per district (`level=district`) or per district and room
+    count (`level=rooms`) for one listing `category` (apartments by default), optionally
+    filtered by `city`, `district` and `number_of_rooms`.
+
+    Rows come from the precomputed `market_stats` cube, or are computed live from the
+    listings while the cube is stale.
+
+    Returns:
+        JSON: {"source": "cube" or "live", "rows": [...]}.
+    """
+    level = request.args.get("level", "city")
+    if level not in stats_levels:
+        return jsonify({"error": f"Invalid level, use one of: {', '.join(stats_levels)}"}), 400
+
+    category = request.args.get("category") or DEFAULT_CATEGORY
+    filters = {
+        "city": request.args.get("city"),
+        "district": request.args.get("district"),
+        "number_of_rooms": request.args.get("number_of_rooms", type=int),
+    }
+
+    if market_stats_is_fresh(mongo.db):
+        return jsonify({"source": "cube", "rows": read_market_stats(mongo.db, level, category, **filters)})
+    return jsonify({"source": "live", "rows": live_market_stats(mongo.db.properties, level, category, **filters)})
+
+
+PRICE_HISTORY_LIMIT: int = 5000
 
-    if limit > 0 and len(medians) > limit * 2 and not city_filter:
-        top = medians.head(limit)
-        bottom = medians.tail(limit)
-        medians = pd.concat([top, bottom])
 
-    return jsonify(medians.to_dict(orient="records"))
+@app.route("/price_history", methods=["GET"])
+@login_required
+def price_history() -> Any:
+    """
+    Return the recorded price changes of one listing (`url`) or of a region (`city`, optional
+    `district`), oldest first.
+
+    Each lookup is a single query on the 'price_history' collection, served by its
+    (url, ts) or (city, district, ts) index.
+
+    Returns:
+        JSON: List of points with url, city, district, ts, price and price_per_m2.
+    """
+    url = request.args.get("url")
+    city = request.args.get("city")
+    district = request.args.get("district")
+
+    if url:
+        query: Dict[str, Any] = {"meta.url": url}
+    elif city:
+        query = {"meta.city": city}
+        if district:
+            query["meta.district"] = district
+    else:
+        return jsonify({"error": "Pass a listing url or a city"}), 400
+
+    cursor = (
+        mongo.db.price_history.find(query, {"_id": 0})
+        .sort("ts", 1)
+        .limit(PRICE_HISTORY_LIMIT)
+    )
+
+    return jsonify([
+        {
+            **point["meta"],
+            "ts": point["ts"].isoformat(),
+            "price": point.get("price"),
+            "price_per_m2": point.get("price_per_m2"),
+        }
+        for point in cursor
+    ])
 
 
 @app.route("/save_search", methods=["POST"])
@@ -250,7 +631,8 @@ def my_searches() -> str:
 @login_required
 def rerun_saved_search() -> str:
     """
-    Rerun a previously saved search query.
+    Rerun a previously saved search query, or show the next page of a search when the
+    form carries an `after` cursor.
 
     Returns:
         str: Rendered search page with old query results.
@@ -260,10 +642,17 @@ def rerun_saved_search() -> str:
     except Exception:
         flash("Failed to parse saved query.", "danger")
         return redirect(url_for("my_searches"))
+    if isinstance(query, dict) and "category" not in query:
+        # Searches saved before categories existed were apartment searches
+        query.update(category_filter(DEFAULT_CATEGORY))
 
-    results = list(mongo.db.properties.find(query))
+    after = request.form.get("after")
+    if after and not ObjectId.is_valid(after):
+        after = None
+
+    results, next_after = cached_results_page(query, after)
     form = PropertySearchForm()
-    return render_template("search.html", form=form, results=results, query=query)
+    return render_template("search.html", form=form, results=results, query=query, next_after=next_after)
 
 
 @app.route("/delete_search/<search_id>", methods=["POST"])
@@ -284,6 +673,7 @@ def delete_search(search_id: str) -> Any:
     })
 
     if result.deleted_count:
+        mongo.db.alert_matches.delete_many({"search_id": ObjectId(search_id)})
         flash("Search deleted successfully.", "success")
     else:
         flash("Failed to delete search.", "danger")
@@ -291,24 +681,88 @@ def delete_search(search_id: str) -> Any:
     return redirect(url_for("my_searches"))
 
 
+ALERTS_LIMIT: int = 200
+
+
+@app.route("/alerts", methods=["GET"])
+@login_required
+def alerts() -> Any:
+    """
+    Return the user's "new matches" feed: listings the alert matcher found for their saved
+    searches after a crawl, newest first. Pass `unseen=1` to only get matches not yet marked
+    as seen.
+
+    Returns:
+        JSON: List of matches with the saved search, listing fields, match time and seen flag.
+    """
+    query: Dict[str, Any] = {"user_id": current_user.id}
+    if request.args.get("unseen"):
+        query["seen"] = False
+
+    cursor = (
+        mongo.db.alert_matches.find(query, {"_id": 0})
+        .sort("matched_at", -1)
+        .limit(ALERTS_LIMIT)
+    )
+
+    return jsonify([
+        {**match, "search_id": str(match["search_id"]), "matched_at": match["matched_at"].isoformat()}
+        for match in cursor
+    ])
+
+
+@app.route("/alerts/seen", methods=["POST"])
+@login_required
+def mark_alerts_seen() -> Any:
+    """
+    Mark the user's matches as seen: those of the listing `urls` given in the JSON body, or
+    all of them.
+
+    Returns:
+        JSON: Number of matches marked, or an error if `urls` is not a list of strings.
+    """
+    data = request.get_json(silent=True) or {}
+    urls = data.get("urls")
+    if urls is not None and (not isinstance(urls, list) or not all(isinstance(url, str) for url in urls)):
+        return jsonify({"error": "'urls' must be a list of listing URLs"}), 400
+
+    query: Dict[str, Any] = {"user_id": current_user.id, "seen": False}
+    if urls:
+        query["url"] = {"$in": urls}
+
+    result = mongo.db.alert_matches.update_many(query, {"$set": {"seen": True}})
+    return jsonify({"marked": result.modified_count})
+
+
+# Cached city -> district -> street index; reloaded after a crawl, at most every AUTOCOMPLETE_TTL seconds
+autocomplete_index: AutocompleteIndex = AutocompleteIndex(ttl=app.config.get("AUTOCOMPLETE_TTL", 300))
+AUTOCOMPLETE_LIMIT: int = 50
+
+
 @app.route("/autocomplete/city")
 @login_required
 def autocomplete_city() -> Any:
     """
-    Provide city names for autocomplete field.
+    Provide city names for autocomplete field, optionally filtered by the typed prefix `q`
+    (case and accent insensitive), most listings first.
+
+    Served from the in-memory `autocomplete_index`.
 
     Returns:
         JSON: List of city suggestions.
     """
-    cities = mongo.db.properties.distinct("city")
-    return jsonify([{"id": city, "text": city} for city in sorted(cities)])
+    q = request.args.get("q", "")
+    return jsonify([{"id": city, "text": city} for city in autocomplete_index.cities(mongo.db, q)])
 
 
 @app.route("/autocomplete/district", methods=["GET"])
 @login_required
 def autocomplete_district() -> Any:
     """
-    Provide district names for a selected city for autocomplete.
+    Provide district names for a selected city for autocomplete, matching the typed prefix
+    `q` without regard to case or accents ("zirm" finds "Žirmūnai"), most listings first.
+
+    Served from the in-memory `autocomplete_index`.
 
     Returns:
         JSON: List of district suggestions.
@@ -318,12 +772,67 @@ def autocomplete_district() -> Any:
     if not city:
         return jsonify([])
 
-    districts = mongo.db.properties.distinct("district", {
-        "city": city,
-        "district": {"$regex": f"^{q}", "$options": "i"}
-    })
+    districts = autocomplete_index.districts(mongo.db, city, q, AUTOCOMPLETE_LIMIT)
+    return jsonify([{"id": d, "text": d} for d in districts])
+
+
+@app.route("/autocomplete/street", methods=["GET"])
+@login_required
+def autocomplete_street() -> Any:
+    """
+    Provide street names of a selected city (and optionally district) for autocomplete,
+    matching the typed prefix `q` without regard to case or accents, most listings first.
+
+    Returns:
+        JSON: List of street suggestions.
+    """
+    city = request.args.get("city", "")
+    district = request.args.get("district", "")
+    q = request.args.get("q", "")
+    if not city:
+        return jsonify([])
+
+    streets = autocomplete_index.streets(mongo.db, city, district, q, AUTOCOMPLETE_LIMIT)
+    return jsonify([{"id": s, "text": s} for s in streets])
+
 
-    return jsonify([{"id": d, "text": d} for d in sorted(districts)])
+@app.route("/metrics/cache")
+@login_required
+def cache_metrics() -> Any:
+    """
+    Report the search result cache metrics: hit ratio, average hit and miss latency, size.
+
+    Returns:
+        JSON: The metrics.
+    """
+    return jsonify(result_cache.metrics())
+
+
+@app.route("/metrics/pool")
+@login_required
+def pool_metrics() -> Any:
+    """
+    Report the MongoDB connection pool counters: open and in-use connections, checkout waits
+    and failures.
+
+    Returns:
+        JSON: The pool statistics and the configured pool size.
+    """
+    settings = mongo_settings()
+    return jsonify({**pool_stats.stats(), "max_pool_size": settings["max_pool_size"],
+                    "min_pool_size": settings["min_pool_size"]})
+
+
+@app.route("/metrics/live")
+@login_required
+def live_metrics() -> Any:
+    """
+    Report the live search hub: open subscriptions, change events read, delivered and dropped.
+
+    Returns:
+        JSON: The hub statistics.
+    """
+    return jsonify(live_hub.stats())
 
 
 @app.route("/analysis_page")
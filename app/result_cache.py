@@ -0,0 +1,243 @@
+"""
+Cache for search result pages, keyed by a canonical form of the query and invalidated when
+a crawl finishes.
+
+The store behind the cache is pluggable: `MemoryBackend` keeps an LRU within a byte budget
+in the Flask process, `RedisBackend` uses any client with the redis-py `get`/`set`/
+`scan_iter`/`delete` methods (Redis itself, or a local compatible server).
+"""
+
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from bson import json_util
+from pymongo.database import Database
+
+from scraper_mongodb.crawl_meta import crawl_version
+
+
+def _normalize(value: Any) -> Any:
+    """Recursively normalize numbers (100000 and 100000.0 are the same bound) inside a query."""
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def canonical_key(**parts: Any) -> str:
+    """
+    Build a cache key that is the same for equivalent queries.
+
+    Keys are sorted at every level and numeric bounds are normalized to floats.
+
+    Args:
+        **parts: The query and anything else that changes the result (page cursor, size).
+
+    Returns:
+        str: The canonical JSON form of `parts`.
+    """
+    return json.dumps(_normalize(parts), sort_keys=True, separators=(",", ":"), default=str, ensure_ascii=False)
+
+
+class CacheBackend(ABC):
+    """Interface of the byte stores used by `ResultCache`."""
+    name: str = "base"
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the value stored under `key`, or None."""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes) -> None:
+        """Store `value` under `key`."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Drop every stored value."""
+
+    def stats(self) -> Dict[str, Any]:
+        """Backend specific numbers reported with the cache metrics."""
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """
+    In-process LRU store bounded by the total size of the stored values.
+    """
+    name: str = "memory"
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024) -> None:
+        self.max_bytes: int = max_bytes
+        self.size: int = 0
+        self.evictions: int = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        # A value larger than the whole budget would evict everything and still not fit
+        if len(value) > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = value
+            self.size += len(value)
+
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "bytes": self.size, "max_bytes": self.max_bytes,
+                "evictions": self.evictions}
+
+
+class RedisBackend(CacheBackend):
+    """
+    Store backed by a Redis-compatible server.
+
+    Eviction is left to the server (e.g. `maxmemory` with `allkeys-lru`); entries also expire
+    after `ttl` seconds.
+    """
+    name: str = "redis"
+
+    def __init__(self, client: Any, prefix: str = "search:", ttl: int = 3600) -> None:
+        self.client: Any = client
+        self.prefix: str = prefix
+        self.ttl: int = ttl
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes) -> None:
+        self.client.set(self.prefix + key, value, ex=self.ttl)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+
+def create_backend(config: Dict[str, Any]) -> CacheBackend:
+    """
+    Create the cache backend selected by the app config.
+
+    `RESULT_CACHE_BACKEND` is "memory" (default, bounded by `RESULT_CACHE_MAX_BYTES`) or
+    "redis" (at `RESULT_CACHE_URL`). The redis package is only needed for the latter; if it
+    is missing the in-process backend is used.
+
+    Args:
+        config (Dict[str, Any]): The Flask app config.
+
+    Returns:
+        CacheBackend: The backend.
+    """
+    max_bytes = config.get("RESULT_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+    if config.get("RESULT_CACHE_BACKEND", "memory") == "redis":
+        try:
+            import redis
+        except ImportError:
+            print("redis is not installed, using the in-process result cache.")
+            return MemoryBackend(max_bytes)
+        return RedisBackend(redis.Redis.from_url(config.get("RESULT_CACHE_URL", "redis://localhost:6379/0")))
+    return MemoryBackend(max_bytes)
+
+
+class ResultCache:
+    """
+    Read-through cache of search result pages with hit/miss metrics.
+
+    Every key is prefixed with the crawl version stamp. The stamp is read at most every
+    `version_check_interval` seconds; when it changes, the backend is cleared, since every
+    stored page may now be out of date.
+    """
+    def __init__(self, backend: CacheBackend, version_check_interval: float = 5.0) -> None:
+        self.backend: CacheBackend = backend
+        self.version_check_interval: float = version_check_interval
+        self.version: Optional[int] = None
+        self._checked_at: Optional[float] = None
+        self._lock: threading.Lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self._hit_seconds: float = 0.0
+        self._miss_seconds: float = 0.0
+
+    def _current_version(self, db: Database) -> Optional[int]:
+        """Return the crawl version, re-reading it once the check interval has passed."""
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.version_check_interval:
+            with self._lock:
+                version = crawl_version(db)
+                if self.version is not None and version != self.version:
+                    self.backend.clear()
+                self.version = version
+                self._checked_at = now
+        return self.version
+
+    def get_or_compute(self, db: Database, compute: Callable[[], Any], **key_parts: Any) -> Any:
+        """
+        Return the cached value for `key_parts`, computing and storing it on a miss.
+
+        Args:
+            db (Database): The scraper database, for the crawl version stamp.
+            compute (Callable[[], Any]): Produces the value; it must be BSON/JSON serializable.
+            **key_parts: Everything the value depends on (query, cursor, page size).
+
+        Returns:
+            Any: The value.
+        """
+        start = time.perf_counter()
+        key = canonical_key(version=self._current_version(db), **key_parts)
+
+        cached = self.backend.get(key)
+        if cached is not None:
+            value = json_util.loads(cached)
+            self.hits += 1
+            self._hit_seconds += time.perf_counter() - start
+            return value
+
+        value = compute()
+        self.backend.set(key, json_util.dumps(value).encode("utf-8"))
+        self.misses += 1
+        self._miss_seconds += time.perf_counter() - start
+        return value
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Hit ratio, average latency of hits and misses, and backend numbers.
+
+        Returns:
+            Dict[str, Any]: The metrics.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "avg_hit_ms": self._hit_seconds / self.hits * 1000 if self.hits else 0.0,
+            "avg_miss_ms": self._miss_seconds / self.misses * 1000 if self.misses else 0.0,
+            "crawl_version": self.version,
+            **self.backend.stats(),
+        }
@@ -1,10 +1,12 @@
 # Tests for the app directory
 
 import json
+import math
 from datetime import datetime
-from typing import Generator, Dict, Any
+from typing import Generator, Dict, Any, List
 
 import pytest
+from unittest.mock import patch
 from bson.objectid import ObjectId
 from flask.testing import FlaskClient
 from werkzeug.datastructures import MultiDict
@@ -157,6 +159,85 @@ def test_property_search_form_all_fields_valid(app_context: None) -> None:
     assert form.validate()
 
 
+# -------------------------- User Cache Tests --------------------------
+
+def test_load_user_is_cached_until_forgotten(test_user: Dict[str, Any]) -> None:
+    """A loaded user is served from the cache until it is invalidated."""
+    from ..db_init import forget_user
+
+    user_id = str(test_user["_id"])
+    assert load_user(user_id) is not None
+
+    mongo.db.users.delete_one({"_id": test_user["_id"]})
+    assert load_user(user_id).username == test_user["username"]
+
+    forget_user(user_id)
+    assert load_user(user_id) is None
+
+
+def test_user_cache_evicts_least_recently_used_and_expired() -> None:
+    """The cache keeps at most `max_entries` users and drops entries older than the TTL."""
+    from ..user_cache import UserCache
+
+    cache = UserCache(max_entries=2, ttl=60)
+    cache.set("a", {"username": "a"})
+    cache.set("b", {"username": "b"})
+    cache.get("a")
+    cache.set("c", {"username": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"username": "a"}
+
+    expired = UserCache(ttl=0)
+    expired.set("a", {"username": "a"})
+    assert expired.get("a") is None
+
+
+def test_user_cache_is_sized_by_the_environment() -> None:
+    """USER_CACHE_SIZE and USER_CACHE_TTL come from the environment; empty values keep the defaults."""
+    from ..user_cache import USER_CACHE_SIZE, USER_CACHE_TTL, create_user_cache
+
+    cache = create_user_cache({"USER_CACHE_SIZE": "16", "USER_CACHE_TTL": "2.5"})
+    assert (cache.max_entries, cache.ttl) == (16, 2.5)
+
+    cache = create_user_cache({"USER_CACHE_SIZE": ""})
+    assert (cache.max_entries, cache.ttl) == (USER_CACHE_SIZE, USER_CACHE_TTL)
+
+
+def test_session_user_fields(test_client: FlaskClient, test_user: Dict[str, Any]) -> None:
+    """With USER_SESSION_FIELDS, logged-in requests are served without reading the user."""
+    from ..db_init import SESSION_USER_KEY, user_cache
+
+    app.config["USER_SESSION_FIELDS"] = True
+    try:
+        test_client.post("/login", data={
+            "username": test_user["username"],
+            "password": "Password@123"
+        })
+        with test_client.session_transaction() as sess:
+            assert sess[SESSION_USER_KEY] == {"id": str(test_user["_id"]), "username": test_user["username"]}
+
+        # Neither the cache nor the collection is needed any more
+        user_cache.clear()
+        mongo.db.users.delete_one({"_id": test_user["_id"]})
+        assert test_client.get("/my_searches").status_code == 200
+
+        test_client.get("/logout")
+        with test_client.session_transaction() as sess:
+            assert SESSION_USER_KEY not in sess
+    finally:
+        app.config["USER_SESSION_FIELDS"] = False
+
+
+def test_username_index_is_unique() -> None:
+    """Registration relies on a unique index on users.username."""
+    from ..db_init import ensure_user_indexes
+
+    ensure_user_indexes()
+    index = mongo.db.users.index_information()["username_unique"]
+    assert index["key"] == [("username", 1)]
+    assert index.get("unique") is True
+
+
 # -------------------------- Route and View Tests --------------------------
 
 def test_index(test_client: FlaskClient) -> None:
@@ -302,6 +383,421 @@ def test_analyze_median_empty_data_returns_empty_list(test_client: FlaskClient,
     assert response.get_json() == []
 
 
+@pytest.mark.parametrize("field", ["price", "size_m2", "price_per_m2", "number_of_rooms"])
+@pytest.mark.parametrize("limit", [0, 2])
+def test_median_aggregation_matches_pandas(test_client: FlaskClient, field: str, limit: int) -> None:
+    """The sorted $push pipeline gives the same medians and trimming as the pandas version."""
+    from ..analytics import medians_by_city, medians_by_city_pandas
+
+    collection = mongo.db.median_equivalence_test
+    collection.drop()
+    # Odd and even group sizes, a missing value, and distinct medians per city
+    collection.insert_many([
+        {"city": f"City{c}", "price": float(1000 * c + 7 * i), "size_m2": 20.0 + c + i / 2,
+         "price_per_m2": 100 * c + i, "number_of_rooms": c + i % 3}
+        for c in range(1, 7) for i in range(c + 2)
+    ] + [{"city": "City1", "price": None}])
+
+    for city in (None, "City3"):
+        expected = medians_by_city_pandas(collection, field, city, limit)
+        actual = medians_by_city(collection, field, city, limit, use_operator=False)
+        assert [row["city"] for row in actual] == [row["city"] for row in expected]
+        assert [row["value"] for row in actual] == pytest.approx([row["value"] for row in expected])
+
+    collection.drop()
+
+
+def test_median_default_is_exact_for_even_counts(test_client: FlaskClient) -> None:
+    """Without options the server medians interpolate the two middle values like pandas."""
+    from ..analytics import median_pipeline, medians_by_city, medians_by_city_pandas
+
+    collection = mongo.db.median_even_test
+    collection.drop()
+    collection.insert_many([{"city": "Evenville", "price": price} for price in (100.0, 200.0, 400.0, 1000.0)])
+
+    assert medians_by_city(collection, "price") == medians_by_city_pandas(collection, "price")
+    assert medians_by_city(collection, "price") == [{"city": "Evenville", "value": 300.0}]
+    assert "$median" not in json.dumps(median_pipeline("price"))
+
+    collection.drop()
+
+
+def test_other_categories_leave_apartment_medians_and_search_alone(test_client: FlaskClient) -> None:
+    """Rentals and plots in the same city change neither apartment medians nor apartment searches."""
+    from scraper_mongodb.market_stats import live_market_stats
+    from ..analytics import medians_by_city, medians_by_city_pandas
+    from ..main import build_search_query
+
+    collection = mongo.db.category_median_test
+    collection.drop()
+    # One legacy listing without a category counts as an apartment
+    collection.insert_many([
+        {"url": "/a/1", "city": "Mixville", "price": 100000.0, "number_of_rooms": 2},
+        {"url": "/a/2", "city": "Mixville", "price": 200000.0, "number_of_rooms": 2, "category": "apartments"},
+        {"url": "/a/3", "city": "Mixville", "price": 300000.0, "number_of_rooms": 3, "category": "apartments"},
+    ])
+    apartments = [
+        medians_by_city(collection, "price"),
+        medians_by_city_pandas(collection, "price"),
+        live_market_stats(collection, "city", city="Mixville"),
+    ]
+    urls = sorted(doc["url"] for doc in collection.find(build_search_query({"city": "Mixville"})))
+
+    collection.insert_many([
+        {"url": "/r/1", "city": "Mixville", "price": 500.0, "number_of_rooms": 2, "category": "apartments_rent"},
+        {"url": "/p/1", "city": "Mixville", "price": 9000000.0, "number_of_rooms": 0, "category": "plots"},
+    ])
+
+    assert apartments[0] == [{"city": "Mixville", "value": 200000.0}]
+    assert medians_by_city(collection, "price") == apartments[0]
+    assert medians_by_city_pandas(collection, "price") == apartments[1]
+    assert live_market_stats(collection, "city", city="Mixville") == apartments[2]
+    assert urls == ["/a/1", "/a/2", "/a/3"]
+    assert sorted(doc["url"] for doc in collection.find(build_search_query({"city": "Mixville"}))) == urls
+
+    assert medians_by_city(collection, "price", category="plots") == [{"city": "Mixville", "value": 9000000.0}]
+    assert [doc["url"] for doc in collection.find(build_search_query({"category": "apartments_rent"}))] == ["/r/1"]
+
+    collection.drop()
+
+
+def test_analyze_median_falls_back_to_pandas(test_client: FlaskClient, test_user: Dict[str, Any]) -> None:
+    """If the aggregation fails on the server the endpoint still answers, using pandas."""
+    from pymongo.errors import OperationFailure
+    from .. import main as main_module
+
+    test_client.post("/login", data={
+        "username": test_user["username"],
+        "password": "Password@123"
+    })
+
+    with patch.object(main_module, "medians_by_city", side_effect=OperationFailure("unknown operator")), \
+         patch.object(main_module, "medians_by_city_pandas",
+                      return_value=[{"city": "Vilnius", "value": 1.0}]) as pandas_path:
+        response = test_client.post("/analyze_median", json={"field": "price", "city": "Vilnius"})
+
+    assert response.status_code == 200
+    assert response.get_json() == [{"city": "Vilnius", "value": 1.0}]
+    pandas_path.assert_called_once()
+
+
+def test_analyze_median_uses_median_operator_only_when_enabled(
+    test_client: FlaskClient, test_user: Dict[str, Any]
+) -> None:
+    """`MEDIAN_OPERATOR` switches the aggregation to `$median`, if the server supports it."""
+    from .. import main as main_module
+
+    test_client.post("/login", data={
+        "username": test_user["username"],
+        "password": "Password@123"
+    })
+
+    def use_operator_with(enabled: bool, supported: bool) -> bool:
+        app.config.update(MEDIAN_BACKEND="aggregate", MEDIAN_OPERATOR=enabled)
+        try:
+            with patch.object(main_module, "supports_median_operator", return_value=supported), \
+                 patch.object(main_module, "medians_by_city", return_value=[]) as server_path:
+                test_client.post("/analyze_median", json={"field": "price"})
+        finally:
+            app.config.pop("MEDIAN_BACKEND")
+            app.config.pop("MEDIAN_OPERATOR")
+        return server_path.call_args.kwargs["use_operator"]
+
+    assert use_operator_with(False, True) is False
+    assert use_operator_with(True, False) is False
+    assert use_operator_with(True, True) is True
+
+
+def test_parquet_medians_match_pandas(test_client: FlaskClient, test_user: Dict[str, Any], tmp_path) -> None:
+    """Medians read from a Parquet export match pandas on the live collection."""
+    from scraper_mongodb.parquet_export import export_properties
+    from ..analytics import medians_by_city_pandas, medians_by_city_parquet
+
+    collection = mongo.db.parquet_median_test
+    collection.drop()
+    collection.insert_many([
+        {"url": f"/{c}/{i}", "city": f"City{c}", "district": "D", "street": "S", "price": float(1000 * c + 7 * i),
+         "size_m2": 20.0 + c + i / 2, "price_per_m2": 100 * c + i, "number_of_rooms": c + i % 3,
+         "last_seen": datetime(2026, 1, 1 + i)}
+        for c in range(1, 5) for i in range(c + 2)
+    ])
+    export_properties(collection, str(tmp_path))
+
+    for city in (None, "City3"):
+        expected = medians_by_city_pandas(collection, "price", city)
+        assert medians_by_city_parquet(str(tmp_path), "price", city) == expected
+
+    test_client.post("/login", data={
+        "username": test_user["username"],
+        "password": "Password@123"
+    })
+    app.config.update(MEDIAN_BACKEND="parquet", PARQUET_EXPORT_DIR=str(tmp_path))
+    try:
+        response = test_client.post("/analyze_median", json={"field": "size_m2", "limit": 1})
+    finally:
+        app.config.pop("MEDIAN_BACKEND")
+        app.config.pop("PARQUET_EXPORT_DIR")
+
+    assert response.status_code == 200
+    assert response.get_json() == medians_by_city_pandas(collection, "size_m2", None, 1)
+    collection.drop()
+
+
+def test_analyze_median_from_snapshot(test_client: FlaskClient, test_user: Dict[str, Any], tmp_path) -> None:
+    """With MEDIAN_BACKEND "snapshot" the medians come from the NumPy snapshot and match pandas."""
+    from scraper_mongodb.listing_snapshot import write_snapshot
+    from ..analytics import medians_by_city_pandas
+
+    collection = mongo.db.snapshot_median_test
+    collection.drop()
+    collection.insert_many([
+        {"city": f"City{c}", "price": float(1000 * c + 7 * i), "size_m2": 20.0 + c + i / 2}
+        for c in range(1, 6) for i in range(c + 2)
+    ])
+    write_snapshot(collection, str(tmp_path))
+
+    test_client.post("/login", data={
+        "username": test_user["username"],
+        "password": "Password@123"
+    })
+    app.config.update(MEDIAN_BACKEND="snapshot", SNAPSHOT_DIR=str(tmp_path))
+    try:
+        response = test_client.post("/analyze_median", json={"field": "size_m2", "limit": 2})
+    finally:
+        app.config.pop("MEDIAN_BACKEND")
+        app.config.pop("SNAPSHOT_DIR")
+
+    assert response.status_code == 200
+    expected = medians_by_city_pandas(collection, "size_m2", None, 2)
+    assert [row["city"] for row in response.get_json()] == [row["city"] for row in expected]
+    assert [row["value"] for row in response.get_json()] == pytest.approx([row["value"] for row in expected])
+    collection.drop()
+
+
+# -------------------------- Distribution --------------------------
+
+def test_analyze_distribution_fixed_bins(test_client: FlaskClient, test_user: Dict[str, Any]) -> None:
+    """Equal-width bins match NumPy's histogram and the second request is served from the cache."""
+    import numpy as np
+    from .. import main as main_module
+
+    values = [1000 + (i * 37) % 2500 for i in range(300)]
+    inserted = mongo.db.properties.insert_many([
+        {"city": "Distville", "district": "D", "street": "S", "price": 1.0, "number_of_rooms": 2,
+         "price_per_m2": value} for value in values
+    ])
+    test_client.post("/login", data={
+        "username": test_user["username"],
+        "password": "Password@123"
+    })
+
+    body = {"field": "price_per_m2", "filters": {"city": "Distville"}, "bins": 10}
+    hits = main_module.result_cache.hits
+    first = test_client.post("/analyze_distribution", json=body).get_json()
+    second = test_client.post("/analyze_distribution", json=body).get_json()
+    mongo.db.properties.delete_many({"_id": {"$in": inserted.inserted_ids}})
+
+    assert first == second
+    assert main_module.result_cache.hits == hits + 1
+    assert first["count"] == len(values)
+    assert [row["count"] for row in first["bins"]] == np.histogram(values, bins=10)[0].tolist()
+    assert first["bins"][0]["min"] == min(values) and first["bins"][-1]["max"] == max(values)
+
+
+def test_analyze_distribution_coerces_filter_values(test_client: FlaskClient, test_user: Dict[str, Any]) -> None:
+    """Numeric filters sent as strings are compared as numbers; unconvertible ones are rejected."""
+    inserted = mongo.db.properties.insert_many([
+        {"city": "Coerceville", "district": "D", "street": "S", "price": price, "number_of_rooms": 2,
+         "price_per_m2": 1000, "size_m2": 50.0} for price in (50000.0, 150000.0, 250000.0)
+    ])
+    test_client.post("/login", data={
+        "username": test_user["username"],
+        "password": "Password@123"
+    })
+
+    body = {"field": "price", "filters": {"city": "Coerceville", "price_min": "100000"}, "bins": 2}
+    response = test_client.post("/analyze_distribution", json=body)
+    bad = test_client.post("/analyze_distribution", json={**body, "filters": {"price_min": "lots"}})
+    mongo.db.properties.delete_many({"_id": {"$in": inserted.inserted_ids}})
+
+    assert response.status_code == 200
+    assert response.get_json()["count"] == 2
+    assert bad.status_code == 400
+
+
+@pytest.mark.parametrize("values", [[5.0, 5.0], [1.0, math.nextafter(1.0, 2.0)]])
+def test_distribution_degenerate_ranges_have_ascending_boundaries(values: List[float]) -> None:
+    """A single value or a range narrower than the bin count gives strictly ascending $bucket boundaries."""
+    from unittest.mock import MagicMock
+    from ..analytics import distribution
+
+    collection = MagicMock()
+    collection.aggregate.side_effect = [
+        [{"_id": None, "low": min(values), "high": max(values)}],
+        [{"_id": min(values), "count": len(values)}],
+    ]
+
+    result = distribution(collection, {}, "price", bins=20)
+
+    boundaries = collection.aggregate.call_args.args[0][-1]["$bucket"]["boundaries"]
+    assert all(a < b for a, b in zip(boundaries, boundaries[1:]))
+    assert len(result["bins"]) == len(boundaries) - 1
+    assert result["count"] == len(values)
+
+
+def test_analyze_distribution_rejects_invalid_input(test_client: FlaskClient, test_user: Dict[str, Any]) -> None:
+    """Unknown fields, modes and bin counts are rejected."""
+    test_client.post("/login", data={
+        "username": test_user["username"],
+        "password": "Password@123"
+    })
+
+    for body in ({"field": "street"}, {"field": "price", "mode": "log"}, {"field": "price", "bins": 1000}):
+        assert test_client.post("/analyze_distribution", json=body).status_code == 400
+
+
+def test_distribution_quantile_bins_use_bucket_auto() -> None:
+    """Quantile bins come from one $bucketAuto stage."""
+    from unittest.mock import MagicMock
+    from ..analytics import distribution
+
+    collection = MagicMock()
+    collection.aggregate.return_value = [
+        {"_id": {"min": 1.0, "max": 5.0}, "count": 3},
+        {"_id": {"min": 5.0, "max": 9.0}, "count": 2},
+    ]
+
+    result = distribution(collection, {"city": "Vilnius"}, "price", bins=2, mode="quantile")
+
+    pipeline = collection.aggregate.call_args.args[0]
+    assert pipeline[0]["$match"] == {"city": "Vilnius", "price": {"$ne": None}}
+    assert pipeline[-1]["$bucketAuto"]["buckets"] == 2
+    assert result["count"] == 5
+    assert result["bins"] == [{"min": 1.0, "max": 5.0, "count": 3}, {"min": 5.0, "max": 9.0, "count": 2}]
+
+
+# -------------------------- Market Stats --------------------------
+
+def test_live_market_stats_match_pandas(test_client: FlaskClient) -> None:
+    """The cube pipelines give pandas' count, mean, min/max and interpolated percentiles."""
+    import pandas as pd
+    from scraper_mongodb.market_stats import live_market_stats
+
+    collection = mongo.db.market_stats_equivalence_test
+    collection.drop()
+    docs = [
+        {"city": "Statsville", "district": f"D{i % 2}", "number_of_rooms": 1 + i % 3,
+         "price": float(50000 + 997 * i), "size_m2": 30.0 + (i * 7) % 40, "price_per_m2": 1000 + (i * 13) % 900}
+        for i in range(25)
+    ]
+    collection.insert_many([dict(doc) for doc in docs])
+
+    rows = live_market_stats(collection, "district", city="Statsville")
+    df = pd.DataFrame(docs)
+
+    assert [row["district"] for row in rows] == ["D0", "D1"]
+    for row in rows:
+        values = df[df["district"] == row["district"]]["size_m2"]
+        stats = row["size_m2"]
+        assert stats["count"] == len(values) and row["count"] == len(values)
+        assert stats["mean"] == pytest.approx(values.mean())
+        assert stats["median"] == pytest.approx(values.median())
+        assert stats["p10"] == pytest.approx(values.quantile(0.1))
+        assert stats["p90"] == pytest.approx(values.quantile(0.9))
+        assert (stats["min"], stats["max"]) == (values.min(), values.max())
+
+    collection.drop()
+
+
+def test_stats_reads_cube_when_fresh_and_live_when_stale(test_client: FlaskClient, test_user: Dict[str, Any]) -> None:
+    """/stats and /analyze_median use the cube only while no listing was written after its refresh."""
+    from scraper_mongodb.market_stats import stats_cube_format
+
+    mongo.db.crawl_meta.delete_many({})
+    mongo.db.market_stats.delete_many({"city": "Cubeville"})
+    mongo.db.market_stats.insert_one({
+        "_id": {"level": "city", "category": "apartments", "city": "Cubeville"}, "level": "city",
+        "category": "apartments", "city": "Cubeville", "count": 3, "price": {"median": 123.0},
+        "refreshed_at": datetime(2024, 1, 2)
+    })
+
+    test_client.post("/login", data={
+        "username": test_user["username"],
+        "password": "Password@123"
+    })
+
+    # Never refreshed: live
+    assert test_client.get("/stats", query_string={"city": "Cubeville"}).get_json()["source"] == "live"
+
+    mongo.db.crawl_meta.insert_many([
+        {"_id": "market_stats", "refreshed_at": datetime(2024, 1, 2), "format": stats_cube_format},
+        {"_id": "properties", "written_at": datetime(2024, 1, 1)},
+    ])
+    fresh = test_client.get("/stats", query_string={"city": "Cubeville"}).get_json()
+    assert fresh["source"] == "cube"
+    assert fresh["rows"] == [
+        {"level": "city", "category": "apartments", "city": "Cubeville", "count": 3, "price": {"median": 123.0}}
+    ]
+    houses = test_client.get("/stats", query_string={"city": "Cubeville", "category": "houses"}).get_json()
+    assert houses == {"source": "cube", "rows": []}
+
+    median = test_client.post("/analyze_median", json={"field": "price", "city": "Cubeville"}).get_json()
+    assert median == [{"city": "Cubeville", "value": 123.0}]
+
+    # An explicitly configured backend wins over the fresh cube
+    from .. import main as main_module
+
+    for backend in ("pandas", "aggregate"):
+        app.config["MEDIAN_BACKEND"] = backend
+        try:
+            with patch.object(main_module, "medians_by_city_pandas", return_value=[]) as pandas_path, \
+                 patch.object(main_module, "medians_by_city", return_value=[]) as aggregate_path:
+                assert test_client.post("/analyze_median", json={"field": "price", "city": "Cubeville"}).get_json() == []
+        finally:
+            app.config.pop("MEDIAN_BACKEND")
+        assert (pandas_path.called, aggregate_path.called) == (backend == "pandas", backend == "aggregate")
+
+    mongo.db.crawl_meta.update_one({"_id": "properties"}, {"$set": {"written_at": datetime(2024, 1, 3)}})
+    assert test_client.get("/stats", query_string={"city": "Cubeville"}).get_json()["source"] == "live"
+    assert test_client.get("/stats", query_string={"level": "street"}).status_code == 400
+
+    mongo.db.market_stats.delete_many({"city": "Cubeville"})
+    mongo.db.crawl_meta.delete_many({})
+
+
+# -------------------------- Price History --------------------------
+
+def test_price_history_by_url_and_region(test_client: FlaskClient, test_user: Dict[str, Any]) -> None:
+    """History is returned oldest first, for one listing or for a whole region."""
+    url = "https://www.aruodas.lt/test-price-history/"
+    mongo.db.price_history.delete_many({"meta.url": url})
+    mongo.db.price_history.insert_many([
+        {"ts": datetime(2024, 2, 1), "meta": {"url": url, "city": "Testopolis", "district": "Centras"},
+         "price": 90000.0, "price_per_m2": 1800},
+        {"ts": datetime(2024, 1, 1), "meta": {"url": url, "city": "Testopolis", "district": "Centras"},
+         "price": 100000.0, "price_per_m2": 2000},
+    ])
+
+    test_client.post("/login", data={
+        "username": test_user["username"],
+        "password": "Password@123"
+    })
+
+    by_url = test_client.get("/price_history", query_string={"url": url}).get_json()
+    assert [point["price"] for point in by_url] == [100000.0, 90000.0]
+    assert by_url[0]["ts"].startswith("2024-01-01")
+
+    by_region = test_client.get("/price_history", query_string={
+        "city": "Testopolis", "district": "Centras"
+    }).get_json()
+    assert all(point["district"] == "Centras" for point in by_region)
+    assert len(by_region) == 2
+
+    assert test_client.get("/price_history").status_code == 400
+
+    mongo.db.price_history.delete_many({"meta.url": url})
+
+
 # -------------------------- Saved Search Tests --------------------------
 
 def test_save_search_correct(test_client: FlaskClient, test_user: Dict[str, Any]) -> None:
@@ -449,6 +945,204 @@ def test_delete_search_failure(test_client: FlaskClient, test_user: Dict[str, An
     assert mongo.db.saved_searches.find_one({"_id": search_id}) is not None
 
 
+def test_alerts_feed_and_mark_seen(test_client: FlaskClient, test_user: Dict[str, Any]) -> None:
+    """The feed lists the user's matches newest first; marking them seen empties the unseen feed."""
+    test_client.post("/login", data={
+        "username": test_user["username"],
+        "password": "Password@123"
+    })
+    user_id = str(test_user["_id"])
+    search_id = ObjectId()
+    mongo.db.alert_matches.insert_many([
+        {"search_id": search_id, "url": "/old", "user_id": user_id, "search_name": "Cheap",
+         "price": 90.0, "matched_at": datetime(2026, 1, 1), "seen": False},
+        {"search_id": search_id, "url": "/new", "user_id": user_id, "search_name": "Cheap",
+         "price": 80.0, "matched_at": datetime(2026, 1, 2), "seen": False},
+        {"search_id": search_id, "url": "/other", "user_id": "someone_else",
+         "matched_at": datetime(2026, 1, 3), "seen": False},
+    ])
+
+    feed = test_client.get("/alerts").get_json()
+    assert [match["url"] for match in feed] == ["/new", "/old"]
+    assert feed[0]["search_id"] == str(search_id)
+
+    for urls in ("/new", ["/new", 1], {"url": "/new"}):
+        assert test_client.post("/alerts/seen", json={"urls": urls}).status_code == 400
+    response = test_client.post("/alerts/seen", json={"urls": ["/new"]})
+    assert response.get_json() == {"marked": 1}
+    assert [match["url"] for match in test_client.get("/alerts?unseen=1").get_json()] == ["/old"]
+
+    mongo.db.alert_matches.delete_many({"search_id": search_id})
+
+
+# -------------------------- Live Search Updates --------------------------
+
+class FakeChangeStream:
+    """Stand-in for a replica set change stream: hands out queued change events."""
+    def __init__(self, changes: list, fail_after: Any = None) -> None:
+        self.changes = changes
+        self.fail_after = fail_after
+        self.resume_token = None
+
+    def __enter__(self) -> "FakeChangeStream":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+    def try_next(self) -> Any:
+        import time
+
+        if not self.changes:
+            if self.fail_after is not None:
+                raise self.fail_after
+            time.sleep(0.01)
+            return None
+        change = self.changes.pop(0)
+        self.resume_token = {"_data": change["fullDocument"]["url"]}
+        return change
+
+
+class FakeReplicaSetCollection:
+    """Collection whose `watch()` opens `FakeChangeStream`s over a list of scripted streams (or raises)."""
+    def __init__(self, *streams: FakeChangeStream) -> None:
+        self.streams = list(streams)
+        self.watch_calls: list = []
+
+    def watch(self, pipeline: list, **options: Any) -> FakeChangeStream:
+        self.watch_calls.append((pipeline, options))
+        stream = self.streams.pop(0) if self.streams else FakeChangeStream([])
+        if isinstance(stream, Exception):
+            raise stream
+        return stream
+
+
+def _change(url: str, city: str, price: float, operation: str = "insert") -> Dict[str, Any]:
+    return {"operationType": operation,
+            "fullDocument": {"_id": ObjectId(), "url": url, "city": city, "district": "A", "price": price}}
+
+
+def test_change_stream_hub_fans_out_by_query() -> None:
+    """One stream feeds every subscription whose bucket and ranges match; resumes after errors."""
+    import threading
+    import time
+    from pymongo.errors import AutoReconnect
+    from ..live_updates import ChangeStreamHub
+
+    collection = FakeReplicaSetCollection(
+        FakeChangeStream([_change("/1", "Vilnius", 100.0)], fail_after=AutoReconnect("primary stepped down")),
+        FakeChangeStream([_change("/2", "Kaunas", 300.0, "update")]),
+    )
+    # The stream opens once every subscription is registered
+    subscribed = threading.Event()
+    hub = ChangeStreamHub(lambda: subscribed.wait(2) and collection, max_await_ms=10, retry_delay=0)
+    vilnius = hub.subscribe({"city": "Vilnius", "price": {"$lte": 150}})
+    expensive = hub.subscribe({"price": {"$gte": 200}})
+    everything = hub.subscribe({})
+    subscribed.set()
+
+    assert vilnius.get(timeout=2)["url"] == "/1"
+    assert expensive.get(timeout=2)["url"] == "/2"
+    assert [everything.get(timeout=2)["url"] for _ in range(2)] == ["/1", "/2"]
+    assert vilnius.get(timeout=0.05) is None
+
+    # A single consumer, reopened from the last resume token after the failure
+    assert len(collection.watch_calls) == 2
+    assert collection.watch_calls[1][1]["resume_after"] == {"_data": "/1"}
+    assert collection.watch_calls[0][1]["full_document"] == "updateLookup"
+
+    for subscription in (vilnius, expensive, everything):
+        hub.unsubscribe(subscription)
+    deadline = time.monotonic() + 2
+    while hub.stats()["running"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert hub.stats()["running"] is False and hub.stats()["delivered"] == 4
+
+
+def _wait_until_stopped(hub: Any) -> None:
+    import time
+
+    deadline = time.monotonic() + 2
+    while hub.stats()["running"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_change_stream_hub_starts_fresh_after_idle_and_lost_history() -> None:
+    """A restarted consumer does not resume an old token; a token gone from the oplog is dropped."""
+    import time
+    from pymongo.errors import AutoReconnect, OperationFailure
+    from ..live_updates import CHANGE_STREAM_HISTORY_LOST, ChangeStreamHub
+
+    collection = FakeReplicaSetCollection(
+        FakeChangeStream([_change("/1", "Vilnius", 100.0)], fail_after=AutoReconnect("primary stepped down")),
+        OperationFailure("resume point no longer in the oplog", code=CHANGE_STREAM_HISTORY_LOST),
+        FakeChangeStream([_change("/2", "Vilnius", 100.0)]),
+    )
+    hub = ChangeStreamHub(lambda: collection, max_await_ms=10, retry_delay=0)
+    subscription = hub.subscribe({"city": "Vilnius"})
+    assert [subscription.get(timeout=2)["url"] for _ in range(2)] == ["/1", "/2"]
+    hub.unsubscribe(subscription)
+    _wait_until_stopped(hub)
+
+    later = hub.subscribe({"city": "Vilnius"})
+    deadline = time.monotonic() + 2
+    while len(collection.watch_calls) < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    hub.unsubscribe(later)
+    _wait_until_stopped(hub)
+
+    resumed_from = [options["resume_after"] for _, options in collection.watch_calls]
+    assert resumed_from == [None, {"_data": "/1"}, None, None]
+    assert hub.stats()["running"] is False
+
+
+def test_change_stream_hub_reports_missing_replica_set() -> None:
+    """A standalone server makes the hub give up instead of retrying forever."""
+    import time
+    from unittest.mock import MagicMock
+    from pymongo.errors import OperationFailure
+    from ..live_updates import CHANGE_STREAM_UNSUPPORTED, ChangeStreamHub
+
+    collection = MagicMock()
+    collection.watch.side_effect = OperationFailure("not a replica set", code=CHANGE_STREAM_UNSUPPORTED)
+    hub = ChangeStreamHub(lambda: collection, retry_delay=0)
+    hub.subscribe({"city": "Vilnius"})
+
+    deadline = time.monotonic() + 2
+    while hub.error is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert hub.error is not None
+    collection.watch.assert_called_once()
+
+
+def test_search_live_endpoint_streams_matching_listings(test_client: FlaskClient, test_user: Dict[str, Any]) -> None:
+    """The SSE endpoint sends listings matching the page's query as `listing` events."""
+    from .. import main
+
+    test_client.post("/login", data={
+        "username": test_user["username"],
+        "password": "Password@123"
+    })
+    assert test_client.get("/api/search/live?query=not-json").status_code == 400
+    assert test_client.get("/api/search/live?query=" + json.dumps({"street": "x"})).status_code == 400
+
+    collection = FakeReplicaSetCollection(FakeChangeStream([
+        _change("/kaunas", "Kaunas", 100.0), _change("/vilnius", "Vilnius", 100.0)
+    ]))
+    with patch.object(main.live_hub, "_collection_getter", lambda: collection):
+        response = test_client.get("/api/search/live?query=" + json.dumps({"city": "Vilnius"}), buffered=False)
+        assert response.mimetype == "text/event-stream"
+        chunks = response.iter_encoded()
+        assert next(chunks) == b": connected\n\n"
+        event = next(chunks).decode("utf-8")
+        response.close()
+
+    assert event.startswith("event: listing\n")
+    listing = json.loads(event.split("data: ", 1)[1])
+    assert (listing["url"], listing["operation"]) == ("/vilnius", "insert")
+    assert test_client.get("/metrics/live").get_json()["subscriptions"] == 0
+
+
 # -------------------------- Autocomplete Tests --------------------------
 
 def test_autocomplete_district_no_city(test_client: FlaskClient, test_user: Dict[str, Any]) -> None:
@@ -487,6 +1181,59 @@ def test_autocomplete_city(test_client: FlaskClient, test_user: Dict[str, Any])
     assert isinstance(response.get_json(), list)
 
 
+def test_autocomplete_index_serves_prefixes_from_memory() -> None:
+    """Lookups are answered from the cached index; Mongo is only read again after a new crawl."""
+    from unittest.mock import MagicMock
+    from ..autocomplete import AutocompleteIndex
+
+    db = MagicMock()
+    db.properties.aggregate.return_value = [
+        {"_id": {"city": "Vilnius", "district": "Žirmūnai", "street": "Žalgirio g."}, "count": 3},
+        {"_id": {"city": "Vilnius", "district": "Centras", "street": "Pilies g."}, "count": 5},
+        {"_id": {"city": "Vilnius", "district": "Centras", "street": "Pylimo g."}, "count": 1},
+        {"_id": {"city": "Vilnius", "district": "cento", "street": "N/A"}, "count": 9},
+        {"_id": {"city": "Kaunas", "district": "Centras", "street": "Laisvės al."}, "count": 2},
+    ]
+    meta = db.__getitem__.return_value
+    meta.find_one.return_value = {"version": 1}
+    index = AutocompleteIndex(ttl=3600)
+
+    assert index.cities(db) == ["Vilnius", "Kaunas"]
+    assert index.cities(db, "vil") == ["Vilnius"]
+    # Ranked by listing count, accent and case insensitive
+    assert index.districts(db, "Vilnius", "CEN") == ["cento", "Centras"]
+    assert index.districts(db, "Vilnius", "zirm") == ["Žirmūnai"]
+    assert index.districts(db, "Riga", "") == []
+    assert index.streets(db, "Vilnius", query="p") == ["Pilies g.", "Pylimo g."]
+    assert index.streets(db, "Vilnius", "Žirmūnai", "zalg") == ["Žalgirio g."]
+    assert index.streets(db, "Vilnius", query="p", limit=1) == ["Pilies g."]
+    assert index.streets(db, "Kaunas", query="laisves") == ["Laisvės al."]
+    assert db.properties.aggregate.call_count == 1
+    assert meta.find_one.call_count == 1
+
+    # TTL expired but no new crawl: the index is kept
+    index.ttl = 0
+    index.cities(db)
+    assert db.properties.aggregate.call_count == 1
+
+    meta.find_one.return_value = {"version": 2}
+    index.cities(db)
+    assert db.properties.aggregate.call_count == 2
+
+
+def test_autocomplete_street_endpoint(test_client: FlaskClient, test_user: Dict[str, Any]) -> None:
+    """Street suggestions need a city and treat regex characters in the prefix literally."""
+    test_client.post("/login", data={
+        "username": test_user["username"],
+        "password": "Password@123"
+    })
+
+    assert test_client.get("/autocomplete/street?q=Pil").get_json() == []
+    response = test_client.get("/autocomplete/street", query_string={"city": "Vilnius", "q": ".*("})
+    assert response.status_code == 200
+    assert response.get_json() == []
+
+
 def test_search_no_filters(test_client: FlaskClient) -> None:
     """Test search route with no filters returns a response."""
     response = test_client.post("/search", data={})
@@ -494,6 +1241,176 @@ def test_search_no_filters(test_client: FlaskClient) -> None:
     assert b"results" in response.data or b"No results found" in response.data
 
 
+def test_search_results_are_paginated_by_id(test_client: FlaskClient) -> None:
+    """Keyset pages cover every match exactly once and only carry the displayed fields."""
+    from ..main import find_results_page
+
+    mongo.db.properties.delete_many({"city": "Pagetown"})
+    mongo.db.properties.insert_many([
+        {"city": "Pagetown", "district": "A", "street": "S", "price": float(price), "size_m2": 50.0,
+         "price_per_m2": 1000, "number_of_rooms": 2, "url": f"/page-{price}/", "content_hash": "x"}
+        for price in range(5)
+    ])
+
+    first, cursor = find_results_page({"city": "Pagetown"}, page_size=2)
+    second, cursor = find_results_page({"city": "Pagetown"}, cursor, page_size=2)
+    third, cursor = find_results_page({"city": "Pagetown"}, cursor, page_size=2)
+
+    assert [len(first), len(second), len(third)] == [2, 2, 1]
+    assert cursor is None
+    assert len({doc["url"] for doc in first + second + third}) == 5
+    assert "content_hash" not in first[0] and "street" not in first[0]
+
+    mongo.db.properties.delete_many({"city": "Pagetown"})
+
+
+def test_search_stream_returns_ndjson(test_client: FlaskClient, test_user: Dict[str, Any]) -> None:
+    """The streaming API returns one JSON listing per line and resumes after a cursor."""
+    mongo.db.properties.delete_many({"city": "Streamtown"})
+    mongo.db.properties.insert_many([
+        {"city": "Streamtown", "district": "A", "street": "S", "price": float(price), "size_m2": 50.0,
+         "price_per_m2": 1000, "number_of_rooms": 2, "url": f"/stream-{price}/"}
+        for price in (100, 200, 300)
+    ])
+
+    test_client.post("/login", data={
+        "username": test_user["username"],
+        "password": "Password@123"
+    })
+
+    response = test_client.get("/api/search", query_string={"city": "Streamtown", "price_min": 150})
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [line["price"] for line in lines] == [200.0, 300.0]
+
+    resumed = test_client.get("/api/search", query_string={"city": "Streamtown", "after": lines[0]["id"]})
+    assert [json.loads(line)["price"] for line in resumed.data.decode().splitlines()] == [300.0]
+
+    assert test_client.get("/api/search", query_string={"after": "nope"}).status_code == 400
+
+    mongo.db.properties.delete_many({"city": "Streamtown"})
+
+
+# -------------------------- Result Cache --------------------------
+
+def test_canonical_key_ignores_key_order_and_number_types() -> None:
+    """Equivalent saved queries map to the same cache key."""
+    from ..result_cache import canonical_key
+
+    first = canonical_key(query={"city": "Vilnius", "price": {"$gte": 100000, "$lte": 200000}}, after=None)
+    second = canonical_key(after=None, query={"price": {"$lte": 200000.0, "$gte": 100000.0}, "city": "Vilnius"})
+    assert first == second
+    assert first != canonical_key(query={"city": "Kaunas"}, after=None)
+
+
+def test_incomplete_cache_backend_fails_when_created() -> None:
+    """A store missing one of get/set/clear is rejected when it is created."""
+    from ..result_cache import CacheBackend
+
+    class NoClear(CacheBackend):
+        def get(self, key: str) -> Any:
+            return None
+
+        def set(self, key: str, value: bytes) -> None:
+            pass
+
+    with pytest.raises(TypeError):
+        NoClear()
+
+
+def test_memory_backend_evicts_least_recently_used_within_budget() -> None:
+    """The in-process store stays within its byte budget by dropping the oldest entries."""
+    from ..result_cache import MemoryBackend
+
+    backend = MemoryBackend(max_bytes=10)
+    backend.set("a", b"1234")
+    backend.set("b", b"1234")
+    assert backend.get("a") == b"1234"  # "a" is now the most recently used
+    backend.set("c", b"1234")
+
+    assert backend.get("b") is None
+    assert backend.get("a") == b"1234" and backend.get("c") == b"1234"
+    assert backend.stats()["bytes"] == 8 and backend.stats()["evictions"] == 1
+    backend.set("huge", b"x" * 11)
+    assert backend.get("huge") is None
+
+
+def test_result_cache_hits_and_crawl_invalidation() -> None:
+    """Repeated queries are served from the cache until the crawl version changes."""
+    from unittest.mock import MagicMock
+    from ..result_cache import MemoryBackend, RedisBackend, ResultCache
+
+    class DictRedis:
+        """Minimal stand-in for a Redis client."""
+        def __init__(self) -> None:
+            self.data: Dict[str, bytes] = {}
+
+        def get(self, key: str) -> Any:
+            return self.data.get(key)
+
+        def set(self, key: str, value: bytes, ex: int = 0) -> None:
+            self.data[key] = value
+
+        def scan_iter(self, match: str) -> Any:
+            return [key for key in list(self.data) if key.startswith(match.rstrip("*"))]
+
+        def delete(self, key: str) -> None:
+            self.data.pop(key, None)
+
+    for backend in (MemoryBackend(), RedisBackend(DictRedis())):
+        db = MagicMock()
+        meta = db.__getitem__.return_value
+        meta.find_one.return_value = {"version": 1}
+        cache = ResultCache(backend, version_check_interval=0)
+        compute = MagicMock(return_value=([{"_id": ObjectId(), "city": "Vilnius"}], None))
+
+        first = cache.get_or_compute(db, compute, query={"city": "Vilnius"}, after=None)
+        results, next_after = cache.get_or_compute(db, compute, query={"city": "Vilnius"}, after=None)
+        assert compute.call_count == 1
+        assert results == first[0] and next_after is None
+
+        meta.find_one.return_value = {"version": 2}
+        cache.get_or_compute(db, compute, query={"city": "Vilnius"}, after=None)
+        assert compute.call_count == 2
+
+        metrics = cache.metrics()
+        assert (metrics["hits"], metrics["misses"]) == (1, 2)
+        assert metrics["hit_ratio"] == pytest.approx(1 / 3)
+        assert metrics["backend"] == backend.name
+
+
+def test_cache_metrics_endpoint(test_client: FlaskClient, test_user: Dict[str, Any]) -> None:
+    """Re-running a search is a cache hit and shows up in the metrics."""
+    test_client.post("/login", data={
+        "username": test_user["username"],
+        "password": "Password@123"
+    })
+
+    before = test_client.get("/metrics/cache").get_json()
+    test_client.post("/rerun_search", data={"query": json.dumps({"city": "Metricsville"})})
+    test_client.post("/rerun_search", data={"query": json.dumps({"city": "Metricsville"})})
+    after = test_client.get("/metrics/cache").get_json()
+
+    assert after["hits"] - before["hits"] >= 1
+    assert 0.0 <= after["hit_ratio"] <= 1.0
+
+
+def test_pool_metrics_endpoint(test_client: FlaskClient, test_user: Dict[str, Any]) -> None:
+    """The pool metrics report the configured pool size next to the listener counters."""
+    from scraper_mongodb.mongo_settings import mongo_settings
+
+    test_client.post("/login", data={
+        "username": test_user["username"],
+        "password": "Password@123"
+    })
+
+    response = test_client.get("/metrics/pool")
+    assert response.status_code == 200
+    metrics = response.get_json()
+    assert metrics["max_pool_size"] == mongo_settings()["max_pool_size"]
+    assert {"open_connections", "in_use", "checkouts", "avg_checkout_wait_ms"} <= set(metrics)
+
+
 # -------------------------- Saved Searches & Analysis Page Access Control --------------------------
 
 def test_search_city_filter(test_client: FlaskClient) -> None:
@@ -0,0 +1,102 @@
+"""
+Cache of user documents in front of `load_user`, which Flask-Login calls on every
+authenticated request.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Cache size used unless the USER_CACHE_SIZE environment variable is set
+USER_CACHE_SIZE: int = 1024
+# Seconds a cached user stays valid unless the USER_CACHE_TTL environment variable is set
+USER_CACHE_TTL: float = 300.0
+
+
+class UserCache:
+    """
+    LRU cache of user documents by id, with entries expiring after `ttl` seconds.
+
+    The TTL bounds how long a change made outside this process (e.g. by another worker) can
+    go unnoticed; changes made here should call `invalidate`.
+    """
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0) -> None:
+        self.max_entries: int = max_entries
+        self.ttl: float = ttl
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached user document, or None if it is missing or expired.
+
+        Args:
+            user_id (str): Stringified user `_id`.
+
+        Returns:
+            Optional[Dict[str, Any]]: The user document.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or time.monotonic() - entry[0] >= self.ttl:
+                self._entries.pop(user_id, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, user_id: str, user_data: Dict[str, Any]) -> None:
+        """
+        Store a user document, evicting the least recently used one when full.
+
+        Args:
+            user_id (str): Stringified user `_id`.
+            user_data (Dict[str, Any]): The user document.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._entries[user_id] = (time.monotonic(), user_data)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        """
+        Drop a user, after logout or after their document changed.
+
+        Args:
+            user_id (str): Stringified user `_id`.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count and hit/miss counters."""
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def create_user_cache(environ: Optional[Dict[str, str]] = None) -> UserCache:
+    """
+    Create the user cache sized by the environment, like the shared MongoDB settings.
+
+    Empty variables are ignored, so the defaults apply.
+
+    Args:
+        environ (Optional[Dict[str, str]]): Environment to read, defaults to `os.environ`.
+
+    Returns:
+        UserCache: A cache of `USER_CACHE_SIZE` entries expiring after `USER_CACHE_TTL` seconds.
+    """
+    if environ is None:
+        environ = dict(os.environ)
+    max_entries = int(environ.get("USER_CACHE_SIZE") or USER_CACHE_SIZE)
+    ttl = float(environ.get("USER_CACHE_TTL") or USER_CACHE_TTL)
+    return UserCache(max_entries, ttl)
@@ -0,0 +1,99 @@
+"""
+Time to match a crawl delta against many saved searches with the compiled index in
+scraper_mongodb/alerts.py, versus evaluating every saved query against every listing.
+
+Runs in memory (no MongoDB needed). The per-query baseline stands in for one `find` per
+saved search without the round trips, so it is a lower bound for that approach; it is
+timed on a sample of the delta and scaled up.
+
+Run from the project root:
+
+    python -m benchmarks.bench_alerts --searches 100000 --delta 5000
+"""
+import argparse
+import random
+import time
+from typing import Any, Dict, List
+
+from scraper_mongodb.alerts import SavedSearchIndex
+from .synthetic import cities, make_listings
+
+
+def make_saved_search(index: int, rng: random.Random) -> Dict[str, Any]:
+    """
+    Build one saved search shaped like the queries stored by the search form.
+
+    Args:
+        index (int): Sequence number.
+        rng (random.Random): Random generator.
+
+    Returns:
+        Dict[str, Any]: A saved search document.
+    """
+    city = rng.choice(list(cities))
+    query: Dict[str, Any] = {"city": city}
+    if rng.random() < 0.5:
+        query["district"] = rng.choice(cities[city])
+    low = rng.randint(2, 30) * 10000
+    query["price"] = {"$gte": low, "$lte": low + rng.randint(2, 20) * 10000}
+    if rng.random() < 0.4:
+        query["number_of_rooms"] = rng.randint(1, 5)
+    if rng.random() < 0.3:
+        query["size_m2"] = {"$gte": rng.randint(20, 60)}
+    if rng.random() < 0.2:
+        query["price_per_m2"] = {"$lte": rng.randint(1500, 4000)}
+    return {"_id": index, "user_id": str(index % 5000), "name": f"search {index}", "query": query}
+
+
+def _matches_query(listing: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """Evaluate one saved query against one listing, field by field."""
+    for field, condition in query.items():
+        value = listing.get(field)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+        if value is None:
+            return False
+        if "$gte" in condition and value < condition["$gte"]:
+            return False
+        if "$lte" in condition and value > condition["$lte"]:
+            return False
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--searches", type=int, default=100000)
+    parser.add_argument("--delta", type=int, default=5000, help="New or changed listings of the crawl.")
+    parser.add_argument("--baseline-sample", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    searches: List[Dict[str, Any]] = [make_saved_search(i, rng) for i in range(args.searches)]
+    listings = make_listings(args.delta, seed=11)
+
+    start = time.perf_counter()
+    index = SavedSearchIndex(searches)
+    compile_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matches = sum(len(index.match(listing)) for listing in listings)
+    match_seconds = time.perf_counter() - start
+
+    sample = listings[:args.baseline_sample]
+    start = time.perf_counter()
+    sample_matches = sum(_matches_query(listing, search["query"]) for listing in sample for search in searches)
+    baseline_seconds = (time.perf_counter() - start) * len(listings) / max(len(sample), 1)
+    indexed_sample = sum(len(index.match(listing)) for listing in sample)
+    assert sample_matches == indexed_sample, "index and per-query evaluation disagree"
+
+    print(f"{args.searches} saved searches, {args.delta} listings, {matches} matches.\n")
+    print(f"{'variant':<28} {'seconds':>9}")
+    print(f"{'compile index':<28} {compile_seconds:>9.2f}")
+    print(f"{'match with index':<28} {match_seconds:>9.2f}")
+    print(f"{'per-query evaluation (est.)':<28} {baseline_seconds:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Crawl throughput of the sequential requests loop against the asyncio engine, on a local
+mock listing site with a fixed per-request latency.
+
+Run from the project root (needs a running MongoDB, writes to a throwaway database):
+
+    python -m benchmarks.bench_async_crawl --pages 200 --latency 0.05
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+from typing import Callable, Dict
+
+from pymongo import MongoClient
+
+from scraper_mongodb.aruodas_scraper import _scrape_pages
+from scraper_mongodb.async_scraper import crawl_async
+from scraper_mongodb.categories import DEFAULT_CATEGORY, get_category
+from scraper_mongodb.fetchers import RequestsFetcher
+from scraper_mongodb.properties_mongo_db import PropertyWriter
+from .mock_site import MockListingSite
+
+
+def _timed(run: Callable[[], None]) -> float:
+    """Run `run` with its console output silenced and return the wall-clock time in seconds."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="Server delay per request in seconds.")
+    args = parser.parse_args()
+
+    client: MongoClient = MongoClient(args.uri)
+    collection = client["aruodas_benchmark"]["properties"]
+    results: Dict[str, float] = {}
+
+    with MockListingSite(pages=args.pages, listings_per_page=args.per_page, latency=args.latency) as site:
+        def sequential() -> None:
+            with RequestsFetcher() as fetcher, PropertyWriter(collection, snapshot_dir="") as writer:
+                _scrape_pages(fetcher, writer, get_category(DEFAULT_CATEGORY), site.base_url, 1)
+
+        collection.drop()
+        results["sequential (requests)"] = _timed(sequential)
+
+        for concurrency in (1, 4, 16, 32):
+            collection.drop()
+            results[f"asyncio, {concurrency} in flight"] = _timed(lambda: asyncio.run(crawl_async(
+                base_url=site.base_url, concurrency=concurrency, rate=10000, burst=concurrency,
+                writer=PropertyWriter(collection, snapshot_dir="")
+            )))
+
+    pages = args.pages + 1  # the empty page that ends the crawl is fetched too
+    listings = args.pages * args.per_page
+    baseline = results["sequential (requests)"]
+    print(f"{args.pages} pages x {args.per_page} listings, {args.latency * 1000:.0f} ms server latency\n")
+    print(f"{'mode':<26} {'seconds':>8} {'pages/s':>9} {'listings/s':>11} {'speedup':>8}")
+    for mode, seconds in results.items():
+        print(f"{mode:<26} {seconds:>8.2f} {pages / seconds:>9.1f} {listings / seconds:>11.0f} "
+              f"{baseline / seconds:>7.1f}x")
+
+    client.drop_database("aruodas_benchmark")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Autocomplete latency: case-insensitive `$regex` distinct queries (the old endpoints) versus
+the in-memory accent-folded prefix index in app/autocomplete.py.
+
+Run from the project root (needs a running MongoDB, uses a throwaway database):
+
+    python -m benchmarks.bench_autocomplete --listings 200000
+"""
+import argparse
+import re
+import statistics
+import time
+from typing import Callable, Dict, List, Tuple
+
+from pymongo import MongoClient
+
+from app.autocomplete import AutocompleteIndex
+from scraper_mongodb.indexes import ensure_indexes
+from .synthetic import make_listings
+
+
+# (city, typed prefix) pairs, the way Select2 sends them while the user types
+district_lookups: List[Tuple[str, str]] = [("Vilnius", ""), ("Vilnius", "ž"), ("Vilnius", "Žirm"), ("Kaunas", "ce")]
+street_lookups: List[Tuple[str, str]] = [("Vilnius", "g"), ("Vilnius", "Gatvė 1"), ("Kaunas", "gatve 2")]
+
+
+def _median_us(action: Callable[[], object], repeat: int) -> float:
+    """Run `action` `repeat` times and return the median latency in microseconds."""
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--listings", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    client: MongoClient = MongoClient(args.uri)
+    db = client["aruodas_benchmark"]
+    db.drop_collection("properties")
+    for start in range(0, args.listings, 50000):
+        db.properties.insert_many(make_listings(min(50000, args.listings - start), seed=start))
+    ensure_indexes(db.properties)
+    print(f"Inserted {args.listings} synthetic listings.\n")
+
+    index = AutocompleteIndex(ttl=float("inf"))
+    start = time.perf_counter()
+    index.refresh(db)
+    print(f"Index built in {(time.perf_counter() - start) * 1000:.1f} ms.\n")
+
+    results: Dict[str, Tuple[float, float]] = {}
+    for city, prefix in district_lookups:
+        regex = {"$regex": f"^{re.escape(prefix)}", "$options": "i"}
+        results[f"district {city!r} {prefix!r}"] = (
+            _median_us(lambda: sorted(db.properties.distinct("district", {"city": city, "district": regex})),
+                       args.repeat),
+            _median_us(lambda: index.districts(db, city, prefix), args.repeat),
+        )
+    for city, prefix in street_lookups:
+        regex = {"$regex": f"^{re.escape(prefix)}", "$options": "i"}
+        results[f"street {city!r} {prefix!r}"] = (
+            _median_us(lambda: sorted(db.properties.distinct("street", {"city": city, "street": regex})),
+                       args.repeat),
+            _median_us(lambda: index.streets(db, city, query=prefix, limit=50), args.repeat),
+        )
+
+    print(f"{'lookup':<32} {'$regex (us)':>12} {'index (us)':>11} {'speedup':>9}")
+    for name, (regex_us, index_us) in results.items():
+        print(f"{name:<32} {regex_us:>12.1f} {index_us:>11.1f} {regex_us / index_us if index_us else 0:>8.0f}x")
+
+    client.drop_database("aruodas_benchmark")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Import time of the scraper package with no MongoDB server reachable.
+
+Each import runs in a fresh interpreter with MONGO_URI pointing at a closed port, so any
+connection attempt at import time would show up as a server selection timeout.
+
+Run from the project root (no database needed):
+
+    python -m benchmarks.bench_import --repeat 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+
+# Module -> statement timed in the child interpreter
+imports: Dict[str, str] = {
+    "scraper_mongodb": "import scraper_mongodb",
+    "scraper_mongodb.parser": "import scraper_mongodb.parser",
+    "scraper_mongodb.properties_mongo_db": "import scraper_mongodb.properties_mongo_db",
+    "get_db() (no round trip)": "from scraper_mongodb.properties_mongo_db import get_db; get_db()",
+}
+
+timer: str = "import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)"
+
+
+def _time_import(statement: str, env: Dict[str, str]) -> float:
+    """Run `statement` in a new interpreter and return its duration in milliseconds."""
+    output = subprocess.run(
+        [sys.executable, "-c", timer.format(statement=statement)],
+        env=env, capture_output=True, text=True, check=True, timeout=120
+    ).stdout
+    return float(output.strip().splitlines()[-1]) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--uri", default="mongodb://127.0.0.1:1/",
+                        help="URI of a server that is not running.")
+    args = parser.parse_args()
+
+    env = {**os.environ, "MONGO_URI": args.uri}
+    print(f"{'import':<40} {'median (ms)':>12} {'max (ms)':>10}")
+    for name, statement in imports.items():
+        timings: List[float] = [_time_import(statement, env) for _ in range(args.repeat)]
+        print(f"{name:<40} {statistics.median(timings):>12.1f} {max(timings):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
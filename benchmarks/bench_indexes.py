@@ -0,0 +1,105 @@
+"""
+Upsert and search latency on the 'properties' collection with and without the indexes
+declared in scraper_mongodb/indexes.py.
+
+Run from the project root (needs a running MongoDB, uses a throwaway database):
+
+    python -m benchmarks.bench_indexes --listings 50000
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from pymongo import MongoClient, UpdateOne
+from pymongo.collection import Collection
+
+from scraper_mongodb.indexes import ensure_indexes, explain_query_shapes, search_query_shapes
+from .synthetic import make_listings
+
+
+def _median_ms(action: Callable[[], None], repeat: int) -> float:
+    """
+    Run `action` `repeat` times and return the median latency in milliseconds.
+    """
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def measure(collection: Collection, urls: List[str], repeat: int) -> Dict[str, float]:
+    """
+    Measure the median latency of one upsert and of each search query shape.
+
+    Args:
+        collection (Collection): Collection filled with synthetic listings.
+        urls (List[str]): URLs of the stored listings, used for the upserts.
+        repeat (int): Number of runs per measurement.
+
+    Returns:
+        Dict[str, float]: Measurement name mapped to median latency in ms.
+    """
+    rng = random.Random(7)
+    results: Dict[str, float] = {}
+
+    results["upsert (update_one by url)"] = _median_ms(
+        lambda: collection.update_one(
+            {"url": rng.choice(urls)}, {"$set": {"price": float(rng.randint(50000, 300000))}}, upsert=True
+        ),
+        repeat,
+    )
+
+    def bulk_upsert() -> None:
+        collection.bulk_write([
+            UpdateOne({"url": url}, {"$set": {"price_per_m2": rng.randint(900, 4500)}}, upsert=True)
+            for url in rng.sample(urls, 500)
+        ], ordered=False)
+
+    results["upsert (bulk_write of 500)"] = _median_ms(bulk_upsert, max(1, repeat // 10))
+
+    for shape, query in search_query_shapes.items():
+        if shape == "upsert by url":
+            continue
+        results[f"search: {shape}"] = _median_ms(lambda: list(collection.find(query)), repeat)
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--listings", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    client: MongoClient = MongoClient(args.uri)
+    db = client["aruodas_benchmark"]
+    db.drop_collection("properties")
+    collection = db["properties"]
+
+    listings = make_listings(args.listings)
+    collection.insert_many(listings)
+    urls = [listing["url"] for listing in listings]
+    print(f"Inserted {len(listings)} synthetic listings.\n")
+
+    without_indexes = measure(collection, urls, args.repeat)
+    ensure_indexes(collection)
+    with_indexes = measure(collection, urls, args.repeat)
+
+    print(f"\n{'measurement':<40} {'no index (ms)':>14} {'indexed (ms)':>14} {'speedup':>9}")
+    for name, before in without_indexes.items():
+        after = with_indexes[name]
+        print(f"{name:<40} {before:>14.3f} {after:>14.3f} {before / after if after else 0:>8.1f}x")
+
+    print("\nIndexes chosen by the planner:")
+    explain_query_shapes(collection)
+
+    client.drop_database("aruodas_benchmark")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Latency and worker memory of the /analyze_median computation: pandas in the web worker
+versus the aggregation pipelines in app/analytics.py and the memory-mapped NumPy snapshot
+(scraper_mongodb/listing_snapshot.py).
+
+Memory is the peak of Python allocations made while answering one request (tracemalloc),
+plus the growth of the process' peak RSS where the platform reports it.
+
+Run from the project root (needs a running MongoDB, uses a throwaway database):
+
+    python -m benchmarks.bench_median --listings 500000
+"""
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from pymongo import MongoClient
+from pymongo.collection import Collection
+
+from app.analytics import medians_by_city, medians_by_city_pandas, supports_median_operator
+from scraper_mongodb.listing_snapshot import load_snapshot, write_snapshot
+from .synthetic import make_listings
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB, or 0 where it is not available."""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def measure(action: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """
+    Run `action` `repeat` times and report its median latency and memory use.
+
+    Args:
+        action (Callable[[], object]): One median computation.
+        repeat (int): Number of timed runs.
+
+    Returns:
+        Dict[str, float]: Median latency (ms), peak traced allocation (MB) and RSS growth (MB).
+    """
+    rss_before = _peak_rss_mb()
+    tracemalloc.start()
+    action()
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_growth = _peak_rss_mb() - rss_before
+
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "ms": statistics.median(timings),
+        "traced_mb": traced_peak / 1024 / 1024,
+        "rss_growth_mb": rss_growth,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--listings", type=int, default=500000)
+    parser.add_argument("--field", default="price_per_m2")
+    parser.add_argument("--limit", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    client: MongoClient = MongoClient(args.uri)
+    db = client["aruodas_benchmark"]
+    db.drop_collection("properties")
+    collection: Collection = db["properties"]
+
+    for start in range(0, args.listings, 50000):
+        collection.insert_many(make_listings(min(50000, args.listings - start), seed=start))
+    print(f"Inserted {args.listings} synthetic listings.\n")
+
+    variants: Dict[str, Callable[[], object]] = {
+        "sorted $push pipeline": lambda: medians_by_city(collection, args.field, limit=args.limit, use_operator=False),
+    }
+    if supports_median_operator(collection):
+        variants["$median pipeline (approximate)"] = lambda: medians_by_city(
+            collection, args.field, limit=args.limit, use_operator=True
+        )
+    else:
+        print("Server is older than MongoDB 7.0, skipping the $median pipeline.\n")
+    snapshot_dir = tempfile.mkdtemp(prefix="aruodas_snapshot_")
+    start = time.perf_counter()
+    write_snapshot(collection, snapshot_dir)
+    print(f"Snapshot written in {(time.perf_counter() - start) * 1000:.0f} ms.\n")
+    variants["NumPy snapshot (mmap)"] = lambda: load_snapshot(snapshot_dir).medians_by_city(
+        args.field, limit=args.limit
+    )
+    # pandas last: its allocations raise the process' peak RSS for everything measured after it
+    variants["pandas in the worker"] = lambda: medians_by_city_pandas(collection, args.field, limit=args.limit)
+
+    print(f"{'variant':<24} {'latency (ms)':>13} {'traced peak (MB)':>17} {'peak RSS growth (MB)':>21}")
+    for name, action in variants.items():
+        result = measure(action, args.repeat)
+        print(f"{name:<24} {result['ms']:>13.1f} {result['traced_mb']:>17.1f} {result['rss_growth_mb']:>21.1f}")
+
+    client.drop_database("aruodas_benchmark")
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
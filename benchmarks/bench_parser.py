@@ -0,0 +1,63 @@
+"""
+Listings parsed per second by each parser backend in scraper_mongodb/parser.py.
+
+By default the benchmark renders synthetic listing pages; pass saved aruodas.lt pages with
+--html to measure on real markup. Both backends must return the same listings.
+
+Run from the project root:
+
+    python -m benchmarks.bench_parser --pages 50
+    python -m benchmarks.bench_parser --html saved/puslapis-1.html saved/puslapis-2.html
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import List
+
+from scraper_mongodb.parser import parse_listing_page, parser_backends
+from .mock_site import render_listing_page
+from .synthetic import make_listings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--html", nargs="*", default=[], help="Saved listing pages to parse.")
+    parser.add_argument("--pages", type=int, default=50, help="Synthetic pages when no --html is given.")
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.html:
+        pages: List[str] = [Path(path).read_text(encoding="utf-8") for path in args.html]
+    else:
+        listings = make_listings(args.pages * args.per_page)
+        pages = [
+            render_listing_page(listings[i:i + args.per_page])
+            for i in range(0, len(listings), args.per_page)
+        ]
+
+    reference = [parse_listing_page(html, backend="bs4") for html in pages]
+    listing_count = sum(len(listings) for listings in reference)
+    print(f"{len(pages)} pages, {listing_count} listings, best of {args.rounds} rounds\n")
+    print(f"{'backend':<8} {'seconds':>9} {'pages/s':>9} {'listings/s':>11} {'speedup':>8}")
+
+    timings = {}
+    for backend in parser_backends:
+        assert [parse_listing_page(html, backend=backend) for html in pages] == reference, \
+            f"{backend} output differs from the bs4 reference"
+
+        best = float("inf")
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            for html in pages:
+                parse_listing_page(html, backend=backend)
+            best = min(best, time.perf_counter() - start)
+        timings[backend] = best
+
+    for backend, seconds in timings.items():
+        print(f"{backend:<8} {seconds:>9.3f} {len(pages) / seconds:>9.0f} {listing_count / seconds:>11.0f} "
+              f"{timings['bs4'] / seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+from .synthetic import make_listings
+
+
+# Listing card markup, the same shape the scraper parses on aruodas.lt
+CARD_TEMPLATE = """
+<div class="list-row-v2 object-row selflat advert">
+  <div class="advert-flex">
+    <a href="{url}"><img title="{city}, {district}, {street} | Butas" /></a>
+    <span class="list-item-price-v2">{price_text} €</span>
+    <span class="price-pm-v2">{price_per_m2} €/m²</span>
+    <div class="list-RoomNum-v2 list-detail-v2">{number_of_rooms}</div>
+    <div class="list-AreaOverall-v2 list-detail-v2">{size_m2}</div>
+  </div>
+</div>
+"""
+
+
+def render_listing_page(listings: List[Dict[str, Any]]) -> str:
+    """
+    Render listings as an aruodas.lt-like listing page.
+
+    Args:
+        listings (List[Dict[str, Any]]): Listings in the scraper's document format.
+
+    Returns:
+        str: The page HTML.
+    """
+    cards = "".join(
+        CARD_TEMPLATE.format(price_text=f"{listing['price']:,.0f}".replace(",", " "), **listing)
+        for listing in listings
+    )
+    return f"<html><body><div class='list-search-v2'>{cards}</div></body></html>"
+
+
+class MockListingSite:
+    """
+    Local HTTP server that serves `pages` synthetic listing pages under /butai/puslapis/{n}/.
+
+    Every response is delayed by `latency` seconds to stand in for the network round trip.
+    Use as a context manager; `base_url` is the category URL to pass to the scrapers.
+    """
+    def __init__(self, pages: int = 100, listings_per_page: int = 20, latency: float = 0.05) -> None:
+        listings = make_listings(pages * listings_per_page)
+        self.pages: Dict[int, bytes] = {
+            page: render_listing_page(
+                listings[(page - 1) * listings_per_page:page * listings_per_page]
+            ).encode("utf-8")
+            for page in range(1, pages + 1)
+        }
+        self.latency: float = latency
+        self.requests_served: int = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.base_url: str = f"http://127.0.0.1:{self._server.server_port}/butai/"
+
+    def _handler(self) -> type:
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                time.sleep(site.latency)
+                site.requests_served += 1
+                page = int(self.path.rstrip("/").rsplit("/", 1)[-1])
+                body = site.pages.get(page, b"<html><body></body></html>")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "MockListingSite":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._server.shutdown()
+        self._server.server_close()
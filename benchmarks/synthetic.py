@@ -0,0 +1,57 @@
+import random
+from typing import Any, Dict, List
+
+
+# City -> districts used to generate realistic looking listings
+cities: Dict[str, List[str]] = {
+    "Vilnius": ["Senamiestis", "Naujamiestis", "Žirmūnai", "Antakalnis", "Pašilaičiai", "Fabijoniškės"],
+    "Kaunas": ["Centras", "Žaliakalnis", "Šilainiai", "Dainava", "Aleksotas"],
+    "Klaipėda": ["Centras", "Bandužiai", "Debrecenas", "Smiltynė"],
+    "Šiauliai": ["Centras", "Lieporiai", "Dainiai"],
+    "Panevėžys": ["Centras", "Klaipėdos", "Molainiai"],
+    "Alytus": ["Centras", "Putinai"],
+    "Mažeikiai": ["Centras"],
+}
+
+
+def make_listing(index: int, rng: random.Random) -> Dict[str, Any]:
+    """
+    Build one synthetic listing shaped like the documents stored by the scraper.
+
+    Args:
+        index (int): Sequence number, used to build a unique URL.
+        rng (random.Random): Random generator, seeded by the caller for repeatable runs.
+
+    Returns:
+        Dict[str, Any]: A listing document.
+    """
+    city = rng.choice(list(cities))
+    district = rng.choice(cities[city])
+    rooms = rng.randint(1, 5)
+    size_m2 = round(rng.uniform(18, 35) * rooms, 1)
+    price_per_m2 = rng.randint(900, 4500)
+    return {
+        "city": city,
+        "district": district,
+        "street": f"Gatvė {rng.randint(1, 300)}",
+        "price": float(round(size_m2 * price_per_m2, -2)),
+        "size_m2": size_m2,
+        "price_per_m2": price_per_m2,
+        "number_of_rooms": rooms,
+        "url": f"https://www.aruodas.lt/{index}-{rng.randint(1, 9)}/",
+    }
+
+
+def make_listings(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """
+    Build `count` synthetic listings.
+
+    Args:
+        count (int): Number of listings to generate.
+        seed (int): Random seed.
+
+    Returns:
+        List[Dict[str, Any]]: The generated listings.
+    """
+    rng = random.Random(seed)
+    return [make_listing(i, rng) for i in range(count)]
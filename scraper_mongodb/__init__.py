@@ -1 +1,14 @@
-from . import aruodas_scraper
+import importlib
+from types import ModuleType
+
+
+def __getattr__(name: str) -> ModuleType:
+    """
+    Import submodules on first attribute access, so `import scraper_mongodb` stays cheap.
+
+    The scraper pulls in Selenium, requests and pymongo; tools that only need the parser or
+    the schema should not pay for them.
+    """
+    if name in ("aruodas_scraper", "async_scraper", "properties_mongo_db"):
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
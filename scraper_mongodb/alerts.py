@@ -0,0 +1,237 @@
+"""
+Saved-search alerts: match the listings written by a crawl against every saved search.
+
+Saved queries are compiled once per run into a `SavedSearchIndex`: searches are bucketed
+by their category and city/district equality filters, and inside each bucket their price, size, price
+per m² and room ranges are kept in NumPy arrays sorted by the lower price bound. A listing
+is checked only against the buckets its city and district can match, and only against the
+searches whose lower price bound is at or below its price (one binary search), with the
+remaining ranges compared in one vectorized step. A search without a category, like one
+saved before categories existed, only matches apartments. Matches are upserted into the
+'alert_matches' collection, the per-user "new matches" feed read by the web app.
+"""
+
+import math
+import time
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from pymongo import UpdateOne
+from pymongo.database import Database
+
+from .categories import DEFAULT_CATEGORY, category_filter
+from .indexes import alert_match_indexes, ensure_indexes
+
+
+alert_collection_name: str = "alert_matches"
+
+# Numeric listing fields a saved search can restrict, in array column order
+range_fields: List[str] = ["price", "size_m2", "price_per_m2", "number_of_rooms"]
+# Fields a saved search can compare for equality; they select the bucket
+bucket_fields: List[str] = ["city", "district"]
+# Listing fields copied into each feed entry
+feed_fields: List[str] = [
+    "url", "category", "city", "district", "street", "price", "size_m2", "price_per_m2", "number_of_rooms"
+]
+
+# (category, city, district); None city or district means any
+BucketKey = Tuple[str, Optional[str], Optional[str]]
+
+
+class UnsupportedQuery(ValueError):
+    """A saved query uses a field or operator the index cannot evaluate."""
+
+
+def compile_query(query: Dict[str, Any]) -> Tuple[BucketKey, List[Tuple[float, float]]]:
+    """
+    Translate a saved search query into its bucket key and one closed range per range field.
+
+    Args:
+        query (Dict[str, Any]): A query as produced by the search form: the category filter
+                                (see `categories.category_filter`), equality on city,
+                                district and number_of_rooms, `$gte`/`$gt`/`$lte`/`$lt` on
+                                price, size_m2 and price_per_m2.
+
+    Returns:
+        Tuple[BucketKey, List[Tuple[float, float]]]: (category, city, district), `DEFAULT_CATEGORY`
+                                                     for a query without one and None meaning any
+                                                     city or district, and (low, high) per field
+                                                     in `range_fields`.
+
+    Raises:
+        UnsupportedQuery: If the query uses anything else.
+    """
+    ranges: Dict[str, List[float]] = {field: [-math.inf, math.inf] for field in range_fields}
+    key: Dict[str, Optional[str]] = {field: None for field in bucket_fields}
+    category: str = DEFAULT_CATEGORY
+
+    for field, condition in query.items():
+        if field == "category":
+            if condition == category_filter(DEFAULT_CATEGORY)["category"]:
+                category = DEFAULT_CATEGORY
+            elif isinstance(condition, str):
+                category = condition
+            else:
+                raise UnsupportedQuery(f"category {condition!r}")
+            continue
+        if field in bucket_fields and isinstance(condition, str):
+            key[field] = condition
+            continue
+        if field not in range_fields:
+            raise UnsupportedQuery(f"field '{field}'")
+
+        bounds = ranges[field]
+        operators = condition if isinstance(condition, dict) else {"$eq": condition}
+        for operator, raw in operators.items():
+            try:
+                value = float(raw)
+            except (TypeError, ValueError):
+                raise UnsupportedQuery(f"value {raw!r} of '{field}'")
+            if operator in ("$eq", "$gte", "$gt"):
+                # A strict bound is the closest float beyond the value
+                low = math.nextafter(value, math.inf) if operator == "$gt" else value
+                bounds[0] = max(bounds[0], low)
+            if operator in ("$eq", "$lte", "$lt"):
+                high = math.nextafter(value, -math.inf) if operator == "$lt" else value
+                bounds[1] = min(bounds[1], high)
+            if operator not in ("$eq", "$gte", "$gt", "$lte", "$lt"):
+                raise UnsupportedQuery(f"operator '{operator}'")
+
+    return (category, key["city"], key["district"]), [tuple(ranges[field]) for field in range_fields]
+
+
+def bucket_keys(listing: Dict[str, Any]) -> List[BucketKey]:
+    """Return the (at most four) bucket keys whose searches a listing can match."""
+    category = listing.get("category") or DEFAULT_CATEGORY
+    city, district = listing.get("city"), listing.get("district")
+    return list({(category, city, district), (category, city, None), (category, None, district),
+                 (category, None, None)})
+
+
+class _Bucket:
+    """Range arrays of the searches sharing one bucket key, sorted by lower price bound."""
+    def __init__(self, searches: List[Tuple[int, List[Tuple[float, float]]]]) -> None:
+        searches.sort(key=lambda search: search[1][0][0])
+        self.ids: np.ndarray = np.array([search_id for search_id, _ in searches], dtype=np.int64)
+        bounds = np.array([ranges for _, ranges in searches], dtype=np.float64).reshape(len(searches), -1, 2)
+        self.low: np.ndarray = bounds[:, :, 0]
+        self.high: np.ndarray = bounds[:, :, 1]
+        self.price_low: List[float] = self.low[:, 0].tolist()
+        # A missing listing value only passes searches that do not restrict that field
+        self.unrestricted: np.ndarray = (self.low == -math.inf) & (self.high == math.inf)
+
+    def match(self, values: np.ndarray) -> np.ndarray:
+        """Positions in `ids` of the searches whose ranges all contain `values` (NaN = missing)."""
+        price = values[0]
+        end = len(self.price_low) if math.isnan(price) else bisect_right(self.price_low, price)
+        if end == 0:
+            return self.ids[:0]
+
+        low, high = self.low[:end], self.high[:end]
+        missing = np.isnan(values)
+        with np.errstate(invalid="ignore"):
+            inside = (low <= values) & (values <= high)
+        inside[:, missing] = self.unrestricted[:end][:, missing]
+        return self.ids[:end][inside.all(axis=1)]
+
+
+class SavedSearchIndex:
+    """
+    All saved searches compiled for matching many listings at once.
+
+    Attributes:
+        searches (List[Dict[str, Any]]): The compiled searches' documents, indexed by position.
+        unsupported (int): Number of saved searches skipped because of their query.
+    """
+    def __init__(self, saved_searches: Iterable[Dict[str, Any]]) -> None:
+        self.searches: List[Dict[str, Any]] = []
+        self.unsupported: int = 0
+        grouped: Dict[BucketKey, List[Tuple[int, List[Tuple[float, float]]]]] = {}
+
+        for search in saved_searches:
+            try:
+                key, ranges = compile_query(search.get("query") or {})
+            except UnsupportedQuery:
+                self.unsupported += 1
+                continue
+            grouped.setdefault(key, []).append((len(self.searches), ranges))
+            self.searches.append(search)
+
+        self._buckets: Dict[BucketKey, _Bucket] = {key: _Bucket(items) for key, items in grouped.items()}
+
+    def __len__(self) -> int:
+        return len(self.searches)
+
+    def match(self, listing: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Return the saved searches that `listing` matches.
+
+        Args:
+            listing (Dict[str, Any]): A listing document.
+
+        Returns:
+            List[Dict[str, Any]]: The matching saved search documents.
+        """
+        values = np.array(
+            [float(value) if isinstance(value, (int, float)) else math.nan
+             for value in (listing.get(field) for field in range_fields)],
+            dtype=np.float64
+        )
+        matched: List[Dict[str, Any]] = []
+        for key in bucket_keys(listing):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                matched.extend(self.searches[position] for position in bucket.match(values))
+        return matched
+
+
+def match_saved_searches(
+    db: Database,
+    listings: List[Dict[str, Any]],
+    matched_at: Optional[datetime] = None
+) -> Dict[str, int]:
+    """
+    Match new or changed listings against every saved search and add the hits to the feed.
+
+    A listing that matches the same saved search again (e.g. after a price change) updates
+    the existing feed entry and marks it unseen.
+
+    Args:
+        db (Database): The scraper database.
+        listings (List[Dict[str, Any]]): Listings written by the crawl.
+        matched_at (Optional[datetime]): Time stored on the feed entries.
+
+    Returns:
+        Dict[str, int]: Numbers of searches, skipped searches, listings and matches.
+    """
+    totals = {"searches": 0, "unsupported": 0, "listings": len(listings), "matches": 0}
+    if not listings:
+        return totals
+
+    start = time.perf_counter()
+    index = SavedSearchIndex(db["saved_searches"].find({}, {"user_id": 1, "name": 1, "query": 1}))
+    totals["searches"], totals["unsupported"] = len(index), index.unsupported
+    matched_at = matched_at or datetime.utcnow()
+
+    operations: List[UpdateOne] = []
+    for listing in listings:
+        entry = {field: listing.get(field) for field in feed_fields}
+        for search in index.match(listing):
+            operations.append(UpdateOne(
+                {"search_id": search["_id"], "url": listing["url"]},
+                {"$set": {**entry, "user_id": search["user_id"], "search_name": search.get("name"),
+                          "matched_at": matched_at, "seen": False}},
+                upsert=True
+            ))
+
+    if operations:
+        ensure_indexes(db[alert_collection_name], alert_match_indexes)
+        db[alert_collection_name].bulk_write(operations, ordered=False)
+    totals["matches"] = len(operations)
+
+    print(f"Matched {len(listings)} listings against {len(index)} saved searches in "
+          f"{time.perf_counter() - start:.2f}s: {len(operations)} new matches"
+          f"{f', {index.unsupported} searches skipped' if index.unsupported else ''}.")
+    return totals
@@ -1,22 +1,38 @@
-import re
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
-from bs4 import BeautifulSoup
-from .properties_mongo_db import save_property
-
-
-def scrape_aruodas() -> None:
+import argparse
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Union
+from .categories import DEFAULT_CATEGORY, Category, categories, get_category
+from .crawl_pages import PageRange, print_totals
+from .crawl_runs import FAILED, FINISHED, CrawlCheckpoint, checkpoint_store
+from .enrichment import DetailEnricher
+from .fetchers import Fetcher, PageLoadError, RateLimit, create_fetcher
+from .properties_mongo_db import PropertyWriter, get_collection, load_known_hashes
+
+
+BASE_URL: str = get_category(DEFAULT_CATEGORY).base_url
+
+
+def scrape_aruodas(
+    backend: str = "selenium",
+    base_url: Optional[str] = None,
+    incremental: bool = False,
+    stop_after: int = 3,
+    checkpoint: Optional[CrawlCheckpoint] = None,
+    enricher: Optional[DetailEnricher] = None,
+    category: Union[str, Category] = DEFAULT_CATEGORY,
+    rate_limit: Optional[RateLimit] = None
+) -> None:
     """
-    Scrapes apartment listings from aruodas.lt and stores each listing in MongoDB using `save_property`.
+    Scrapes listings of one category (apartments by default) from aruodas.lt and stores them in
+    MongoDB using a `PropertyWriter`.
 
-    This function uses Selenium to navigate through the pages of aruodas.lt listings and BeautifulSoup
-    to parse the HTML content. Listings are extracted from the DOM and parsed into structured data.
-    Listings without critical information (e.g., price, room count) are skipped.
+    Pages are loaded by a fetcher backend chosen for the run (see `fetchers.create_fetcher`):
+    plain HTTP with a pooled `requests.Session`, headless Chrome through Selenium, or "auto",
+    which probes the first page over HTTP and falls back to Selenium if needed. The HTML is
+    parsed with the category's card layout (see `categories.Category`). Listings without
+    critical information (e.g., price, room count) are skipped.
 
     Extracted data includes:
     - City, district, street
@@ -25,110 +41,382 @@ def scrape_aruodas() -> None:
     - Number of rooms
     - URL to the listing
 
-    The parsed data is saved using the `save_property` function.
+    The parsed data is buffered by a `PropertyWriter` and written in bulk batches; the last
+    partial batch is flushed when the scrape ends, even if it ends with an error.
+
+    In incremental mode the URL -> content hash map of the category's stored listings is
+    loaded once at startup. Unchanged listings are not written, and the crawl stops after `stop_after`
+    consecutive pages without a new or changed listing.
+
+    With a `checkpoint`, the crawl starts at its first page that is not completed, skips
+    pages completed past it, and records its progress after every page. A crawl that ends on
+    a page that failed to load is saved as failed, so it can be resumed from there.
+
+    With an `enricher`, the detail pages of new or changed listings are fetched alongside the
+    crawl; the scrape returns once they are written.
+
+    Args:
+        backend (str): Fetch backend: "selenium", "requests" or "auto".
+        base_url (Optional[str]): Replaces the category's base URL (e.g. a local mirror).
+        incremental (bool): Skip unchanged listings and stop early (see above).
+        stop_after (int): Consecutive unchanged pages that end an incremental crawl.
+        checkpoint (Optional[CrawlCheckpoint]): Progress record of this run (see `crawl_runs`).
+        enricher (Optional[DetailEnricher]): Detail page stage, closed when the scrape ends.
+        category (Union[str, Category]): The listing category or its registered name.
+        rate_limit (Optional[RateLimit]): Page load limit shared with concurrent crawls.
+    """
+    category = get_category(category) if isinstance(category, str) else category
+    page: int = checkpoint.next_page if checkpoint is not None else 1
+    known_hashes = load_known_hashes(query=category.stored_query()) if incremental else None
+    fetcher: Fetcher = create_fetcher(
+        backend, probe_url=category.page_url(page, base_url), row_selector=category.row_selector,
+        rate_limit=rate_limit
+    )
+    writer: PropertyWriter = PropertyWriter(
+        known_hashes=known_hashes, on_flush=checkpoint.committed if checkpoint is not None else None,
+        enricher=enricher
+    )
+    status: str = FAILED
+    failed_page: Optional[int] = None
+
+    try:
+        failed_page = _scrape_pages(
+            fetcher, writer, category, base_url, page, stop_after if incremental else None, checkpoint
+        )
+        status = FINISHED if failed_page is None else FAILED
+    finally:
+        fetcher.close()
+        print_totals(writer.close())
+        if enricher is not None:
+            enricher.close()
+        if checkpoint is not None:
+            checkpoint.finish(status, failed_page)
+
+
+def _scrape_pages(
+    fetcher: Fetcher,
+    writer: PropertyWriter,
+    category: Category,
+    base_url: Optional[str],
+    page: int,
+    stop_after: Optional[int] = None,
+    checkpoint: Optional[CrawlCheckpoint] = None
+) -> Optional[int]:
     """
-    # === SETUP DRIVER ===
-    chrome_options: Options = Options()
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
+    Walk the listing pages starting at `page` and queue every parsed listing on `writer`.
 
-    service: Service = Service("C:/Users/dmste/Downloads/chromedriver-win64 (1)/chromedriver-win64/chromedriver.exe")
-    driver: webdriver.Chrome = webdriver.Chrome(service=service, options=chrome_options)
+    Args:
+        fetcher (Fetcher): The backend used to load pages.
+        writer (PropertyWriter): Buffered writer that receives parsed listings.
+        category (Category): The listing category.
+        base_url (Optional[str]): Replaces the category's base URL.
+        page (int): First page number to scrape.
+        stop_after (Optional[int]): Stop after this many consecutive pages without a new or
+                                    changed listing. None walks every page.
+        checkpoint (Optional[CrawlCheckpoint]): Receives the progress of every page.
 
-    base_url: str = "https://www.aruodas.lt/butai/"
-    page: int = 1
+    Returns:
+        Optional[int]: The page that failed to load and ended the crawl, or None if the crawl
+                       reached its end.
+    """
+    unchanged_pages: int = 0
+    skip: Set[int] = checkpoint.completed_pages if checkpoint is not None else set()
 
     while True:
+        if page in skip:
+            page += 1
+            continue
         print(f"\nScraping page {page}...")
+        if checkpoint is not None:
+            checkpoint.page_started(page)
 
         try:
-            driver.get(f"{base_url}puslapis/{page}/")
-
-            try:
-                # Accept cookie consent popup if present
-                WebDriverWait(driver, 5).until(
-                    EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
-                ).click()
-                print("Cookie popup accepted.")
-            except:
-                print("No cookie popup or already accepted.")
-
-            # Wait for listing container to load
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "list-row-v2.object-row.selflat.advert"))
-            )
-            print("Listings loaded.")
-
-        except TimeoutException:
+            html: str = fetcher.fetch(category.page_url(page, base_url))
+        except PageLoadError:
             print("Page failed to load or no listings found.")
-            break
+            if checkpoint is not None:
+                checkpoint.page_abandoned(page)
+            return page
 
-        soup: BeautifulSoup = BeautifulSoup(driver.page_source, "html.parser")
-        ads = soup.find_all("div", class_="advert-flex")
+        cards, listings = category.parse(html)
 
-        if not ads:
+        if not cards:
             print("No listings found on this page. Ending scrape.")
-            break
+            if checkpoint is not None:
+                checkpoint.page_abandoned(page)
+            return None
+
+        print(f"Found {cards} listings.\n")
+        if len(listings) < cards:
+            print(f"Skipping {cards - len(listings)} incomplete listing(s)")
 
-        print(f"Found {len(ads)} listings.\n")
+        changed: int = 0
+        for property_data in listings:
+            if writer.add(property_data):
+                changed += 1
+                print(f"Queued: {property_data['city']}, {property_data['district']} - {property_data['price']} EUR")
+        if checkpoint is not None:
+            checkpoint.page_done(page, len(listings))
 
-        for ad in ads:
-            a_tag = ad.find("a", href=True)
-            img_tag = a_tag.find("img") if a_tag else None
+        unchanged_pages = unchanged_pages + 1 if changed == 0 else 0
+        if stop_after is not None and unchanged_pages >= stop_after:
+            print(f"{unchanged_pages} pages in a row without new or changed listings. Ending scrape.")
+            return None
 
-            if img_tag and img_tag.has_attr("title"):
-                title_attr: str = img_tag["title"]
-                location_info: str = title_attr.split(" | ")[0]
-                parts = location_info.split(", ")
+        page += 1
 
-                city: str = parts[0] if len(parts) > 0 else "N/A"
-                district: str = parts[1] if len(parts) > 1 else "N/A"
-                street: str = parts[2] if len(parts) > 2 else "N/A"
-            else:
-                city = district = street = "N/A"
 
-            price_tag = ad.find("span", class_="list-item-price-v2")
-            price_per_m2_tag = ad.find("span", class_="price-pm-v2")
-            number_of_rooms_tag = ad.find("div", class_="list-RoomNum-v2 list-detail-v2")
-            size_tag = ad.find("div", class_="list-AreaOverall-v2 list-detail-v2")
-            url_tag = ad.find("a", href=True)
+class _PageDone:
+    """Queue marker sent after the listings of a page, so the writer thread can checkpoint it."""
+    def __init__(self, page: int, listings: int) -> None:
+        self.page: int = page
+        self.listings: int = listings
+
+
+def _crawl_worker(
+    worker_id: int,
+    backend: str,
+    category: Category,
+    base_url: Optional[str],
+    pages: PageRange,
+    listings: "queue.Queue[Union[Dict[str, Any], _PageDone, None]]",
+    max_retries: int,
+    checkpoint: Optional[CrawlCheckpoint] = None,
+    rate_limit: Optional[RateLimit] = None
+) -> None:
+    """
+    Scrape pages claimed from `pages` with a dedicated fetcher and put parsed listings on `listings`.
+
+    Args:
+        worker_id (int): Number used to tag log lines.
+        backend (str): Fetch backend for this worker's fetcher.
+        category (Category): The listing category.
+        base_url (Optional[str]): Replaces the category's base URL.
+        pages (PageRange): Shared page counter.
+        listings (queue.Queue): Queue consumed by the writer thread.
+        max_retries (int): Extra attempts for a page that fails to load.
+        checkpoint (Optional[CrawlCheckpoint]): Receives the progress of every page; each
+                                                page's listings are followed by a `_PageDone`.
+        rate_limit (Optional[RateLimit]): Page load limit shared with concurrent crawls.
+    """
+    fetcher: Fetcher = create_fetcher(backend, row_selector=category.row_selector, rate_limit=rate_limit)
 
-            if not all([price_tag, price_per_m2_tag, number_of_rooms_tag]):
-                print("Skipping incomplete listing")
+    try:
+        while True:
+            page = pages.claim()
+            if page is None:
+                break
+            if checkpoint is not None:
+                checkpoint.page_started(page)
+
+            html: Optional[str] = None
+            for attempt in range(1, max_retries + 2):
+                print(f"[worker {worker_id}] Scraping page {page} (attempt {attempt})...")
+                try:
+                    html = fetcher.fetch(category.page_url(page, base_url))
+                    break
+                except PageLoadError as e:
+                    print(f"[worker {worker_id}] Page {page} failed to load: {e}")
+                # Another worker found the end of the listings before this page
+                if pages.is_past_end(page):
+                    break
+
+            if html is None:
+                if checkpoint is not None:
+                    checkpoint.page_abandoned(page)
+                if pages.is_past_end(page):
+                    continue
+                print(f"[worker {worker_id}] Page {page} failed to load. Stopping crawl there.")
+                pages.fail_at(page)
                 continue
 
+            cards, page_listings = category.parse(html)
+            if not cards:
+                print(f"[worker {worker_id}] No listings on page {page}. Stopping crawl there.")
+                pages.stop_at(page)
+                if checkpoint is not None:
+                    checkpoint.page_abandoned(page)
+                continue
 
-            raw_price: str = price_tag.text.strip()
-            match_price = re.findall(r"\d+", raw_price.replace(" ", ""))
-            price: float = float("".join(match_price)) if match_price else 0.0
+            for property_data in page_listings:
+                listings.put(property_data)
+            if checkpoint is not None:
+                listings.put(_PageDone(page, len(page_listings)))
+            print(f"[worker {worker_id}] Page {page}: {cards} listings.")
+    finally:
+        fetcher.close()
 
-            raw_price_per_m2: str = price_per_m2_tag.text.strip()
-            match_price_mq = re.findall(r"\d+", raw_price_per_m2.replace(" ", ""))
-            price_per_m2: int = int("".join(match_price_mq)) if match_price_mq else 0
 
-            number_of_rooms: int = int(number_of_rooms_tag.text.strip())
-            size_m2: float = float(size_tag.text.strip()) if size_tag else 0.0
+def _write_listings(
+    listings: "queue.Queue[Union[Dict[str, Any], _PageDone, None]]",
+    writer: PropertyWriter,
+    checkpoint: Optional[CrawlCheckpoint] = None,
+    pages: Optional[PageRange] = None,
+    errors: Optional[List[Exception]] = None
+) -> None:
+    """
+    Drain `listings` into `writer` until a None sentinel arrives.
 
-            url: str = url_tag["href"] if url_tag and url_tag.has_attr("href") else "N/A"
+    Runs in its own thread so that only one thread ever touches the writer. A `_PageDone`
+    marker means all listings of its page are on the writer.
 
-            property_data: dict = {
-                "city": city,
-                "district": district,
-                "street": street,
-                "price": price,
-                "size_m2": size_m2,
-                "price_per_m2": price_per_m2,
-                "number_of_rooms": number_of_rooms,
-                "url": url
-            }
+    If the writer raises, the error is appended to `errors`, the workers are stopped from
+    claiming more pages and the rest of the queue is discarded, so no worker blocks on a
+    full queue.
 
-            save_property(property_data)
-            print(f"Saved: {city}, {district} - {price} EUR")
+    Args:
+        listings (queue.Queue): Queue filled by the crawl workers.
+        writer (PropertyWriter): Buffered writer for the parsed listings.
+        checkpoint (Optional[CrawlCheckpoint]): Receives the pages handed to the writer.
+        pages (Optional[PageRange]): Page counter of the workers, stopped on a writer error.
+        errors (Optional[List[Exception]]): Receives the error that stopped the writer.
+    """
+    try:
+        while True:
+            try:
+                property_data = listings.get(timeout=writer.flush_interval)
+            except queue.Empty:
+                writer.flush_if_due()
+                continue
 
-        page += 1
+            if property_data is None:
+                break
+            if isinstance(property_data, _PageDone):
+                checkpoint.page_done(property_data.page, property_data.listings)
+                continue
+            writer.add(property_data)
+    except Exception as e:
+        print(f"Writer stopped with an error: {e}")
+        if errors is not None:
+            errors.append(e)
+        if pages is not None:
+            pages.stop_at(0)
+        while listings.get() is not None:
+            pass
 
-    driver.quit()
+
+def scrape_aruodas_parallel(
+    workers: int = 4,
+    max_retries: int = 2,
+    first_page: int = 1,
+    backend: str = "selenium",
+    base_url: Optional[str] = None,
+    checkpoint: Optional[CrawlCheckpoint] = None,
+    enricher: Optional[DetailEnricher] = None,
+    category: Union[str, Category] = DEFAULT_CATEGORY,
+    rate_limit: Optional[RateLimit] = None
+) -> None:
+    """
+    Scrape one listing category of aruodas.lt with a pool of workers feeding one `PropertyWriter`.
+
+    Each worker owns its own fetcher (a Chrome driver or an HTTP session) and claims pages from
+    a shared counter, so the page range is split across the workers as they go. Parsed listings
+    are passed through a queue to a single writer thread. A page that fails to load is retried
+    `max_retries` times by the same worker, unless the end of the listings was found before it;
+    a page that still fails, or that loads without listings, marks the end of the crawl and the
+    remaining workers stop once their current page is done. Only the former fails the run.
+
+    With a `checkpoint`, the crawl starts at its first page that is not completed instead of
+    `first_page`, skips pages completed past it, and records its progress after every page
+    (see `scrape_aruodas`).
+
+    Args:
+        workers (int): Number of concurrent workers.
+        max_retries (int): Extra attempts per page that fails to load.
+        first_page (int): Page number to start from.
+        backend (str): Fetch backend: "selenium", "requests" or "auto".
+        base_url (Optional[str]): Replaces the category's base URL (e.g. a local mirror).
+        checkpoint (Optional[CrawlCheckpoint]): Progress record of this run (see `crawl_runs`).
+        enricher (Optional[DetailEnricher]): Detail page stage, closed when the scrape ends.
+        category (Union[str, Category]): The listing category or its registered name.
+        rate_limit (Optional[RateLimit]): Page load limit shared with concurrent crawls.
+    """
+    category = get_category(category) if isinstance(category, str) else category
+    if checkpoint is not None:
+        first_page = checkpoint.next_page
+    if backend == "auto":
+        # Probe once for the whole run, then give every worker the backend that worked
+        with create_fetcher("auto", probe_url=category.page_url(first_page, base_url),
+                            row_selector=category.row_selector, rate_limit=rate_limit) as probe:
+            backend = probe.name
+
+    pages: PageRange = PageRange(first_page, checkpoint.completed_pages if checkpoint is not None else None)
+    listings: "queue.Queue[Union[Dict[str, Any], _PageDone, None]]" = queue.Queue(maxsize=1000)
+    writer: PropertyWriter = PropertyWriter(
+        on_flush=checkpoint.committed if checkpoint is not None else None, enricher=enricher
+    )
+
+    writer_errors: List[Exception] = []
+    writer_thread = threading.Thread(
+        target=_write_listings, args=(listings, writer, checkpoint, pages, writer_errors), daemon=True
+    )
+    writer_thread.start()
+    status: str = FAILED
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_crawl_worker, worker_id, backend, category, base_url, pages, listings, max_retries,
+                            checkpoint, rate_limit)
+                for worker_id in range(1, workers + 1)
+            ]
+            for future in futures:
+                future.result()
+        status = FAILED if pages.stopped_by_failure else FINISHED
+    finally:
+        listings.put(None)
+        writer_thread.join()
+        if writer_errors:
+            status = FAILED
+        else:
+            print_totals(writer.close())
+        if enricher is not None:
+            enricher.close()
+        if checkpoint is not None:
+            checkpoint.finish(status, pages.failed_page if status == FAILED else None)
+    if writer_errors:
+        raise writer_errors[0]
 
 
 if __name__ == "__main__":
-    scrape_aruodas()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape listings of one category from aruodas.lt into MongoDB.")
+    parser.add_argument("--category", choices=list(categories), default=DEFAULT_CATEGORY,
+                        help="Listing category to crawl (see scraper_mongodb.scheduler to crawl several).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of concurrent workers (1 = sequential scrape).")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="Retries per page that fails to load in parallel mode.")
+    parser.add_argument("--backend", choices=["auto", "requests", "selenium"], default="auto",
+                        help="How pages are fetched: plain HTTP, headless Chrome, or probe and pick.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Skip unchanged listings and stop after --stop-after unchanged pages.")
+    parser.add_argument("--stop-after", type=int, default=3,
+                        help="Consecutive pages without new or changed listings that end an incremental crawl.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the last crawl that did not finish, skipping its completed pages.")
+    parser.add_argument("--checkpoint-file", default=None,
+                        help="Keep crawl checkpoints in this JSON file instead of the crawl_runs collection.")
+    parser.add_argument("--enrich", action="store_true",
+                        help="Also fetch the detail pages of new or changed listings (floor, build year, ...).")
+    parser.add_argument("--detail-workers", type=int, default=4, help="Detail page fetches in flight.")
+    parser.add_argument("--detail-cache", default="detail_cache", help="Directory of the detail page cache.")
+    args = parser.parse_args()
+
+    if args.incremental and args.workers > 1:
+        parser.error("--incremental walks pages in order; run it without --workers.")
+
+    mode = "parallel" if args.workers > 1 else "sequential"
+    crawled = get_category(args.category)
+    store = checkpoint_store(args.checkpoint_file)
+    checkpoint = (CrawlCheckpoint.resume(store, crawled.base_url, mode) if args.resume
+                  else CrawlCheckpoint.start(store, crawled.base_url, mode))
+    enricher: Optional[DetailEnricher] = None
+    if args.enrich:
+        enricher = DetailEnricher(get_collection(), cache_dir=args.detail_cache, workers=args.detail_workers)
+
+    if args.workers > 1:
+        scrape_aruodas_parallel(workers=args.workers, max_retries=args.retries, backend=args.backend,
+                                checkpoint=checkpoint, enricher=enricher, category=crawled)
+    else:
+        scrape_aruodas(backend=args.backend, incremental=args.incremental, stop_after=args.stop_after,
+                       checkpoint=checkpoint, enricher=enricher, category=crawled)
@@ -0,0 +1,344 @@
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from .categories import DEFAULT_CATEGORY, Category, categories, get_category
+from .crawl_pages import PageRange, print_totals
+from .fetchers import http_headers
+from .properties_mongo_db import PropertyWriter
+
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter for asyncio tasks.
+
+    Tokens are refilled continuously at `rate` per second up to `capacity`; every request
+    takes one token and waits when the bucket is empty.
+    """
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate: float = rate
+        self.capacity: int = capacity
+        self._tokens: float = float(capacity)
+        self._updated: float = time.monotonic()
+        self._lock: asyncio.Lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class HostRateLimiter:
+    """
+    One `TokenBucket` per host, created on first use.
+    """
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate: float = rate
+        self.burst: int = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    async def acquire(self, url: str) -> None:
+        """Wait for the rate limit of the host `url` points to."""
+        host = urlsplit(url).netloc
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+        await self._buckets[host].acquire()
+
+
+async def _fetch_with_backoff(
+    session: aiohttp.ClientSession,
+    limiter: HostRateLimiter,
+    url: str,
+    max_retries: int,
+    backoff_base: float,
+    stats: Dict[str, int]
+) -> Optional[str]:
+    """
+    Fetch a page, retrying 429/5xx responses and connection errors with exponential backoff.
+
+    A `Retry-After` header on a 429/503 response takes precedence over the computed delay.
+
+    Args:
+        session (aiohttp.ClientSession): Shared HTTP session.
+        limiter (HostRateLimiter): Per-host rate limiter.
+        url (str): Page URL.
+        max_retries (int): Number of retries after the first attempt.
+        backoff_base (float): Delay in seconds before the first retry; doubled on every retry.
+        stats (Dict[str, int]): Crawl counters, updated in place.
+
+    Returns:
+        str or None: The page HTML, or None if the page could not be loaded.
+    """
+    for attempt in range(max_retries + 1):
+        await limiter.acquire(url)
+        retry_after: Optional[float] = None
+
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    stats["pages_fetched"] += 1
+                    return await response.text()
+                if response.status not in RETRY_STATUSES:
+                    print(f"{url} returned HTTP {response.status}.")
+                    return None
+                reason = f"HTTP {response.status}"
+                header = response.headers.get("Retry-After", "")
+                retry_after = float(header) if header.isdigit() else None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            reason = type(e).__name__
+
+        if attempt == max_retries:
+            break
+
+        # Jitter keeps the fetch tasks from retrying in lockstep
+        delay = retry_after if retry_after is not None else backoff_base * 2 ** attempt * random.uniform(0.5, 1.5)
+        stats["retries"] += 1
+        print(f"{url}: {reason}, retrying in {delay:.2f}s ({attempt + 1}/{max_retries}).")
+        await asyncio.sleep(delay)
+
+    print(f"Giving up on {url} after {max_retries + 1} attempts.")
+    return None
+
+
+async def _fetch_stage(
+    session: aiohttp.ClientSession,
+    limiter: HostRateLimiter,
+    category: Category,
+    base_url: Optional[str],
+    pages: PageRange,
+    html_queue: "asyncio.Queue[Optional[Tuple[int, str]]]",
+    max_retries: int,
+    backoff_base: float,
+    stats: Dict[str, int]
+) -> None:
+    """Claim pages and put their HTML on `html_queue` until the crawl is over."""
+    while True:
+        page = pages.claim()
+        if page is None:
+            return
+
+        html = await _fetch_with_backoff(
+            session, limiter, category.page_url(page, base_url), max_retries, backoff_base, stats
+        )
+        if html is None:
+            pages.stop_at(page)
+            continue
+        await html_queue.put((page, html))
+
+
+async def _parse_stage(
+    category: Category,
+    pages: PageRange,
+    html_queue: "asyncio.Queue[Optional[Tuple[int, str]]]",
+    listings_queue: "asyncio.Queue[Optional[Dict[str, Any]]]",
+    stats: Dict[str, int]
+) -> None:
+    """Parse pages off the event loop and put the listings on `listings_queue`."""
+    while True:
+        item = await html_queue.get()
+        if item is None:
+            return
+
+        page, html = item
+        cards, listings = await asyncio.to_thread(category.parse, html)
+        if not cards:
+            print(f"No listings on page {page}. Stopping crawl there.")
+            pages.stop_at(page)
+            continue
+
+        stats["listings"] += len(listings)
+        for listing in listings:
+            await listings_queue.put(listing)
+
+
+def _add_all(writer: PropertyWriter, listings: List[Dict[str, Any]]) -> None:
+    """Queue a batch of listings on the writer (may trigger a bulk write)."""
+    for listing in listings:
+        writer.add(listing)
+
+
+async def _write_stage(
+    listings_queue: "asyncio.Queue[Optional[Dict[str, Any]]]",
+    writer: PropertyWriter
+) -> Dict[str, int]:
+    """
+    Hand listings to `writer` in batches, running its blocking bulk writes in a worker thread.
+
+    Returns:
+        Dict[str, int]: The writer totals once the queue is closed.
+    """
+    batch: List[Dict[str, Any]] = []
+
+    while True:
+        try:
+            listing = await asyncio.wait_for(listings_queue.get(), timeout=writer.flush_interval)
+        except asyncio.TimeoutError:
+            if batch:
+                await asyncio.to_thread(_add_all, writer, batch)
+                batch = []
+            await asyncio.to_thread(writer.flush_if_due)
+            continue
+
+        if listing is None:
+            break
+        batch.append(listing)
+        if len(batch) >= writer.batch_size:
+            await asyncio.to_thread(_add_all, writer, batch)
+            batch = []
+
+    await asyncio.to_thread(_add_all, writer, batch)
+    return await asyncio.to_thread(writer.close)
+
+
+async def _watch(awaitable: Awaitable[Any], *stages: "asyncio.Task[Any]") -> Any:
+    """
+    Await `awaitable`, raising the error of any of `stages` that fails first.
+
+    A stage that stops with an error would otherwise leave the tasks feeding it blocked on
+    its full queue forever.
+    """
+    task = asyncio.ensure_future(awaitable)
+    done, _ = await asyncio.wait({task, *stages}, return_when=asyncio.FIRST_COMPLETED)
+    if task not in done:
+        for stage in done:
+            if stage.exception() is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise stage.exception()
+    return await task
+
+
+async def crawl_async(
+    base_url: Optional[str] = None,
+    concurrency: int = 8,
+    rate: float = 4.0,
+    burst: int = 4,
+    max_retries: int = 4,
+    backoff_base: float = 1.0,
+    first_page: int = 1,
+    timeout: float = 30.0,
+    writer: Optional[PropertyWriter] = None,
+    category: Union[str, Category] = DEFAULT_CATEGORY
+) -> Dict[str, int]:
+    """
+    Crawl listing pages with asyncio, overlapping fetching, parsing and writing.
+
+    `concurrency` fetch tasks share one aiohttp session and keep that many list-page requests
+    in flight, subject to a per-host token bucket (`rate` requests/s, bursts of `burst`).
+    429 and 5xx responses are retried with exponential backoff. Fetched pages go through a
+    bounded queue to a parser task, which parses in a worker thread so the event loop keeps
+    the network busy, and the listings go through a second queue to a single writer task
+    that feeds a `PropertyWriter`.
+
+    As in the other crawl modes, the first page that has no listings, or that still fails
+    after its retries, marks the end of the crawl. If a fetch or parse stage raises, the other
+    fetch and parse tasks are cancelled, the listings parsed so far are written, the writer is
+    closed and the error is raised. If the write stage raises, the writer is left unclosed, as
+    in `aruodas_scraper.scrape_aruodas_parallel`.
+
+    Args:
+        base_url (Optional[str]): Replaces the category's base URL (e.g. a local mirror).
+        concurrency (int): Number of list-page fetches in flight.
+        rate (float): Requests per second allowed per host.
+        burst (int): Token bucket capacity per host.
+        max_retries (int): Retries per page on 429/5xx or connection errors.
+        backoff_base (float): First retry delay in seconds, doubled on every retry.
+        first_page (int): Page number to start from.
+        timeout (float): Total timeout per request in seconds.
+        writer (Optional[PropertyWriter]): Writer for the listings; defaults to one on the
+                                           'properties' collection.
+        category (Union[str, Category]): The listing category or its registered name.
+
+    Returns:
+        Dict[str, int]: Pages fetched, listings parsed, retries, and the writer totals.
+    """
+    category = get_category(category) if isinstance(category, str) else category
+    stats: Dict[str, int] = {"pages_fetched": 0, "listings": 0, "retries": 0}
+    pages: PageRange = PageRange(first_page)
+    limiter: HostRateLimiter = HostRateLimiter(rate, burst)
+    html_queue: "asyncio.Queue[Optional[Tuple[int, str]]]" = asyncio.Queue(maxsize=concurrency * 2)
+    listings_queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=1000)
+    writer = writer if writer is not None else PropertyWriter()
+
+    write_task = asyncio.create_task(_write_stage(listings_queue, writer))
+    parse_task = asyncio.create_task(_parse_stage(category, pages, html_queue, listings_queue, stats))
+
+    connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(
+        connector=connector,
+        headers=http_headers,
+        timeout=aiohttp.ClientTimeout(total=timeout)
+    ) as session:
+        fetch_tasks = [
+            asyncio.create_task(_fetch_stage(
+                session, limiter, category, base_url, pages, html_queue, max_retries, backoff_base, stats
+            ))
+            for _ in range(concurrency)
+        ]
+        listings_closed: bool = False
+        try:
+            await _watch(asyncio.gather(*fetch_tasks), parse_task, write_task)
+            # Drain the pipeline in order so every fetched page is parsed and written
+            await _watch(html_queue.put(None), parse_task, write_task)
+            await _watch(parse_task, write_task)
+            await _watch(listings_queue.put(None), write_task)
+            listings_closed = True
+            stats.update(await write_task)
+        finally:
+            for task in (*fetch_tasks, parse_task):
+                task.cancel()
+            await asyncio.gather(*fetch_tasks, parse_task, return_exceptions=True)
+            if not write_task.done():
+                # A fetch or parse stage failed: the write stage still takes the listings
+                # parsed so far and closes the writer, as the sync crawlers do
+                if not listings_closed:
+                    await listings_queue.put(None)
+                await asyncio.gather(write_task, return_exceptions=True)
+
+    print_totals(stats)
+    print(f"Fetched {stats['pages_fetched']} pages, parsed {stats['listings']} listings, {stats['retries']} retries.")
+    return stats
+
+
+def scrape_aruodas_async(**kwargs: Any) -> Dict[str, int]:
+    """
+    Run `crawl_async` to completion from synchronous code.
+
+    Args:
+        **kwargs: Passed through to `crawl_async`.
+
+    Returns:
+        Dict[str, int]: The crawl statistics.
+    """
+    return asyncio.run(crawl_async(**kwargs))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl aruodas.lt listing pages with asyncio.")
+    parser.add_argument("--concurrency", type=int, default=8, help="List-page fetches in flight.")
+    parser.add_argument("--rate", type=float, default=4.0, help="Requests per second per host.")
+    parser.add_argument("--burst", type=int, default=4, help="Token bucket size per host.")
+    parser.add_argument("--retries", type=int, default=4, help="Retries per page on 429/5xx.")
+    parser.add_argument("--category", choices=list(categories), default=DEFAULT_CATEGORY,
+                        help="Listing category to crawl.")
+    args = parser.parse_args()
+
+    scrape_aruodas_async(concurrency=args.concurrency, rate=args.rate, burst=args.burst, max_retries=args.retries,
+                         category=args.category)
@@ -0,0 +1,220 @@
+"""
+Listing categories of aruodas.lt: apartments for sale and for rent, houses, plots and
+commercial premises.
+
+A `Category` bundles what differs between them: the URL of their list pages, the row the
+Selenium backend waits for, and the card layout the parser reads. The crawlers take a
+category instead of a base URL, and every listing is stored with its `category` name in
+the one 'properties' collection. Searches, market stats, snapshots and alerts read one
+category at a time (see `category_filter`), apartments unless another one is asked for.
+
+To support another category, register it here; no crawl code has to change:
+
+    register_category(Category("garages", "https://www.aruodas.lt/garazai/", "selgarage", layout))
+
+Listings stored before categories existed are apartments for sale. To tag them, run from
+the project root:
+
+    python -m scraper_mongodb.categories --backfill
+"""
+
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo.collection import Collection
+
+from .parser import (
+    CardField,
+    CardLayout,
+    apartment_layout,
+    float_digits,
+    int_digits,
+    parse_page,
+    stripped_float,
+    stripped_int,
+)
+
+
+# Listings without a `category` field were stored by crawls of this category
+DEFAULT_CATEGORY: str = "apartments"
+
+
+def category_filter(name: str) -> Dict[str, Any]:
+    """
+    MongoDB filter for the stored listings of a category.
+
+    Listings stored before categories existed have no `category` field and belong to
+    `DEFAULT_CATEGORY`.
+
+    Args:
+        name (str): Category name.
+
+    Returns:
+        Dict[str, Any]: A filter on the `category` field.
+    """
+    if name == DEFAULT_CATEGORY:
+        return {"category": {"$in": [name, None]}}
+    return {"category": name}
+
+
+class Category:
+    """
+    One listing category and how its list pages are crawled.
+
+    Attributes:
+        name (str): Stored in the `category` field of every listing.
+        base_url (str): Category URL; also the key of its crawl checkpoints.
+        row_class (str): Class token of the listing rows (e.g. "selflat"), waited for by the
+                         Selenium backend.
+        layout (CardLayout): Cards and fields of the list pages.
+        url_template (str): List page URL, formatted with `base_url` and `page`.
+    """
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        row_class: str,
+        layout: CardLayout,
+        url_template: str = "{base_url}puslapis/{page}/"
+    ) -> None:
+        self.name: str = name
+        self.base_url: str = base_url
+        self.row_class: str = row_class
+        self.layout: CardLayout = layout
+        self.url_template: str = url_template
+
+    @property
+    def row_selector(self) -> str:
+        """Compound class name of a listing row, as `By.CLASS_NAME` locators take it."""
+        return f"list-row-v2.object-row.{self.row_class}.advert"
+
+    def page_url(self, page: int, base_url: Optional[str] = None) -> str:
+        """
+        Return the URL of a list page.
+
+        Args:
+            page (int): Page number, from 1.
+            base_url (Optional[str]): Replaces `base_url`, e.g. for a local test server.
+
+        Returns:
+            str: The page URL.
+        """
+        return self.url_template.format(base_url=base_url or self.base_url, page=page)
+
+    def parse(self, html: str) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Parse a list page of this category (see `parser.parse_page`).
+
+        Args:
+            html (str): Page HTML.
+
+        Returns:
+            Tuple[int, List[Dict[str, Any]]]: Number of listing cards, and the complete
+                                              listings tagged with the category name.
+        """
+        cards, listings = parse_page(html, layout=self.layout)
+        for listing in listings:
+            listing["category"] = self.name
+        return cards, listings
+
+    def stored_query(self) -> Dict[str, Any]:
+        """MongoDB filter for the stored listings of this category (see `category_filter`)."""
+        return category_filter(self.name)
+
+
+categories: Dict[str, Category] = {}
+
+
+def register_category(category: Category) -> Category:
+    """
+    Add a category to the registry, replacing one with the same name.
+
+    Args:
+        category (Category): The category.
+
+    Returns:
+        Category: The same category.
+    """
+    categories[category.name] = category
+    return category
+
+
+def get_category(name: str) -> Category:
+    """
+    Look up a registered category.
+
+    Args:
+        name (str): Category name.
+
+    Returns:
+        Category: The category.
+
+    Raises:
+        ValueError: If no category has that name.
+    """
+    try:
+        return categories[name]
+    except KeyError:
+        raise ValueError(f"Unknown category '{name}'. Use one of: {', '.join(categories)}") from None
+
+
+# === REGISTERED CATEGORIES ===
+# Houses and plots show the plot area in ares; rentals have no price per m² and plots no
+# rooms or floor area, which the schema still requires, so those are stored as 0
+register_category(Category("apartments", "https://www.aruodas.lt/butai/", "selflat", apartment_layout))
+
+register_category(Category("apartments_rent", "https://www.aruodas.lt/butu-nuoma/", "rentflat", CardLayout({
+    "price": CardField("span", "list-item-price-v2", float_digits, required=True),
+    "size_m2": CardField("div", "list-AreaOverall-v2", stripped_float, default=0.0),
+    "price_per_m2": CardField("span", "price-pm-v2", int_digits, default=0),
+    "number_of_rooms": CardField("div", "list-RoomNum-v2", stripped_int, required=True),
+})))
+
+register_category(Category("houses", "https://www.aruodas.lt/namai/", "selhouse", CardLayout({
+    "price": CardField("span", "list-item-price-v2", float_digits, required=True),
+    "size_m2": CardField("div", "list-AreaOverall-v2", stripped_float, default=0.0),
+    "plot_area": CardField("div", "list-AreaLot-v2", stripped_float),
+    "price_per_m2": CardField("span", "price-pm-v2", int_digits, default=0),
+    "number_of_rooms": CardField("div", "list-RoomNum-v2", stripped_int, default=0),
+})))
+
+register_category(Category("plots", "https://www.aruodas.lt/sklypai/", "sellot", CardLayout({
+    "price": CardField("span", "list-item-price-v2", float_digits, required=True),
+    "plot_area": CardField("div", "list-AreaOverall-v2", stripped_float, required=True),
+}, constants={"size_m2": 0.0, "price_per_m2": 0, "number_of_rooms": 0})))
+
+register_category(Category("commercial", "https://www.aruodas.lt/patalpos/", "selcomm", CardLayout({
+    "price": CardField("span", "list-item-price-v2", float_digits, required=True),
+    "size_m2": CardField("div", "list-AreaOverall-v2", stripped_float, required=True),
+    "price_per_m2": CardField("span", "price-pm-v2", int_digits, default=0),
+}, constants={"number_of_rooms": 0})))
+
+
+def backfill_default_category(collection: Collection) -> int:
+    """
+    Tag the listings stored before categories existed with `DEFAULT_CATEGORY`.
+
+    Args:
+        collection (Collection): The 'properties' collection.
+
+    Returns:
+        int: Number of listings tagged.
+    """
+    result = collection.update_many({"category": {"$exists": False}}, {"$set": {"category": DEFAULT_CATEGORY}})
+    print(f"Tagged {result.modified_count} listings as '{DEFAULT_CATEGORY}'.")
+    return result.modified_count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backfill", action="store_true",
+                        help=f"Tag listings without a category as '{DEFAULT_CATEGORY}'.")
+    args = parser.parse_args()
+
+    if args.backfill:
+        from .properties_mongo_db import get_collection
+
+        backfill_default_category(get_collection())
+    else:
+        for category in categories.values():
+            print(f"{category.name:<16} {category.page_url(1)}")
@@ -0,0 +1,56 @@
+from datetime import datetime
+from typing import Any, Dict
+from pymongo import ReturnDocument
+from pymongo.database import Database
+
+
+# Small documents recording when the listings were last written, when the last crawl finished
+# and when derived data (e.g. the market_stats cube) was last refreshed
+meta_collection_name: str = "crawl_meta"
+
+
+def mark_properties_written(db: Database, written_at: datetime) -> None:
+    """
+    Record that listings were written, which makes derived data stale until its next refresh.
+
+    Args:
+        db (Database): The scraper database.
+        written_at (datetime): Time of the write.
+    """
+    db[meta_collection_name].update_one({"_id": "properties"}, {"$set": {"written_at": written_at}}, upsert=True)
+
+
+def bump_crawl_version(db: Database) -> int:
+    """
+    Increase the crawl version stamp after a crawl that wrote listings.
+
+    Readers that cache listing data (such as the autocomplete index of the web app) compare
+    the stamp with the one they loaded to know when to reload.
+
+    Args:
+        db (Database): The scraper database.
+
+    Returns:
+        int: The new version.
+    """
+    stamp = db[meta_collection_name].find_one_and_update(
+        {"_id": "crawl"},
+        {"$inc": {"version": 1}, "$set": {"finished_at": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return stamp["version"]
+
+
+def crawl_version(db: Database) -> int:
+    """
+    Read the crawl version stamp.
+
+    Args:
+        db (Database): The scraper database.
+
+    Returns:
+        int: The current version, 0 if no crawl has finished yet.
+    """
+    stamp: Dict[str, Any] = db[meta_collection_name].find_one({"_id": "crawl"}, {"version": 1}) or {}
+    return stamp.get("version", 0)
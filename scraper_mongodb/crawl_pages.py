@@ -0,0 +1,67 @@
+"""
+Page bookkeeping shared by the crawl modes: the counter the workers of a parallel or async
+crawl claim list pages from, and the report printed when a crawl ends.
+"""
+
+import threading
+from typing import Dict, Optional, Set
+
+
+class PageRange:
+    """
+    Thread-safe page counter shared by the crawl workers.
+
+    Workers claim page numbers one at a time, skipping the pages in `skip` (completed by an
+    earlier run). Once any worker reports the last (empty) page, no page at or after it is
+    handed out, so the other workers finish what they hold and stop.
+    """
+    def __init__(self, first_page: int = 1, skip: Optional[Set[int]] = None) -> None:
+        self._next_page: int = first_page
+        self._end_page: Optional[int] = None
+        self._skip: Set[int] = set(skip or ())
+        self.failed_page: Optional[int] = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def claim(self) -> Optional[int]:
+        """Return the next page to scrape, or None when the crawl is over."""
+        with self._lock:
+            while self._next_page in self._skip:
+                self._next_page += 1
+            if self._end_page is not None and self._next_page >= self._end_page:
+                return None
+            page = self._next_page
+            self._next_page += 1
+            return page
+
+    def stop_at(self, page: int) -> None:
+        """Mark `page` as past the end of the listings."""
+        with self._lock:
+            if self._end_page is None or page < self._end_page:
+                self._end_page = page
+
+    def is_past_end(self, page: int) -> bool:
+        """Whether `page` is at or after the end of the listings found so far."""
+        with self._lock:
+            return self._end_page is not None and page >= self._end_page
+
+    def fail_at(self, page: int) -> None:
+        """Mark `page` as past the end because it could not be loaded."""
+        self.stop_at(page)
+        with self._lock:
+            if self.failed_page is None or page < self.failed_page:
+                self.failed_page = page
+
+    @property
+    def stopped_by_failure(self) -> bool:
+        """Whether the crawl ends at a page that failed to load rather than at an empty page."""
+        with self._lock:
+            return self.failed_page is not None and self.failed_page == self._end_page
+
+
+def print_totals(totals: Dict[str, int]) -> None:
+    """Print the write counts of a finished scrape."""
+    print(
+        f"Scrape finished: {totals['upserted']} upserted, "
+        f"{totals['matched']} matched, {totals['modified']} modified, "
+        f"{totals.get('unchanged', 0)} unchanged skipped."
+    )
@@ -0,0 +1,273 @@
+"""
+Crawl checkpoints: the progress of a crawl, saved after every page so that `--resume` can
+continue an interrupted run instead of starting again from page 1.
+
+A page goes through three states: in flight (being fetched), pending (its listings were
+handed to the `PropertyWriter` but may still sit in its buffer) and completed (the writer
+has flushed them). Only completed pages are skipped on resume, so a crash never loses the
+listings of a page counted as done; pending pages are simply fetched again, which the URL
+upserts make harmless.
+
+Checkpoints are stored in the 'crawl_runs' collection, or in a local JSON file for crawls
+that should not depend on the database being reachable.
+"""
+
+import json
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from pymongo.collection import Collection
+
+from .indexes import crawl_run_indexes, ensure_indexes
+
+
+crawl_runs_collection_name: str = "crawl_runs"
+
+# Run statuses; "finished" runs reached the last page and are never resumed
+RUNNING: str = "running"
+FAILED: str = "failed"
+FINISHED: str = "finished"
+
+_date_fields: List[str] = ["started_at", "updated_at", "finished_at"]
+
+
+class CheckpointStore(ABC):
+    """Interface of the places checkpoints are kept."""
+    @abstractmethod
+    def save(self, state: Dict[str, Any]) -> None:
+        """Store the state of a run, replacing its previous one."""
+
+    @abstractmethod
+    def load_unfinished(self, base_url: str) -> Optional[Dict[str, Any]]:
+        """Return the latest run of `base_url` if it did not finish, else None."""
+
+
+class MongoCheckpointStore(CheckpointStore):
+    """One document per run in the 'crawl_runs' collection."""
+    def __init__(self, collection: Collection) -> None:
+        self.collection: Collection = collection
+        ensure_indexes(collection, crawl_run_indexes)
+
+    def save(self, state: Dict[str, Any]) -> None:
+        self.collection.replace_one({"_id": state["_id"]}, state, upsert=True)
+
+    def load_unfinished(self, base_url: str) -> Optional[Dict[str, Any]]:
+        latest = self.collection.find_one({"base_url": base_url}, sort=[("started_at", -1)])
+        return latest if latest is not None and latest["status"] != FINISHED else None
+
+
+class FileCheckpointStore(CheckpointStore):
+    """
+    A JSON file holding the latest run per base URL, replaced in a single rename on every save.
+
+    Saves are serialized, so concurrent category crawls can share one file.
+    """
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self._lock: threading.Lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding="utf-8") as f:
+            runs = json.load(f)
+        for state in runs.values():
+            for field in _date_fields:
+                if state.get(field):
+                    state[field] = datetime.fromisoformat(state[field])
+        return runs
+
+    def save(self, state: Dict[str, Any]) -> None:
+        with self._lock:
+            runs = self._read()
+            runs[state["base_url"]] = state
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(runs, f, default=lambda value: value.isoformat(), indent=1)
+            os.replace(self.path + ".tmp", self.path)
+
+    def load_unfinished(self, base_url: str) -> Optional[Dict[str, Any]]:
+        latest = self._read().get(base_url)
+        return latest if latest is not None and latest["status"] != FINISHED else None
+
+
+class CrawlCheckpoint:
+    """
+    Progress of one crawl run, saved to its store after every change.
+
+    The crawl reports each page with `page_started`, then `page_done` once its listings
+    are on the writer; the writer's `on_flush` hook calls `committed`, which marks the
+    pending pages completed. `last_completed_page` is the highest page up to which every
+    page is completed; parallel crawls may also complete pages past a gap, which are kept
+    in `completed_pages`.
+
+    Safe to use from several crawl workers at once.
+
+    Attributes:
+        state (Dict[str, Any]): The saved run document.
+    """
+    def __init__(self, store: CheckpointStore, state: Dict[str, Any]) -> None:
+        self.store: CheckpointStore = store
+        self.state: Dict[str, Any] = state
+        self._completed: Set[int] = set(state["completed_pages"])
+        self._pending: Set[int] = set()
+        self._in_flight: Set[int] = set()
+        self._lock: threading.Lock = threading.Lock()
+        with self._lock:
+            self._save()
+
+    @classmethod
+    def start(cls, store: CheckpointStore, base_url: str, mode: str, first_page: int = 1) -> "CrawlCheckpoint":
+        """
+        Begin a new run.
+
+        Args:
+            store (CheckpointStore): Where the checkpoints are saved.
+            base_url (str): Base URL of the crawled listing category.
+            mode (str): Crawl mode, for the record ("sequential", "parallel").
+            first_page (int): First page of the run.
+
+        Returns:
+            CrawlCheckpoint: The new run's checkpoint.
+        """
+        now = datetime.utcnow()
+        return cls(store, {
+            "_id": f"{now:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}",
+            "base_url": base_url,
+            "mode": mode,
+            "status": RUNNING,
+            "started_at": now,
+            "updated_at": now,
+            "finished_at": None,
+            "resumes": 0,
+            "last_completed_page": first_page - 1,
+            "completed_pages": [],
+            "pending_pages": [],
+            "in_flight_pages": [],
+            "stopped_at": None,
+            "pages": 0,
+            "listings": 0,
+        })
+
+    @classmethod
+    def resume(cls, store: CheckpointStore, base_url: str, mode: str) -> "CrawlCheckpoint":
+        """
+        Continue the last unfinished run of `base_url`, or begin a new one if there is none.
+
+        Pages that were in flight or pending when the run stopped are not completed and will
+        be crawled again; the run keeps its id, start time and counters.
+
+        Args:
+            store (CheckpointStore): Where the checkpoints are saved.
+            base_url (str): Base URL of the crawled listing category.
+            mode (str): Crawl mode of this run.
+
+        Returns:
+            CrawlCheckpoint: The run's checkpoint.
+        """
+        state = store.load_unfinished(base_url)
+        if state is None:
+            print("No unfinished crawl to resume. Starting from the first page.")
+            return cls.start(store, base_url, mode)
+
+        print(f"Resuming crawl {state['_id']} after page {state['last_completed_page']} "
+              f"({len(state['completed_pages'])} later pages already done).")
+        state.update({
+            "mode": mode, "status": RUNNING, "resumes": state.get("resumes", 0) + 1,
+            "pending_pages": [], "in_flight_pages": [], "stopped_at": None, "finished_at": None,
+        })
+        return cls(store, state)
+
+    @property
+    def next_page(self) -> int:
+        """First page that is not completed."""
+        return self.state["last_completed_page"] + 1
+
+    @property
+    def completed_pages(self) -> Set[int]:
+        """Completed pages after `next_page`, which a resumed crawl skips."""
+        with self._lock:
+            return set(self._completed)
+
+    def page_started(self, page: int) -> None:
+        with self._lock:
+            self._in_flight.add(page)
+            self._save()
+
+    def page_done(self, page: int, listings: int) -> None:
+        """
+        Record that the listings of `page` were handed to the writer.
+
+        Args:
+            page (int): The page number.
+            listings (int): Listings parsed from it.
+        """
+        with self._lock:
+            self._in_flight.discard(page)
+            self._pending.add(page)
+            self.state["pages"] += 1
+            self.state["listings"] += listings
+            self._save()
+
+    def page_abandoned(self, page: int) -> None:
+        """Forget a page that was started but will not be done in this run (e.g. past the end)."""
+        with self._lock:
+            self._in_flight.discard(page)
+            self._save()
+
+    def committed(self, *_: Any) -> None:
+        """Writer flush hook: every pending page's listings are now stored."""
+        with self._lock:
+            if not self._pending:
+                return
+            self._completed |= self._pending
+            self._pending = set()
+            while self.state["last_completed_page"] + 1 in self._completed:
+                self.state["last_completed_page"] += 1
+                self._completed.discard(self.state["last_completed_page"])
+            self._save()
+
+    def finish(self, status: str, stopped_at: Optional[int] = None) -> None:
+        """
+        Close the run.
+
+        Args:
+            status (str): FINISHED if the crawl reached the end of the listings, FAILED if it
+                          stopped early and should be resumed.
+            stopped_at (Optional[int]): Page where the crawl stopped.
+        """
+        with self._lock:
+            self.state["status"] = status
+            self.state["stopped_at"] = stopped_at
+            self.state["finished_at"] = datetime.utcnow()
+            self._save()
+        print(f"Crawl {self.state['_id']} {status} after page {self.state['last_completed_page']}.")
+
+    def _save(self) -> None:
+        """Write the state; the caller holds the lock."""
+        self.state["completed_pages"] = sorted(self._completed)
+        self.state["pending_pages"] = sorted(self._pending)
+        self.state["in_flight_pages"] = sorted(self._in_flight)
+        self.state["updated_at"] = datetime.utcnow()
+        self.store.save(self.state)
+
+
+def checkpoint_store(path: Optional[str] = None) -> CheckpointStore:
+    """
+    Return the checkpoint store of a crawl.
+
+    Args:
+        path (Optional[str]): Local JSON file; None keeps checkpoints in MongoDB.
+
+    Returns:
+        CheckpointStore: The store.
+    """
+    if path:
+        return FileCheckpointStore(path)
+
+    from .properties_mongo_db import get_db
+
+    return MongoCheckpointStore(get_db()[crawl_runs_collection_name])
@@ -0,0 +1,297 @@
+"""
+Detail-page enrichment: floor, build year, heating and coordinates of listings, read from
+the detail page at their `url`.
+
+`DetailEnricher` is an optional crawl stage with its own bounded pool of HTTP workers. The
+`PropertyWriter` hands it the URLs of new or changed listings only; the enriched fields are
+written back with bulk updates while the crawl goes on.
+
+Detail pages go through `DetailCache`, an on-disk cache of the parsed fields keyed by URL
+and stored with the page's ETag/Last-Modified validators. Requests are conditional, so an
+unchanged page costs one 304 response and is neither downloaded nor parsed again; for
+servers without validators, a page whose body has not changed is not parsed again.
+
+To enrich the listings stored before enrichment existed, run from the project root:
+
+    python -m scraper_mongodb.enrichment --missing --workers 4
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from urllib.parse import urljoin
+
+import requests
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, PyMongoError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .fetchers import RateLimit, http_headers
+from .parser import parse_detail_page
+
+
+# Listing URLs may be stored relative to the site
+SITE_URL: str = "https://www.aruodas.lt/"
+
+
+class DetailCache:
+    """
+    Parsed detail pages on disk, one JSON file per URL, with the validators of the response
+    they were parsed from.
+
+    Attributes:
+        directory (str): Cache directory.
+    """
+    def __init__(self, directory: str) -> None:
+        self.directory: str = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the cache entry of `url`: validators, body hash and parsed fields.
+
+        Args:
+            url (str): Detail page URL.
+
+        Returns:
+            Optional[Dict[str, Any]]: The entry, or None if the page was never cached.
+        """
+        try:
+            with open(self._path(url), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, url: str, entry: Dict[str, Any]) -> None:
+        """Store the entry of `url`, replacing the previous one in a single rename."""
+        path = self._path(url)
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({**entry, "url": url}, f, ensure_ascii=False)
+        os.replace(temporary, path)
+
+
+def _create_session() -> requests.Session:
+    """HTTP session of one detail worker, keeping its connection alive and retrying transient errors."""
+    session = requests.Session()
+    retries = Retry(total=2, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(http_headers)
+    return session
+
+
+def fetch_details(
+    session: requests.Session,
+    cache: DetailCache,
+    url: str,
+    timeout: float = 15.0,
+    rate_limit: Optional[RateLimit] = None
+) -> Dict[str, Any]:
+    """
+    Fetch and parse one detail page through the cache.
+
+    Args:
+        session (requests.Session): HTTP session.
+        cache (DetailCache): Parsed page cache.
+        url (str): Detail page URL.
+        timeout (float): Request timeout in seconds.
+        rate_limit (Optional[RateLimit]): Request limit shared with the crawl; conditional
+                                          requests take a token too.
+
+    Returns:
+        Dict[str, Any]: `fields` (the parsed attributes) and `source`: "not_modified" (304),
+                        "unchanged" (same body, not parsed), "parsed" or "failed".
+    """
+    cached = cache.get(url)
+    headers: Dict[str, str] = {}
+    if cached is not None and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached is not None and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+
+    if rate_limit is not None:
+        rate_limit.acquire()
+    try:
+        response = session.get(url, headers=headers, timeout=timeout)
+    except requests.RequestException as e:
+        print(f"Detail page {url} failed: {e}")
+        return {"fields": {}, "source": "failed"}
+
+    if response.status_code == 304 and cached is not None:
+        return {"fields": cached["fields"], "source": "not_modified"}
+    if response.status_code != 200:
+        print(f"Detail page {url} returned HTTP {response.status_code}")
+        return {"fields": {}, "source": "failed"}
+
+    body_hash = hashlib.sha1(response.content).hexdigest()
+    if cached is not None and cached.get("body_hash") == body_hash:
+        fields, source = cached["fields"], "unchanged"
+    else:
+        fields, source = parse_detail_page(response.text), "parsed"
+
+    cache.set(url, {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "body_hash": body_hash,
+        "fields": fields,
+    })
+    return {"fields": fields, "source": source}
+
+
+class DetailEnricher:
+    """
+    Bounded worker pool that enriches listings from their detail pages and writes the fields
+    back in bulk.
+
+    `submit` blocks when `queue_size` URLs are waiting, so a fast crawl cannot queue an
+    unbounded backlog of detail pages. Each worker has its own HTTP session; with a
+    `rate_limit`, every detail request takes a token from it, like the crawl's page loads,
+    so the workers stay within the crawl's request rate. Parsed fields
+    are buffered and written with one unordered `bulk_write` per `batch_size` listings;
+    `close` waits for the queued pages and writes the rest.
+
+    A page that cannot be fetched or parsed is counted as failed and a batch that cannot be
+    written is reported; neither stops a worker, so `submit` and `close` never wait on a
+    dead pool.
+
+    Attributes:
+        totals (Dict[str, int]): Pages per source (see `fetch_details`) and listings written.
+    """
+    def __init__(
+        self,
+        collection: Collection,
+        cache_dir: str = "detail_cache",
+        workers: int = 4,
+        queue_size: int = 200,
+        batch_size: int = 200,
+        timeout: float = 15.0,
+        base_url: str = SITE_URL,
+        rate_limit: Optional[RateLimit] = None
+    ) -> None:
+        self.collection: Collection = collection
+        self.cache: DetailCache = DetailCache(cache_dir)
+        self.batch_size: int = batch_size
+        self.timeout: float = timeout
+        self.base_url: str = base_url
+        self.rate_limit: Optional[RateLimit] = rate_limit
+        self.totals: Dict[str, int] = {"parsed": 0, "not_modified": 0, "unchanged": 0, "failed": 0, "written": 0}
+        self._urls: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=queue_size)
+        self._pending: List[UpdateOne] = []
+        self._lock: threading.Lock = threading.Lock()
+        self._threads: List[threading.Thread] = [
+            threading.Thread(target=self._work, name=f"detail-worker-{number}", daemon=True)
+            for number in range(1, workers + 1)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self) -> "DetailEnricher":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def submit(self, url: str) -> None:
+        """
+        Queue a listing for enrichment, waiting while the queue is full.
+
+        Args:
+            url (str): The listing URL, as stored in the 'properties' collection.
+        """
+        self._urls.put(url)
+
+    def _work(self) -> None:
+        session = _create_session()
+        try:
+            while True:
+                url = self._urls.get()
+                if url is None:
+                    return
+                try:
+                    result = fetch_details(
+                        session, self.cache, urljoin(self.base_url, url), self.timeout, self.rate_limit
+                    )
+                except Exception as e:
+                    print(f"Detail page {url} failed: {e}")
+                    result = {"fields": {}, "source": "failed"}
+                self._record(url, result)
+        finally:
+            session.close()
+
+    def _record(self, url: str, result: Dict[str, Any]) -> None:
+        """Count a fetched page and buffer its update, writing the buffer when it is full."""
+        batch: List[UpdateOne] = []
+        with self._lock:
+            self.totals[result["source"]] += 1
+            if result["fields"]:
+                self._pending.append(UpdateOne(
+                    {"url": url}, {"$set": {**result["fields"], "enriched_at": datetime.utcnow()}}
+                ))
+            if len(self._pending) >= self.batch_size:
+                batch, self._pending = self._pending, []
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch: List[UpdateOne]) -> None:
+        try:
+            result = self.collection.bulk_write(batch, ordered=False)
+            written = result.matched_count
+        except BulkWriteError as e:
+            written = e.details.get("nMatched", 0)
+            print(f"Detail enrichment write finished with {len(e.details.get('writeErrors', []))} write errors.")
+        except PyMongoError as e:
+            written = 0
+            print(f"Could not write {len(batch)} enriched listings: {e}")
+        with self._lock:
+            self.totals["written"] += written
+
+    def close(self) -> Dict[str, int]:
+        """
+        Wait for the queued pages, write the remaining fields and stop the workers.
+
+        Returns:
+            Dict[str, int]: The enrichment totals.
+        """
+        for _ in self._threads:
+            self._urls.put(None)
+        for thread in self._threads:
+            thread.join()
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            self._write(batch)
+
+        print(
+            f"Detail pages: {self.totals['parsed']} parsed, {self.totals['not_modified']} not modified, "
+            f"{self.totals['unchanged']} unchanged, {self.totals['failed']} failed; "
+            f"{self.totals['written']} listings enriched."
+        )
+        return self.totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--missing", action="store_true", help="Only listings that were never enriched.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--cache-dir", default="detail_cache")
+    args = parser.parse_args()
+
+    from .properties_mongo_db import get_collection
+
+    properties = get_collection()
+    query: Dict[str, Any] = {"enriched_at": {"$exists": False}} if args.missing else {}
+    with DetailEnricher(properties, cache_dir=args.cache_dir, workers=args.workers) as enricher:
+        for doc in properties.find(query, {"_id": 0, "url": 1}):
+            enricher.submit(doc["url"])
@@ -0,0 +1,284 @@
+import re
+import threading
+from abc import ABC, abstractmethod
+import time
+import requests
+from typing import Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+
+# Headers sent by the HTTP backends; gzip keeps list pages small on the wire
+http_headers = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml",
+    "Accept-Encoding": "gzip, deflate",
+    "Accept-Language": "lt,en;q=0.8",
+}
+
+
+# Listing row of the apartment list pages, waited for by the Selenium backend
+APARTMENT_ROW_SELECTOR: str = "list-row-v2.object-row.selflat.advert"
+
+_CLASS_ATTRIBUTE = re.compile(r"""class\s*=\s*["']([^"']*)["']""")
+
+
+class PageLoadError(Exception):
+    """Raised by a fetcher when a listing page could not be loaded."""
+
+
+class RateLimit:
+    """
+    Token bucket shared by the fetchers of several crawl threads.
+
+    Tokens are refilled continuously at `rate` per second up to `capacity`; every page load
+    takes one and sleeps while the bucket is empty. The blocking counterpart of
+    `async_scraper.TokenBucket`.
+    """
+    def __init__(self, rate: float, capacity: int = 1) -> None:
+        self.rate: float = rate
+        self.capacity: int = capacity
+        self._tokens: float = float(capacity)
+        self._updated: float = time.monotonic()
+        self._lock: threading.Lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                # Sleeping with the lock held queues the other threads behind this one
+                time.sleep((1 - self._tokens) / self.rate)
+
+
+class Fetcher(ABC):
+    """
+    Interface for the page-loading backends used by the scraper.
+
+    A fetcher turns a listing page URL into its HTML. Fetchers hold on to expensive resources
+    (a browser, a connection pool), so one instance is reused for a whole crawl and closed at
+    the end, either explicitly or by using it as a context manager. A backend that does not
+    implement `fetch` cannot be instantiated.
+    """
+    name: str = "base"
+
+    @abstractmethod
+    def fetch(self, url: str) -> str:
+        """
+        Load a listing page.
+
+        Args:
+            url (str): URL of the listing page.
+
+        Returns:
+            str: The page HTML.
+
+        Raises:
+            PageLoadError: If the page could not be loaded.
+        """
+
+    def close(self) -> None:
+        """Release the resources held by the fetcher."""
+
+    def __enter__(self) -> "Fetcher":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class RequestsFetcher(Fetcher):
+    """
+    Plain HTTP backend built on a pooled `requests.Session`.
+
+    The listing markup is part of the server-rendered HTML, so no browser is needed. The session
+    keeps connections alive between pages, asks for gzip-compressed responses and retries
+    transient 5xx errors with a short backoff.
+    """
+    name: str = "requests"
+
+    def __init__(self, timeout: float = 15.0, pool_size: int = 10) -> None:
+        self.timeout: float = timeout
+        self.session: requests.Session = requests.Session()
+
+        retries = Retry(total=2, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(http_headers)
+
+    def fetch(self, url: str) -> str:
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise PageLoadError(f"Request for {url} failed: {e}") from e
+
+        if response.status_code != 200:
+            raise PageLoadError(f"Request for {url} returned HTTP {response.status_code}")
+        return response.text
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def _create_driver() -> webdriver.Chrome:
+    """
+    Start a Chrome driver configured for scraping.
+
+    Returns:
+        webdriver.Chrome: A new Chrome driver; the caller is responsible for quitting it.
+    """
+    # === SETUP DRIVER ===
+    chrome_options: Options = Options()
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+
+    service: Service = Service("C:/Users/dmste/Downloads/chromedriver-win64 (1)/chromedriver-win64/chromedriver.exe")
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+
+class SeleniumFetcher(Fetcher):
+    """
+    Headless Chrome backend, for when the plain HTTP responses do not contain the listings.
+
+    The cookie consent popup is handled on the first page only; the browser keeps the consent
+    for the rest of the session. After the page loads, the fetcher waits for a listing row
+    matching `row_selector`. A page that loads but shows no rows (e.g. the one after the last
+    list page) is returned as it is, so the parser finds no cards and the crawl ends there;
+    only a failed page load raises `PageLoadError`.
+    """
+    name: str = "selenium"
+
+    def __init__(self, row_selector: str = APARTMENT_ROW_SELECTOR) -> None:
+        self.row_selector: str = row_selector
+        self.driver: webdriver.Chrome = _create_driver()
+        self._cookies_checked: bool = False
+
+    def fetch(self, url: str) -> str:
+        try:
+            self.driver.get(url)
+        except WebDriverException as e:
+            raise PageLoadError(f"Failed to load {url}: {e}") from e
+
+        if not self._cookies_checked:
+            self._cookies_checked = True
+            try:
+                # Accept cookie consent popup if present
+                WebDriverWait(self.driver, 5).until(
+                    EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
+                ).click()
+                print("Cookie popup accepted.")
+            except:
+                print("No cookie popup or already accepted.")
+
+        try:
+            # Wait for listing container to load
+            WebDriverWait(self.driver, 10).until(
+                EC.presence_of_element_located((By.CLASS_NAME, self.row_selector))
+            )
+            print("Listings loaded.")
+        except TimeoutException:
+            print("Page loaded without listings.")
+
+        return self.driver.page_source
+
+    def close(self) -> None:
+        self.driver.quit()
+
+
+class RateLimitedFetcher(Fetcher):
+    """Wraps a fetcher so that every page load first takes a token from a shared `RateLimit`."""
+    def __init__(self, fetcher: Fetcher, rate_limit: RateLimit) -> None:
+        self.fetcher: Fetcher = fetcher
+        self.rate_limit: RateLimit = rate_limit
+        self.name: str = fetcher.name
+
+    def fetch(self, url: str) -> str:
+        self.rate_limit.acquire()
+        return self.fetcher.fetch(url)
+
+    def close(self) -> None:
+        self.fetcher.close()
+
+
+fetcher_backends = {
+    RequestsFetcher.name: RequestsFetcher,
+    SeleniumFetcher.name: SeleniumFetcher,
+}
+
+
+def create_fetcher(
+    backend: str = "selenium",
+    probe_url: Optional[str] = None,
+    row_selector: str = APARTMENT_ROW_SELECTOR,
+    rate_limit: Optional[RateLimit] = None
+) -> Fetcher:
+    """
+    Create the fetcher for a crawl.
+
+    Args:
+        backend (str): "requests", "selenium", or "auto". "auto" loads `probe_url` over plain HTTP
+                       and keeps the HTTP backend if the listings are in the response, otherwise
+                       it falls back to Selenium.
+        probe_url (Optional[str]): Listing page used by the "auto" backend.
+        row_selector (str): Listing row the Selenium backend waits for (see `SeleniumFetcher`).
+        rate_limit (Optional[RateLimit]): Limit shared with other crawls; the probe counts too.
+
+    Returns:
+        Fetcher: A ready-to-use fetcher.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    if backend not in fetcher_backends and backend != "auto":
+        raise ValueError(f"Unknown fetch backend '{backend}'. Use one of: auto, {', '.join(fetcher_backends)}")
+
+    fetcher: Fetcher
+    if backend == SeleniumFetcher.name:
+        fetcher = SeleniumFetcher(row_selector)
+    elif backend == RequestsFetcher.name:
+        fetcher = RequestsFetcher()
+    else:
+        fetcher = _probe_fetcher(probe_url, row_selector, rate_limit)
+
+    return RateLimitedFetcher(fetcher, rate_limit) if rate_limit is not None else fetcher
+
+
+def _has_rows(html: str, row_selector: str) -> bool:
+    """Return True if an element of `html` has every class of the compound `row_selector`."""
+    wanted = set(row_selector.split("."))
+    return any(wanted <= set(classes.split()) for classes in _CLASS_ATTRIBUTE.findall(html))
+
+
+def _probe_fetcher(probe_url: Optional[str], row_selector: str, rate_limit: Optional[RateLimit]) -> Fetcher:
+    """Pick the backend of an "auto" crawl: plain HTTP if `probe_url` has listings, else Selenium."""
+    fetcher: Fetcher = RequestsFetcher()
+    if probe_url:
+        try:
+            if rate_limit is not None:
+                rate_limit.acquire()
+            if _has_rows(fetcher.fetch(probe_url), row_selector):
+                print("Listings are served as plain HTML. Using the requests backend.")
+                return fetcher
+        except PageLoadError as e:
+            print(f"Plain HTTP probe failed: {e}")
+
+    fetcher.close()
+    print("Falling back to the Selenium backend.")
+    return SeleniumFetcher(row_selector)
@@ -0,0 +1,131 @@
+from typing import Any, Dict, List, Optional
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.collection import Collection
+from pymongo.errors import OperationFailure
+
+
+# Indexes for the 'properties' collection.
+# The unique 'url' index backs the upserts done by the scraper, the compound indexes follow the
+# filter shapes produced by the search form: equality fields (city, district, rooms) first,
+# then the range field (price, size, price per m²).
+property_indexes: List[IndexModel] = [
+    IndexModel([("url", ASCENDING)], name="url_unique", unique=True),
+    IndexModel([("city", ASCENDING), ("district", ASCENDING), ("price", ASCENDING)],
+               name="city_district_price"),
+    IndexModel([("city", ASCENDING), ("number_of_rooms", ASCENDING), ("price", ASCENDING)],
+               name="city_rooms_price"),
+    IndexModel([("city", ASCENDING), ("size_m2", ASCENDING)], name="city_size_m2"),
+    IndexModel([("city", ASCENDING), ("price_per_m2", ASCENDING)], name="city_price_per_m2"),
+    IndexModel([("price", ASCENDING)], name="price"),
+    # Searches within one listing category, and the known listings of a category crawl
+    IndexModel([("category", ASCENDING), ("city", ASCENDING), ("district", ASCENDING), ("price", ASCENDING)],
+               name="category_city_district_price"),
+]
+
+# Indexes for the 'price_history' collection: the history of one listing, and of a region
+price_history_indexes: List[IndexModel] = [
+    IndexModel([("meta.url", ASCENDING), ("ts", ASCENDING)], name="url_ts"),
+    IndexModel([("meta.city", ASCENDING), ("meta.district", ASCENDING), ("ts", ASCENDING)],
+               name="city_district_ts"),
+]
+
+# Indexes for the 'alert_matches' collection: one entry per saved search and listing (the
+# matcher's upsert key), and a user's feed, newest first
+alert_match_indexes: List[IndexModel] = [
+    IndexModel([("search_id", ASCENDING), ("url", ASCENDING)], name="search_url_unique", unique=True),
+    IndexModel([("user_id", ASCENDING), ("seen", ASCENDING), ("matched_at", DESCENDING)],
+               name="user_seen_matched_at"),
+]
+
+# Indexes for the 'crawl_runs' collection: the latest run of a listing category, for --resume
+crawl_run_indexes: List[IndexModel] = [
+    IndexModel([("base_url", ASCENDING), ("started_at", DESCENDING)], name="base_url_started_at"),
+]
+
+# Representative queries for each filter shape the search form can produce
+search_query_shapes: Dict[str, Dict[str, Any]] = {
+    "upsert by url": {"url": "https://www.aruodas.lt/1-1/"},
+    "city": {"city": "Vilnius"},
+    "city + district": {"city": "Vilnius", "district": "Žirmūnai"},
+    "city + district + price": {"city": "Vilnius", "district": "Žirmūnai",
+                                "price": {"$gte": 100000, "$lte": 200000}},
+    "city + rooms + price": {"city": "Vilnius", "number_of_rooms": 2,
+                             "price": {"$gte": 100000, "$lte": 200000}},
+    "city + size": {"city": "Kaunas", "size_m2": {"$gte": 40, "$lte": 80}},
+    "city + price per m2": {"city": "Kaunas", "price_per_m2": {"$gte": 1000, "$lte": 2500}},
+    "price only": {"price": {"$gte": 50000, "$lte": 90000}},
+    "category + city + district + price": {"category": "houses", "city": "Vilnius", "district": "Pilaitė",
+                                           "price": {"$gte": 100000, "$lte": 300000}},
+}
+
+
+def ensure_indexes(collection: Collection, indexes: Optional[List[IndexModel]] = None) -> List[str]:
+    """
+    Create the given indexes (by default `property_indexes`) on the collection.
+
+    `create_indexes` is a no-op for indexes that already exist with the same definition, so this
+    is safe to call on every startup.
+
+    Args:
+        collection (Collection): The collection to index, usually 'properties'.
+        indexes (Optional[List[IndexModel]]): Indexes to create; defaults to `property_indexes`.
+
+    Returns:
+        List[str]: Names of the indexes that are now in place.
+    """
+    try:
+        names: List[str] = collection.create_indexes(indexes if indexes is not None else property_indexes)
+    except OperationFailure as e:
+        # Usually duplicate URLs stored before the unique index existed
+        print(f"Could not create indexes on '{collection.name}': {e}")
+        return []
+
+    print(f"Indexes ensured on '{collection.name}': {', '.join(names)}")
+    return names
+
+
+def _winning_index(explain_output: Dict[str, Any]) -> str:
+    """
+    Extract the index used by the winning plan of an `explain()` result.
+
+    Args:
+        explain_output (Dict[str, Any]): The output of `Cursor.explain()`.
+
+    Returns:
+        str: The index name, or "COLLSCAN" if the planner scans the collection.
+    """
+    planner = explain_output.get("queryPlanner", {})
+    stage: Dict[str, Any] = planner.get("winningPlan", {})
+    # Slot-based engine plans wrap the classic plan in 'queryPlan'
+    stage = stage.get("queryPlan", stage)
+
+    while stage:
+        if "indexName" in stage:
+            return stage["indexName"]
+        if stage.get("stage") == "COLLSCAN":
+            return "COLLSCAN"
+        if "inputStage" in stage:
+            stage = stage["inputStage"]
+        elif stage.get("inputStages"):
+            stage = stage["inputStages"][0]
+        else:
+            break
+
+    return "COLLSCAN"
+
+
+def explain_query_shapes(collection: Collection) -> Dict[str, str]:
+    """
+    Report which index the query planner picks for each search query shape.
+
+    Args:
+        collection (Collection): The 'properties' collection.
+
+    Returns:
+        Dict[str, str]: Query shape name mapped to the index name (or "COLLSCAN").
+    """
+    plans: Dict[str, str] = {}
+    for shape, query in search_query_shapes.items():
+        plans[shape] = _winning_index(collection.find(query).explain())
+        print(f"{shape:<36} -> {plans[shape]}")
+    return plans
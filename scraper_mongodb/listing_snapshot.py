@@ -0,0 +1,345 @@
+"""
+Read-only snapshot of the listings' numeric fields as memory-mapped NumPy arrays.
+
+After a crawl the listings of one category (apartments unless another is given) are
+written to `<snapshot_dir>/v<timestamp>/` as one `.npy` file per column, with city and
+district stored as integer codes into the dictionaries in `meta.json`. Rows are ordered by
+city, and for each metric a copy sorted by value within each city is stored, so per-city
+quantiles are index arithmetic with no sort at all.
+
+Readers open the arrays with `np.load(mmap_mode="r")`: the pages are shared through the OS
+page cache by every process (e.g. gunicorn workers) that maps the same snapshot. The
+`CURRENT` file names the latest complete version and is replaced atomically.
+
+The directory is the `snapshot_dir` setting shared by the crawler and the web app (see
+`mongo_settings`). Run from the project root to write a snapshot by hand:
+
+    python -m scraper_mongodb.listing_snapshot
+"""
+
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pymongo.collection import Collection
+
+from .categories import DEFAULT_CATEGORY, category_filter
+
+
+# Numeric listing fields in the snapshot, stored as float64 with NaN for missing values
+snapshot_metrics: List[str] = ["price", "size_m2", "price_per_m2", "number_of_rooms"]
+
+# File naming the latest complete snapshot version
+current_file_name: str = "CURRENT"
+
+# Snapshot versions kept on disk; older ones may still be mapped by a reader until it reloads
+snapshot_versions_kept: int = 2
+
+
+def _encode(values: List[Any]) -> Tuple[np.ndarray, List[Any]]:
+    """Dictionary-encode `values` into int32 codes, sorted dictionary first."""
+    dictionary = sorted(set(values), key=lambda value: (value is None, str(value)))
+    index = {value: code for code, value in enumerate(dictionary)}
+    return np.fromiter((index[value] for value in values), dtype=np.int32, count=len(values)), dictionary
+
+
+def write_snapshot(
+    properties: Collection,
+    snapshot_dir: str,
+    version: Optional[int] = None,
+    category: str = DEFAULT_CATEGORY
+) -> str:
+    """
+    Write a snapshot of every listing of a category and make it the current one.
+
+    Args:
+        properties (Collection): The 'properties' collection.
+        snapshot_dir (str): Directory holding the snapshot versions.
+        version (Optional[int]): Crawl version stamp the snapshot reflects, stored in its metadata.
+        category (str): Listing category in the snapshot, stored in its metadata.
+
+    Returns:
+        str: Path of the written version directory.
+    """
+    projection = {"_id": 0, "city": 1, "district": 1, **{metric: 1 for metric in snapshot_metrics}}
+    cities: List[Any] = []
+    districts: List[Tuple[Any, Any]] = []
+    columns: Dict[str, List[float]] = {metric: [] for metric in snapshot_metrics}
+
+    for doc in properties.find(category_filter(category), projection):
+        cities.append(doc.get("city"))
+        districts.append((doc.get("city"), doc.get("district")))
+        for metric in snapshot_metrics:
+            value = doc.get(metric)
+            columns[metric].append(float(value) if isinstance(value, (int, float)) else np.nan)
+
+    city_codes, city_names = _encode(cities)
+    district_codes, district_names = _encode(districts)
+
+    # Rows ordered by city, so each city is one contiguous slice
+    order = np.argsort(city_codes, kind="stable")
+    city_codes = city_codes[order]
+    arrays: Dict[str, np.ndarray] = {
+        "city_code": city_codes,
+        "district_code": district_codes[order],
+        "city_offsets": np.searchsorted(city_codes, np.arange(len(city_names) + 1)).astype(np.int64),
+    }
+    for metric in snapshot_metrics:
+        values = np.asarray(columns[metric], dtype=np.float64)[order]
+        arrays[metric] = values
+        # Values sorted within each city (NaN last), plus the number of non-NaN values per city
+        by_city = np.lexsort((values, city_codes))
+        arrays[f"{metric}_sorted"] = values[by_city]
+        arrays[f"{metric}_counts"] = np.bincount(city_codes[~np.isnan(values)], minlength=len(city_names))
+
+    # Every snapshot gets a new directory: files that readers have mapped are never rewritten
+    stamp = time.time_ns() // 1_000_000
+    while os.path.exists(os.path.join(snapshot_dir, f"v{stamp}")):
+        stamp += 1
+    name = f"v{stamp}"
+    path = os.path.join(snapshot_dir, name)
+    os.makedirs(path + ".tmp", exist_ok=True)
+    for column, array in arrays.items():
+        np.save(os.path.join(path + ".tmp", f"{column}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(path + ".tmp", "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": version, "category": category, "rows": int(len(city_codes)), "cities": city_names,
+                   "districts": [list(pair) for pair in district_names]}, f, ensure_ascii=False)
+    os.rename(path + ".tmp", path)
+
+    pointer = os.path.join(snapshot_dir, current_file_name)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(pointer + ".tmp", pointer)
+
+    _prune_versions(snapshot_dir, name)
+    print(f"Listing snapshot {name} written with {len(city_codes)} listings.")
+    return path
+
+
+def _prune_versions(snapshot_dir: str, current: str) -> None:
+    """Delete all but the newest `snapshot_versions_kept` versions."""
+    versions = sorted(
+        (entry for entry in os.listdir(snapshot_dir) if entry.startswith("v") and entry[1:].isdigit()),
+        key=lambda entry: int(entry[1:])
+    )
+    for entry in versions[:-snapshot_versions_kept]:
+        if entry != current:
+            shutil.rmtree(os.path.join(snapshot_dir, entry), ignore_errors=True)
+
+
+def group_quantiles(codes: np.ndarray, values: np.ndarray, groups: int, qs: Sequence[float]) -> np.ndarray:
+    """
+    Quantiles of `values` per group code, interpolated linearly like pandas.
+
+    One `lexsort` orders the values within their groups; every quantile of every group is
+    then read by index arithmetic.
+
+    Args:
+        codes (np.ndarray): Group code of each value.
+        values (np.ndarray): Values, NaN for missing.
+        groups (int): Number of group codes.
+        qs (Sequence[float]): Quantiles between 0 and 1.
+
+    Returns:
+        np.ndarray: Array of shape (len(qs), groups), NaN for groups without values.
+    """
+    present = ~np.isnan(values)
+    codes, values = codes[present], values[present]
+    order = np.lexsort((values, codes))
+    counts = np.bincount(codes, minlength=groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return _sorted_quantiles(values[order], starts, counts, qs)
+
+
+def _sorted_quantiles(
+    sorted_values: np.ndarray,
+    starts: np.ndarray,
+    counts: np.ndarray,
+    qs: Sequence[float]
+) -> np.ndarray:
+    """Quantiles per group, for groups stored from `starts` as `counts` ascending values."""
+    result = np.full((len(qs), len(counts)), np.nan)
+    has_values = counts > 0
+    if not has_values.any():
+        return result
+
+    for row, q in enumerate(qs):
+        position = q * (counts[has_values] - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        base = starts[has_values]
+        low_values = sorted_values[base + low]
+        high_values = sorted_values[base + high]
+        result[row, has_values] = low_values + (high_values - low_values) * (position - low)
+    return result
+
+
+class ListingSnapshot:
+    """
+    One snapshot version, with its arrays memory-mapped read-only.
+
+    Attributes:
+        category (str): Listing category the snapshot holds.
+    """
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.version: Optional[int] = meta["version"]
+        self.category: str = meta.get("category", DEFAULT_CATEGORY)
+        self.cities: List[Any] = meta["cities"]
+        self.districts: List[Tuple[Any, Any]] = [tuple(pair) for pair in meta["districts"]]
+        self._city_index: Dict[Any, int] = {city: code for code, city in enumerate(self.cities)}
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    def array(self, column: str) -> np.ndarray:
+        """Return a column, mapping its file on first use."""
+        if column not in self._arrays:
+            self._arrays[column] = np.load(os.path.join(self.path, f"{column}.npy"), mmap_mode="r")
+        return self._arrays[column]
+
+    def _city_slice(self, city: Optional[str]) -> slice:
+        """Rows of one city (all rows for None, none for an unknown city)."""
+        if not city:
+            return slice(None)
+        code = self._city_index.get(city)
+        if code is None:
+            return slice(0, 0)
+        offsets = self.array("city_offsets")
+        return slice(int(offsets[code]), int(offsets[code + 1]))
+
+    def city_quantiles(self, metric: str, qs: Sequence[float]) -> Dict[Any, List[float]]:
+        """
+        Quantiles of `metric` per city, read from the per-city sorted copy.
+
+        Args:
+            metric (str): One of `snapshot_metrics`.
+            qs (Sequence[float]): Quantiles between 0 and 1.
+
+        Returns:
+            Dict[Any, List[float]]: City -> quantile values, for cities with values.
+        """
+        counts = np.asarray(self.array(f"{metric}_counts"))
+        # Each city's slice of the sorted copy starts with its values; its NaN are at the end
+        starts = np.asarray(self.array("city_offsets")[:-1])
+        result = _sorted_quantiles(self.array(f"{metric}_sorted"), starts, counts, qs)
+        return {city: result[:, code].tolist() for code, city in enumerate(self.cities) if counts[code] > 0}
+
+    def district_quantiles(
+        self,
+        metric: str,
+        qs: Sequence[float],
+        city: Optional[str] = None
+    ) -> Dict[Tuple[Any, Any], List[float]]:
+        """
+        Quantiles of `metric` per (city, district).
+
+        Args:
+            metric (str): One of `snapshot_metrics`.
+            qs (Sequence[float]): Quantiles between 0 and 1.
+            city (Optional[str]): Restrict to the districts of one city.
+
+        Returns:
+            Dict[Tuple[Any, Any], List[float]]: (city, district) -> quantile values.
+        """
+        rows = self._city_slice(city)
+        codes = np.asarray(self.array("district_code")[rows])
+        result = group_quantiles(codes, np.asarray(self.array(metric)[rows]), len(self.districts), qs)
+        return {self.districts[code]: result[:, code].tolist()
+                for code in np.unique(codes) if not np.isnan(result[0, code])}
+
+    def histogram(self, metric: str, bins: int = 20, city: Optional[str] = None) -> Dict[str, List[float]]:
+        """
+        Histogram of `metric`, for one city or all listings.
+
+        Args:
+            metric (str): One of `snapshot_metrics`.
+            bins (int): Number of equal-width bins.
+            city (Optional[str]): Restrict to one city.
+
+        Returns:
+            Dict[str, List[float]]: Bin `edges` (bins + 1) and `counts` (bins).
+        """
+        values = np.asarray(self.array(metric)[self._city_slice(city)])
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return {"edges": [], "counts": []}
+        counts, edges = np.histogram(values, bins=bins)
+        return {"edges": edges.tolist(), "counts": counts.tolist()}
+
+    def medians_by_city(self, field: str, city: Optional[str] = None, limit: int = 0) -> List[Dict[str, Any]]:
+        """
+        Median of `field` per city, in the format of `app.analytics.medians_by_city`.
+
+        Args:
+            field (str): One of `snapshot_metrics`.
+            city (Optional[str]): Restrict to one city.
+            limit (int): If > 0 and no city is given, keep the `limit` highest and lowest cities.
+
+        Returns:
+            List[Dict[str, Any]]: {"city", "value"} rows, highest value first.
+        """
+        medians = self.city_quantiles(field, [0.5])
+        rows = [{"city": name, "value": values[0]} for name, values in medians.items()
+                if name is not None and (not city or name == city)]
+        rows.sort(key=lambda row: (-row["value"], row["city"]))
+        if limit > 0 and len(rows) > limit * 2 and not city:
+            rows = rows[:limit] + rows[-limit:]
+        return rows
+
+
+_snapshots: Dict[str, Tuple[float, Optional[ListingSnapshot]]] = {}
+_snapshots_lock: threading.Lock = threading.Lock()
+
+
+def load_snapshot(snapshot_dir: str, check_interval: float = 5.0) -> Optional[ListingSnapshot]:
+    """
+    Return the current snapshot of `snapshot_dir`, switching to a newer version when one appears.
+
+    The `CURRENT` file is read at most every `check_interval` seconds.
+
+    Args:
+        snapshot_dir (str): Directory written by `write_snapshot`.
+        check_interval (float): Seconds between checks for a new version.
+
+    Returns:
+        Optional[ListingSnapshot]: The snapshot, or None if none was written yet.
+    """
+    now = time.monotonic()
+    checked_at, snapshot = _snapshots.get(snapshot_dir, (None, None))
+    if checked_at is not None and now - checked_at < check_interval:
+        return snapshot
+
+    with _snapshots_lock:
+        try:
+            with open(os.path.join(snapshot_dir, current_file_name), encoding="utf-8") as f:
+                path = os.path.join(snapshot_dir, f.read().strip())
+        except FileNotFoundError:
+            path = None
+        if path is None:
+            snapshot = None
+        elif snapshot is None or snapshot.path != path:
+            snapshot = ListingSnapshot(path)
+        _snapshots[snapshot_dir] = (now, snapshot)
+    return snapshot
+
+
+if __name__ == "__main__":
+    from .mongo_settings import mongo_settings
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=mongo_settings()["snapshot_dir"],
+                        help="Snapshot directory (default: the shared snapshot_dir setting).")
+    parser.add_argument("--category", default=DEFAULT_CATEGORY, help="Listing category in the snapshot.")
+    args = parser.parse_args()
+
+    from .crawl_meta import crawl_version
+    from .properties_mongo_db import get_db
+
+    db = get_db()
+    write_snapshot(db["properties"], args.dir, crawl_version(db), args.category)
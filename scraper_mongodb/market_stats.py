@@ -0,0 +1,279 @@
+import argparse
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from pymongo.collection import Collection
+from pymongo.database import Database
+from .categories import DEFAULT_CATEGORY, category_filter
+from .crawl_meta import meta_collection_name
+
+
+# Materialized statistics per (category, city, district, number_of_rooms) plus roll-ups
+stats_collection_name: str = "market_stats"
+# Layout of the cube rows; a cube built with another layout is rebuilt on the next refresh
+stats_cube_format: int = 2
+
+# Numeric listing fields summarized in the cube
+stats_metrics: List[str] = ["price", "size_m2", "price_per_m2", "number_of_rooms"]
+# Percentiles stored for each metric, with linear interpolation like pandas
+stats_percentiles: Dict[str, float] = {"p10": 0.1, "median": 0.5, "p90": 0.9}
+# Cube level -> fields it groups by, finest first; categories are never mixed in one row
+stats_levels: Dict[str, List[str]] = {
+    "rooms": ["category", "city", "district", "number_of_rooms"],
+    "district": ["category", "city", "district"],
+    "city": ["category", "city"],
+}
+# Above this many touched groups a refresh rebuilds their whole categories instead of
+# matching every group in its own `$or` branch
+stats_full_refresh_groups: int = 200
+
+GroupKey = Tuple[Any, Any, Any, Any]
+
+
+def group_key(listing: Dict[str, Any]) -> GroupKey:
+    """Return the finest cube key (category, city, district, number_of_rooms) of a listing."""
+    return (
+        listing.get("category") or DEFAULT_CATEGORY,
+        listing.get("city"), listing.get("district"), listing.get("number_of_rooms")
+    )
+
+
+def _level_scope(level: str, groups: Optional[Iterable[Tuple[Any, ...]]]) -> Dict[str, Any]:
+    """
+    Filter selecting the listings (or cube rows) of `level` affected by the touched `groups`.
+
+    Args:
+        level (str): Cube level name.
+        groups (Optional[Iterable[Tuple[Any, ...]]]): Touched finest keys, or key prefixes such
+                                                     as `(category,)`; None selects everything.
+
+    Returns:
+        Dict[str, Any]: A filter on category/city/district/number_of_rooms.
+    """
+    if groups is None:
+        return {}
+
+    fields = stats_levels[level]
+    keys = {key[:len(fields)] for key in groups}
+    return {"$or": [{**category_filter(key[0]), **dict(zip(fields[1:], key[1:]))} for key in keys]}
+
+
+def _percentile_expr(p: float) -> Dict[str, Any]:
+    """
+    Expression for the `p` percentile of the sorted `$values` array (`$n` elements).
+
+    Interpolates linearly between the two closest ranks, the default of pandas and NumPy.
+    """
+    position = {"$multiply": [p, {"$subtract": ["$$n", 1]}]}
+    return {"$let": {
+        "vars": {"lo": {"$floor": position}, "hi": {"$ceil": position}, "pos": position},
+        "in": {"$let": {
+            "vars": {
+                "low": {"$arrayElemAt": ["$values", "$$lo"]},
+                "high": {"$arrayElemAt": ["$values", "$$hi"]},
+            },
+            "in": {"$add": [
+                "$$low",
+                {"$multiply": [{"$subtract": ["$$high", "$$low"]}, {"$subtract": ["$$pos", "$$lo"]}]}
+            ]}
+        }}
+    }}
+
+
+def market_stats_pipeline(
+    level: str,
+    metric: str,
+    groups: Optional[Iterable[Tuple[Any, ...]]] = None,
+    refreshed_at: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """
+    Build the aggregation computing the statistics of one metric for one cube level.
+
+    Listings are sorted by the metric and their values pushed into one sorted array per
+    group, from which count, mean, min/max, median and p10/p90 are read. This runs on any
+    MongoDB version with `$merge` (4.2+) and gives the same numbers as pandas.
+
+    Args:
+        level (str): Cube level ("rooms", "district" or "city").
+        metric (str): Listing field to summarize.
+        groups (Optional[Iterable[Tuple[Any, ...]]]): Restrict to the groups (or key prefixes)
+                                                     touched by a crawl.
+        refreshed_at (Optional[datetime]): Timestamp stored on the produced rows.
+
+    Returns:
+        List[Dict[str, Any]]: The pipeline, without the final `$merge` stage.
+    """
+    fields = stats_levels[level]
+    group_id: Dict[str, Any] = {"level": {"$literal": level}}
+    group_id.update({field: f"${field}" for field in fields})
+    group_id["category"] = {"$ifNull": ["$category", DEFAULT_CATEGORY]}
+
+    stats: Dict[str, Any] = {
+        "count": "$$n",
+        "mean": {"$avg": "$values"},
+        "min": {"$arrayElemAt": ["$values", 0]},
+        "max": {"$arrayElemAt": ["$values", -1]},
+    }
+    stats.update({name: _percentile_expr(p) for name, p in stats_percentiles.items()})
+
+    row: Dict[str, Any] = {"level": "$_id.level", "refreshed_at": {"$literal": refreshed_at or datetime.utcnow()}}
+    row.update({field: f"$_id.{field}" for field in fields})
+    row[metric] = {"$let": {"vars": {"n": {"$size": "$values"}}, "in": stats}}
+    if metric == "price":
+        # Price is required on every listing, so its count is the group size
+        row["count"] = {"$size": "$values"}
+
+    return [
+        {"$match": {**_level_scope(level, groups), metric: {"$ne": None}}},
+        {"$sort": {metric: 1}},
+        {"$group": {"_id": group_id, "values": {"$push": f"${metric}"}}},
+        {"$project": row},
+    ]
+
+
+def refresh_market_stats(properties: Collection, groups: Optional[Iterable[GroupKey]] = None) -> datetime:
+    """
+    Recompute the cube rows affected by a crawl and merge them into 'market_stats'.
+
+    Only the listings of the touched groups (and of their district and city roll-ups) are
+    read. Rows of touched groups that no longer have listings are removed. With more than
+    `stats_full_refresh_groups` groups, the categories they belong to are rebuilt whole, which
+    keeps the `$match` to one branch per category. Without `groups`, or if the cube has never
+    been built in the current `stats_cube_format`, the whole cube is rebuilt.
+
+    Args:
+        properties (Collection): The 'properties' collection.
+        groups (Optional[Iterable[GroupKey]]): (category, city, district, number_of_rooms) keys of
+                                               the listings written (and of their previous values).
+
+    Returns:
+        datetime: The refresh timestamp.
+    """
+    db: Database = properties.database
+    meta: Collection = db[meta_collection_name]
+    refreshed_at = datetime.utcnow()
+
+    touched: Optional[Set[Tuple[Any, ...]]] = set(groups) if groups is not None else None
+    built = meta.find_one({"_id": stats_collection_name})
+    if touched is not None and (built is None or built.get("format") != stats_cube_format):
+        print("Market stats cube not built yet, rebuilding it from all listings.")
+        touched = None
+    elif touched is not None and len(touched) > stats_full_refresh_groups:
+        touched = {(key[0],) for key in touched}
+        print(f"Too many touched groups, rebuilding the market stats of {len(touched)} categories.")
+
+    merge = {"$merge": {
+        "into": stats_collection_name, "on": "_id", "whenMatched": "merge", "whenNotMatched": "insert"
+    }}
+    for level in stats_levels:
+        for metric in stats_metrics:
+            properties.aggregate(market_stats_pipeline(level, metric, touched, refreshed_at) + [merge])
+
+        # Groups that were touched but not rewritten have no listings left
+        db[stats_collection_name].delete_many({
+            "level": level, "refreshed_at": {"$lt": refreshed_at}, **_level_scope(level, touched)
+        })
+
+    meta.update_one(
+        {"_id": stats_collection_name},
+        {"$set": {"refreshed_at": refreshed_at, "format": stats_cube_format}},
+        upsert=True
+    )
+    if touched is None:
+        scope = "all groups"
+    elif all(len(key) == 1 for key in touched):
+        scope = f"{len(touched)} categories"
+    else:
+        scope = f"{len(touched)} touched groups"
+    print(f"Market stats refreshed for {scope}.")
+    return refreshed_at
+
+
+def market_stats_is_fresh(db: Database) -> bool:
+    """
+    Check whether the cube reflects every listing write.
+
+    Args:
+        db (Database): The scraper database.
+
+    Returns:
+        bool: False if the cube was never built in the current `stats_cube_format` or listings
+              were written after its last refresh.
+    """
+    stamps = {doc["_id"]: doc for doc in db[meta_collection_name].find(
+        {"_id": {"$in": [stats_collection_name, "properties"]}}
+    )}
+    cube = stamps.get(stats_collection_name, {})
+    refreshed = cube.get("refreshed_at")
+    if refreshed is None or cube.get("format") != stats_cube_format:
+        return False
+    written = stamps.get("properties", {}).get("written_at")
+    return written is None or written <= refreshed
+
+
+def read_market_stats(
+    db: Database,
+    level: str = "city",
+    category: str = DEFAULT_CATEGORY,
+    **filters: Any
+) -> List[Dict[str, Any]]:
+    """
+    Read cube rows of one level and category.
+
+    Args:
+        db (Database): The scraper database.
+        level (str): "city", "district" or "rooms".
+        category (str): Listing category of the rows.
+        **filters: Optional equality filters on city, district or number_of_rooms.
+
+    Returns:
+        List[Dict[str, Any]]: The rows, without `_id` and `refreshed_at`.
+    """
+    query: Dict[str, Any] = {"level": level, "category": category}
+    query.update({field: value for field, value in filters.items() if value not in (None, "")})
+    cursor = db[stats_collection_name].find(query, {"_id": 0, "refreshed_at": 0})
+    return list(cursor.sort([(field, 1) for field in stats_levels[level]]))
+
+
+def live_market_stats(
+    properties: Collection,
+    level: str = "city",
+    category: str = DEFAULT_CATEGORY,
+    **filters: Any
+) -> List[Dict[str, Any]]:
+    """
+    Compute cube rows directly from the listings, for when the cube is stale.
+
+    Runs the same pipelines as `refresh_market_stats`, restricted to the category and
+    `filters`, and returns the rows instead of merging them.
+
+    Args:
+        properties (Collection): The 'properties' collection.
+        level (str): "city", "district" or "rooms".
+        category (str): Listing category to summarize.
+        **filters: Optional equality filters on city, district or number_of_rooms.
+
+    Returns:
+        List[Dict[str, Any]]: Rows shaped like those of `read_market_stats`.
+    """
+    match = category_filter(category)
+    match.update({field: value for field, value in filters.items() if value not in (None, "")})
+    fields = stats_levels[level]
+    rows: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+
+    for metric in stats_metrics:
+        for row in properties.aggregate([{"$match": match}] + market_stats_pipeline(level, metric)):
+            row.pop("_id")
+            row.pop("refreshed_at")
+            rows.setdefault(tuple(row[field] for field in fields), {}).update(row)
+
+    return [rows[key] for key in sorted(rows, key=lambda key: tuple(str(part) for part in key))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the market_stats cube from all listings.")
+    parser.add_argument("--uri", default=None, help="MongoDB URI (default: the shared MongoDB settings).")
+    args = parser.parse_args()
+
+    from .properties_mongo_db import get_db
+
+    refresh_market_stats(get_db(args.uri)["properties"])
@@ -0,0 +1,238 @@
+"""
+MongoDB connection settings shared by the scraper and the web app.
+
+Settings are read from, in increasing priority: the defaults below, a JSON file named by
+`MONGO_SETTINGS_FILE`, and `MONGO_*` environment variables. Both the scraper's client
+(`properties_mongo_db.get_client`) and Flask-PyMongo (`app/db_init.py`) are built from
+`client_options()`, so they share pool sizing, timeouts, read preference and write concern,
+and report their pool activity to the same `pool_stats` listener.
+
+The directory of the listing snapshot (see `listing_snapshot`) is kept here too, so the
+crawler writes it where the web app looks for it.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from pymongo import monitoring
+
+
+default_settings: Dict[str, Any] = {
+    "uri": "mongodb://localhost:27017/",
+    "database": "aruodas_apartments",
+    "max_pool_size": 50,
+    "min_pool_size": 0,
+    "connect_timeout_ms": 5000,
+    "socket_timeout_ms": 30000,
+    "server_selection_timeout_ms": 5000,
+    "wait_queue_timeout_ms": 10000,
+    "read_preference": "primary",
+    "write_concern": 1,
+    "snapshot_dir": "snapshots",
+}
+
+# Setting -> environment variable overriding it
+env_variables: Dict[str, str] = {
+    "uri": "MONGO_URI",
+    "database": "MONGO_DATABASE",
+    "max_pool_size": "MONGO_MAX_POOL_SIZE",
+    "min_pool_size": "MONGO_MIN_POOL_SIZE",
+    "connect_timeout_ms": "MONGO_CONNECT_TIMEOUT_MS",
+    "socket_timeout_ms": "MONGO_SOCKET_TIMEOUT_MS",
+    "server_selection_timeout_ms": "MONGO_SERVER_SELECTION_TIMEOUT_MS",
+    "wait_queue_timeout_ms": "MONGO_WAIT_QUEUE_TIMEOUT_MS",
+    "read_preference": "MONGO_READ_PREFERENCE",
+    "write_concern": "MONGO_WRITE_CONCERN",
+    "snapshot_dir": "LISTINGS_SNAPSHOT_DIR",
+}
+
+# Setting -> MongoClient keyword argument
+client_option_names: Dict[str, str] = {
+    "max_pool_size": "maxPoolSize",
+    "min_pool_size": "minPoolSize",
+    "connect_timeout_ms": "connectTimeoutMS",
+    "socket_timeout_ms": "socketTimeoutMS",
+    "server_selection_timeout_ms": "serverSelectionTimeoutMS",
+    "wait_queue_timeout_ms": "waitQueueTimeoutMS",
+    "read_preference": "readPreference",
+    "write_concern": "w",
+}
+
+
+def _parse_value(name: str, raw: str) -> Any:
+    """Convert an environment variable to the type of its default ("majority" stays a string)."""
+    if isinstance(default_settings[name], int) and raw.lstrip("-").isdigit():
+        return int(raw)
+    return raw
+
+
+def load_mongo_settings(environ: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Read the connection settings from the defaults, the settings file and the environment.
+
+    Args:
+        environ (Optional[Dict[str, str]]): Environment to read, defaults to `os.environ`.
+
+    Returns:
+        Dict[str, Any]: Settings keyed like `default_settings`.
+    """
+    environ = environ if environ is not None else os.environ
+    settings = dict(default_settings)
+
+    settings_file = environ.get("MONGO_SETTINGS_FILE")
+    if settings_file:
+        with open(settings_file, encoding="utf-8") as f:
+            settings.update({key: value for key, value in json.load(f).items() if key in default_settings})
+
+    for name, variable in env_variables.items():
+        if environ.get(variable):
+            settings[name] = _parse_value(name, environ[variable])
+    return settings
+
+
+_settings: Optional[Dict[str, Any]] = None
+
+
+def mongo_settings() -> Dict[str, Any]:
+    """
+    Return the settings of this process, read once on first use.
+
+    Returns:
+        Dict[str, Any]: See `load_mongo_settings`.
+    """
+    global _settings
+    if _settings is None:
+        _settings = load_mongo_settings()
+    return _settings
+
+
+def database_uri(settings: Dict[str, Any]) -> str:
+    """
+    Return the settings' URI with the database in its path, the form Flask-PyMongo expects.
+
+    Args:
+        settings (Dict[str, Any]): Connection settings.
+
+    Returns:
+        str: The URI; one that already names a database is returned unchanged.
+    """
+    base, separator, options = settings["uri"].partition("?")
+    scheme, _, rest = base.partition("://")
+    hosts, _, path = rest.partition("/")
+    if path:
+        return settings["uri"]
+    return f"{scheme}://{hosts}/{settings['database']}{separator}{options}"
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Connection pool listener keeping counters and checkout wait times for every client it is
+    registered with.
+    """
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self._checkout_started: Dict[int, float] = {}
+        self.pools: int = 0
+        self.created: int = 0
+        self.closed: int = 0
+        self.checked_out: int = 0
+        self.in_use: int = 0
+        self.max_in_use: int = 0
+        self.checkout_failures: Dict[str, int] = {}
+        self._wait_seconds: float = 0.0
+        self.max_wait_ms: float = 0.0
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        with self._lock:
+            self.pools += 1
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        pass
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        with self._lock:
+            self.pools -= 1
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        with self._lock:
+            self.created += 1
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        with self._lock:
+            self.closed += 1
+
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent) -> None:
+        # Checkouts block the calling thread, so the thread identifies the pending checkout
+        self._checkout_started[threading.get_ident()] = time.perf_counter()
+
+    def _checkout_wait(self) -> float:
+        started = self._checkout_started.pop(threading.get_ident(), None)
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        self._checkout_wait()
+        with self._lock:
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        wait = self._checkout_wait()
+        with self._lock:
+            self.checked_out += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            self._wait_seconds += wait
+            self.max_wait_ms = max(self.max_wait_ms, wait * 1000)
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        with self._lock:
+            self.in_use -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Pool counters since the process started.
+
+        Returns:
+            Dict[str, Any]: Open pools and connections, connections in use (now and at most),
+                            checkouts, failures by reason and checkout wait times.
+        """
+        with self._lock:
+            return {
+                "pools": self.pools,
+                "open_connections": self.created - self.closed,
+                "connections_created": self.created,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "checkouts": self.checked_out,
+                "checkout_failures": dict(self.checkout_failures),
+                "avg_checkout_wait_ms": self._wait_seconds / self.checked_out * 1000 if self.checked_out else 0.0,
+                "max_checkout_wait_ms": self.max_wait_ms,
+            }
+
+
+# Shared by every client created from `client_options`
+pool_stats: PoolStatsListener = PoolStatsListener()
+
+
+def client_options(settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the `MongoClient` keyword arguments for the settings, with the pool listener.
+
+    Args:
+        settings (Optional[Dict[str, Any]]): Connection settings, defaults to `mongo_settings()`.
+
+    Returns:
+        Dict[str, Any]: Pool, timeout, read preference and write concern options.
+    """
+    settings = settings if settings is not None else mongo_settings()
+    options = {option: settings[name] for name, option in client_option_names.items()}
+    options["event_listeners"] = [pool_stats]
+    return options
@@ -0,0 +1,218 @@
+"""
+Export of the 'properties' collection to partitioned Parquet files for offline analysis.
+
+Listings are streamed from MongoDB in batches and written as a Hive-partitioned dataset
+(`city=<city>/scrape_date=<YYYY-MM-DD>/part-*.parquet`), with column types taken from
+`schema_validation.py`. The export state file in the dataset directory keeps a watermark
+(the latest `last_seen` exported), so later runs only export listings written since then.
+
+Run from the project root:
+
+    python -m scraper_mongodb.parquet_export --out exports/properties
+"""
+
+import argparse
+import json
+import os
+import uuid
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pymongo.collection import Collection
+
+from .categories import DEFAULT_CATEGORY
+from .schema_validation import properties_validation_rules
+
+
+# BSON type in the validator -> Arrow column type
+bson_arrow_types: Dict[str, pa.DataType] = {
+    "string": pa.string(),
+    "double": pa.float64(),
+    "int": pa.int32(),
+    "long": pa.int64(),
+    "date": pa.timestamp("ms"),
+    "bool": pa.bool_(),
+}
+
+# Columns the dataset is partitioned by; they live in the directory names, not in the files
+partition_columns: List[str] = ["city", "scrape_date"]
+partition_schema: pa.Schema = pa.schema([("city", pa.string()), ("scrape_date", pa.date32())])
+
+# Export state (watermark) stored next to the data; files starting with "_" are not data
+state_file_name: str = "_export_state.json"
+
+
+def arrow_schema() -> pa.Schema:
+    """
+    Build the Arrow schema of an exported listing from the 'properties' validator.
+
+    Returns:
+        pa.Schema: The listing URL, every validated field, and the `scrape_date` partition.
+    """
+    properties = properties_validation_rules["$jsonSchema"]["properties"]
+    fields = [pa.field("url", pa.string())]
+    fields += [pa.field(name, bson_arrow_types[rule["bsonType"]]) for name, rule in properties.items()]
+    fields.append(pa.field("scrape_date", pa.date32()))
+    return pa.schema(fields)
+
+
+def _scrape_date(doc: Dict[str, Any]) -> date:
+    """Day the listing was last scraped; older documents fall back to their `_id` time."""
+    seen = doc.get("last_seen") or doc.get("first_seen")
+    if seen is None and "_id" in doc:
+        seen = doc["_id"].generation_time
+    return (seen or datetime.utcnow()).date()
+
+
+def _batches(cursor: Iterator[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Split a cursor into lists of at most `batch_size` documents."""
+    while True:
+        batch = list(islice(cursor, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def read_export_state(out_dir: str) -> Dict[str, Any]:
+    """
+    Read the export state of a dataset directory.
+
+    Args:
+        out_dir (str): Dataset directory.
+
+    Returns:
+        Dict[str, Any]: The state, with `watermark` as a datetime; empty if nothing was exported.
+    """
+    path = os.path.join(out_dir, state_file_name)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("watermark"):
+        state["watermark"] = datetime.fromisoformat(state["watermark"])
+    return state
+
+
+def _write_export_state(out_dir: str, state: Dict[str, Any]) -> None:
+    """Write the export state, replacing the previous one in a single rename."""
+    path = os.path.join(out_dir, state_file_name)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, default=lambda value: value.isoformat())
+    os.replace(path + ".tmp", path)
+
+
+def export_properties(
+    collection: Collection,
+    out_dir: str,
+    incremental: bool = True,
+    batch_size: int = 50000
+) -> Dict[str, Any]:
+    """
+    Stream the listings into the Parquet dataset in `out_dir`.
+
+    Each batch of `batch_size` documents becomes one Arrow table, written into the city and
+    scrape date partitions it covers. With `incremental`, only listings whose `last_seen` is
+    at or after the stored watermark are exported; a listing exported twice has one row per
+    scrape date, and `read_properties` keeps the latest.
+
+    Args:
+        collection (Collection): The 'properties' collection.
+        out_dir (str): Dataset directory, created if needed.
+        incremental (bool): Export only what was written since the last export.
+        batch_size (int): Documents per batch (and at most per written file).
+
+    Returns:
+        Dict[str, Any]: Rows and batches written, and the new watermark.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    state = read_export_state(out_dir)
+    watermark: Optional[datetime] = state.get("watermark") if incremental else None
+
+    # `$gte`: listings written in the same flush share a timestamp and may straddle an export
+    query: Dict[str, Any] = {"last_seen": {"$gte": watermark}} if watermark is not None else {}
+    schema = arrow_schema()
+    projection = {name: 1 for name in schema.names if name != "scrape_date"}
+    # Unique per run, so files of earlier exports in the same partitions are never replaced
+    run = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+    totals: Dict[str, Any] = {"rows": 0, "batches": 0, "watermark": watermark}
+    for number, batch in enumerate(_batches(collection.find(query, projection, batch_size=batch_size), batch_size)):
+        rows = [{**{name: doc.get(name) for name in schema.names}, "scrape_date": _scrape_date(doc)} for doc in batch]
+        ds.write_dataset(
+            pa.Table.from_pylist(rows, schema=schema),
+            out_dir,
+            format="parquet",
+            partitioning=ds.partitioning(partition_schema, flavor="hive"),
+            basename_template=f"part-{run}-{number}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        seen = [doc["last_seen"] for doc in batch if doc.get("last_seen") is not None]
+        if seen and (totals["watermark"] is None or max(seen) > totals["watermark"]):
+            totals["watermark"] = max(seen)
+        totals["rows"] += len(batch)
+        totals["batches"] += 1
+
+    exported_rows = totals["rows"] + (state.get("rows", 0) if incremental else 0)
+    _write_export_state(out_dir, {"watermark": totals["watermark"], "exported_at": datetime.utcnow(),
+                                  "rows": exported_rows})
+    print(f"Exported {totals['rows']} listings in {totals['batches']} batches to '{out_dir}'.")
+    return totals
+
+
+def read_properties(
+    out_dir: str,
+    columns: Optional[List[str]] = None,
+    city: Optional[str] = None,
+    latest_only: bool = True,
+    category: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Read exported listings into a DataFrame, loading only the requested columns.
+
+    Args:
+        out_dir (str): Dataset directory written by `export_properties`.
+        columns (Optional[List[str]]): Columns to load; None loads all of them.
+        city (Optional[str]): Only read the partition of this city.
+        latest_only (bool): Keep one row per listing, from its latest scrape date.
+        category (Optional[str]): Only read listings of this category; listings exported
+                                  without one count as `DEFAULT_CATEGORY`.
+
+    Returns:
+        pd.DataFrame: The listings.
+    """
+    dataset = ds.dataset(out_dir, format="parquet", partitioning=ds.partitioning(partition_schema, flavor="hive"))
+    wanted = list(columns) if columns is not None else list(dataset.schema.names)
+    # Deduplication needs the listing URL and its scrape time even if they were not asked for
+    extra = [name for name in ("url", "last_seen") if latest_only and name not in wanted]
+
+    condition: Optional[ds.Expression] = (ds.field("city") == city) if city else None
+    if category and "category" in dataset.schema.names:
+        in_category = ds.field("category") == category
+        if category == DEFAULT_CATEGORY:
+            in_category = in_category | ds.field("category").is_null()
+        condition = in_category if condition is None else condition & in_category
+    elif category and category != DEFAULT_CATEGORY:
+        # Exports from before categories only hold listings of the default category
+        return pd.DataFrame(columns=wanted)
+
+    table = dataset.to_table(columns=wanted + extra, filter=condition)
+    df = table.to_pandas()
+    if latest_only and not df.empty:
+        df = df.sort_values("last_seen", na_position="first").drop_duplicates("url", keep="last")
+    return df[wanted].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default="exports/properties", help="Dataset directory.")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and export every listing.")
+    parser.add_argument("--batch-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    from .properties_mongo_db import get_db
+
+    export_properties(get_db()["properties"], args.out, incremental=not args.full, batch_size=args.batch_size)
@@ -0,0 +1,408 @@
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from bs4 import BeautifulSoup, Tag
+from lxml import etree
+from lxml import html as lxml_html
+
+
+# Every digit in a price string, e.g. "150 000 €" -> "150000"
+_NON_DIGITS = re.compile(r"\D+")
+
+
+def _has_class(name: str) -> str:
+    """XPath predicate matching elements whose class attribute contains the `name` token."""
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+# === LXML SELECTORS (compiled once) ===
+_html_parser = lxml_html.HTMLParser(encoding="utf-8")
+_link_xpath = etree.XPath("(.//a[@href])[1]")
+_img_xpath = etree.XPath("(.//img)[1]")
+
+
+def _digits(raw: str) -> str:
+    """Return all digits of `raw` joined together."""
+    return _NON_DIGITS.sub("", raw)
+
+
+def float_digits(raw: str) -> float:
+    """Read the digits of `raw` (e.g. "125 000 €") as a float, 0.0 if there are none."""
+    digits = _digits(raw)
+    return float(digits) if digits else 0.0
+
+
+def int_digits(raw: str) -> int:
+    """Read the digits of `raw` (e.g. "2 450 €/m²") as an int, 0 if there are none."""
+    digits = _digits(raw)
+    return int(digits) if digits else 0
+
+
+def stripped_float(raw: str) -> Optional[float]:
+    """Parse `raw` without surrounding whitespace as a float, None if it is not a number."""
+    try:
+        return float(raw.strip())
+    except ValueError:
+        return None
+
+
+def stripped_int(raw: str) -> Optional[int]:
+    """Parse `raw` without surrounding whitespace as an int, None if it is not a number."""
+    try:
+        return int(raw.strip())
+    except ValueError:
+        return None
+
+
+class CardField:
+    """
+    One field of a listing card: the element holding it and how its text is converted.
+
+    Attributes:
+        tag (str): Element name, e.g. "span".
+        css_class (str): Class token of the element.
+        convert (Callable[[str], Any]): Converts the element text into the stored value,
+                                        or returns None for text it cannot read.
+        required (bool): Cards without the element, or whose text cannot be converted, are
+                         skipped as incomplete.
+        default (Any): Value of an optional field whose element is missing or unreadable;
+                       None leaves the field out of the listing.
+    """
+    def __init__(
+        self,
+        tag: str,
+        css_class: str,
+        convert: Callable[[str], Any],
+        required: bool = False,
+        default: Any = None
+    ) -> None:
+        self.tag: str = tag
+        self.css_class: str = css_class
+        self.convert: Callable[[str], Any] = convert
+        self.required: bool = required
+        self.default: Any = default
+        self.xpath: etree.XPath = etree.XPath(f"(.//{tag}[{_has_class(css_class)}])[1]")
+
+
+class CardLayout:
+    """
+    Where the listing cards of a list page are and which fields they hold.
+
+    Every card also gets the city, district and street from its image title and the `url` of
+    its first link. `constants` are fields the category's cards do not show but the schema
+    requires (e.g. rooms of a plot).
+
+    Attributes:
+        card_class (str): Class token of the card elements.
+        fields (Dict[str, CardField]): Document field -> where to read it.
+        constants (Dict[str, Any]): Fields set to the same value on every listing.
+    """
+    def __init__(
+        self,
+        fields: Dict[str, CardField],
+        card_class: str = "advert-flex",
+        constants: Optional[Dict[str, Any]] = None
+    ) -> None:
+        self.card_class: str = card_class
+        self.fields: Dict[str, CardField] = fields
+        self.constants: Dict[str, Any] = dict(constants or {})
+        self.cards_xpath: etree.XPath = etree.XPath(f"//div[{_has_class(card_class)}]")
+
+
+# Apartment list pages (/butai/); the BeautifulSoup reference parser only knows this layout
+apartment_layout: CardLayout = CardLayout({
+    "price": CardField("span", "list-item-price-v2", float_digits, required=True),
+    "size_m2": CardField("div", "list-AreaOverall-v2", stripped_float, default=0.0),
+    "price_per_m2": CardField("span", "price-pm-v2", int_digits, required=True),
+    "number_of_rooms": CardField("div", "list-RoomNum-v2", stripped_int, required=True),
+})
+
+
+def _location(title: Optional[str]) -> Tuple[str, str, str]:
+    """
+    Split an image title like "Vilnius, Senamiestis, Pilies g. | ..." into city, district and street.
+
+    Args:
+        title (Optional[str]): The `title` attribute of the listing image.
+
+    Returns:
+        Tuple[str, str, str]: City, district and street, "N/A" for missing parts.
+    """
+    if title is None:
+        return "N/A", "N/A", "N/A"
+
+    parts = title.split(" | ")[0].split(", ")
+    city: str = parts[0] if len(parts) > 0 else "N/A"
+    district: str = parts[1] if len(parts) > 1 else "N/A"
+    street: str = parts[2] if len(parts) > 2 else "N/A"
+    return city, district, street
+
+
+def _build_listing(
+    title: Optional[str],
+    price_text: str,
+    price_per_m2_text: str,
+    rooms_text: str,
+    size_text: Optional[str],
+    url: str
+) -> Optional[Dict[str, Any]]:
+    """Convert the raw text of a listing card into a property document, or None if the room count is unreadable."""
+    city, district, street = _location(title)
+    price_digits = _digits(price_text)
+    price_per_m2_digits = _digits(price_per_m2_text)
+    number_of_rooms = stripped_int(rooms_text)
+    size_m2 = stripped_float(size_text) if size_text is not None else None
+    if number_of_rooms is None:
+        return None
+
+    return {
+        "city": city,
+        "district": district,
+        "street": street,
+        "price": float(price_digits) if price_digits else 0.0,
+        "size_m2": size_m2 if size_m2 is not None else 0.0,
+        "price_per_m2": int(price_per_m2_digits) if price_per_m2_digits else 0,
+        "number_of_rooms": number_of_rooms,
+        "url": url
+    }
+
+
+def _first(xpath: etree.XPath, element: Any) -> Optional[Any]:
+    """Return the first match of a compiled XPath, or None."""
+    matches = xpath(element)
+    return matches[0] if matches else None
+
+
+def _parse_page_lxml(html: str, layout: CardLayout = apartment_layout) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Parse a listing page with lxml and the precompiled XPath selectors of a card layout.
+
+    Args:
+        html (str): Page HTML.
+        layout (CardLayout): Cards and fields of the page's listing category.
+
+    Returns:
+        Tuple[int, List[Dict[str, Any]]]: Number of listing cards on the page, and the listings
+                                          that had all required fields.
+    """
+    if not html.strip():
+        return 0, []
+
+    root = lxml_html.fromstring(html.encode("utf-8"), parser=_html_parser)
+    cards = layout.cards_xpath(root)
+    listings: List[Dict[str, Any]] = []
+
+    for card in cards:
+        tags = {name: _first(field.xpath, card) for name, field in layout.fields.items()}
+        if any(tags[name] is None for name, field in layout.fields.items() if field.required):
+            continue
+
+        link = _first(_link_xpath, card)
+        img = _first(_img_xpath, link) if link is not None else None
+        city, district, street = _location(img.get("title") if img is not None else None)
+
+        listing: Dict[str, Any] = {"city": city, "district": district, "street": street}
+        for name, field in layout.fields.items():
+            tag = tags[name]
+            value = field.convert(tag.text_content()) if tag is not None else None
+            if value is None and field.required:
+                # Unreadable text in a required field, e.g. "Kaina sutartinė", skips the card
+                break
+            value = value if value is not None else field.default
+            if value is not None:
+                listing[name] = value
+        else:
+            listing.update(layout.constants)
+            listing["url"] = link.get("href") if link is not None else "N/A"
+            listings.append(listing)
+
+    return len(cards), listings
+
+
+def _parse_card_bs4(ad: Tag) -> Optional[Dict[str, Any]]:
+    """
+    Parse one listing card with BeautifulSoup.
+
+    Args:
+        ad (Tag): A `div.advert-flex` listing card.
+
+    Returns:
+        Dict[str, Any] or None: The parsed property, or None if critical fields are missing.
+    """
+    a_tag = ad.find("a", href=True)
+    img_tag = a_tag.find("img") if a_tag else None
+    title: Optional[str] = img_tag["title"] if img_tag and img_tag.has_attr("title") else None
+
+    price_tag = ad.find("span", class_="list-item-price-v2")
+    price_per_m2_tag = ad.find("span", class_="price-pm-v2")
+    number_of_rooms_tag = ad.find("div", class_="list-RoomNum-v2 list-detail-v2")
+    size_tag = ad.find("div", class_="list-AreaOverall-v2 list-detail-v2")
+
+    if not all([price_tag, price_per_m2_tag, number_of_rooms_tag]):
+        return None
+
+    return _build_listing(
+        title=title,
+        price_text=price_tag.text,
+        price_per_m2_text=price_per_m2_tag.text,
+        rooms_text=number_of_rooms_tag.text,
+        size_text=size_tag.text if size_tag else None,
+        url=a_tag["href"] if a_tag else "N/A"
+    )
+
+
+def _parse_page_bs4(html: str) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Parse a listing page with BeautifulSoup's "html.parser".
+
+    This is the original scraper implementation. It is slower than the lxml path and is kept
+    as the reference the lxml parser is tested against.
+
+    Args:
+        html (str): Page HTML.
+
+    Returns:
+        Tuple[int, List[Dict[str, Any]]]: Number of listing cards on the page, and the listings
+                                          that had all required fields.
+    """
+    soup: BeautifulSoup = BeautifulSoup(html, "html.parser")
+    ads = soup.find_all("div", class_="advert-flex")
+    listings = [listing for listing in map(_parse_card_bs4, ads) if listing is not None]
+    return len(ads), listings
+
+
+parser_backends: Dict[str, Callable[[str], Tuple[int, List[Dict[str, Any]]]]] = {
+    "lxml": _parse_page_lxml,
+    "bs4": _parse_page_bs4,
+}
+
+
+def parse_page(
+    html: str,
+    backend: str = "lxml",
+    layout: Optional[CardLayout] = None
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Parse a listing page and report how many listing cards it had.
+
+    The card count lets the crawlers tell an empty page (end of the listings) apart from a
+    page whose cards were all skipped as incomplete.
+
+    Args:
+        html (str): Page HTML.
+        backend (str): "lxml" (fast path) or "bs4" (reference implementation).
+        layout (Optional[CardLayout]): Card layout of another listing category than
+                                       apartments; only the lxml backend supports it.
+
+    Returns:
+        Tuple[int, List[Dict[str, Any]]]: Number of listing cards, and the complete listings.
+
+    Raises:
+        ValueError: If a layout is given for the bs4 backend.
+    """
+    if layout is None:
+        return parser_backends[backend](html)
+    if backend != "lxml":
+        raise ValueError("Card layouts are only supported by the lxml parser.")
+    return _parse_page_lxml(html, layout)
+
+
+def parse_listing_page(html: str, backend: str = "lxml") -> List[Dict[str, Any]]:
+    """
+    Parse the listings on an aruodas.lt listing page.
+
+    Listings without critical information (price, price per m², room count) are skipped.
+
+    Extracted data includes:
+    - City, district, street
+    - Price and price per square meter
+    - Apartment size (m²)
+    - Number of rooms
+    - URL to the listing
+
+    Args:
+        html (str): Page HTML.
+        backend (str): "lxml" (fast path) or "bs4" (reference implementation).
+
+    Returns:
+        List[Dict[str, Any]]: One property document per complete listing.
+    """
+    return parse_page(html, backend)[1]
+
+
+# === DETAIL PAGES ===
+# Label of a row in the detail page's `dl.obj-details` table -> (field, converter)
+_detail_terms_xpath = etree.XPath(f"//dl[{_has_class('obj-details')}]/dt")
+_detail_map_xpath = etree.XPath("//*[@data-lat and @data-lng]")
+_YEAR = re.compile(r"\b(1[89]\d\d|20\d\d)\b")
+_INTEGER = re.compile(r"-?\d+")
+# Map links carry the coordinates as "...query=54.6872,25.2797" or "...q=54.6872,25.2797"
+_MAP_QUERY = re.compile(r"[?&](?:query|q)=(-?\d+\.\d+),\s*(-?\d+\.\d+)")
+
+
+def _first_int(raw: str) -> Optional[int]:
+    match = _INTEGER.search(raw)
+    return int(match.group()) if match else None
+
+
+def _year(raw: str) -> Optional[int]:
+    match = _YEAR.search(raw)
+    return int(match.group()) if match else None
+
+
+def _text(raw: str) -> Optional[str]:
+    return " ".join(raw.split()) or None
+
+
+detail_labels: Dict[str, Tuple[str, Callable[[str], Any]]] = {
+    "aukštas": ("floor", _first_int),
+    "aukštų sk.": ("floors_total", _first_int),
+    "statybos metai": ("build_year", _year),
+    "šildymas": ("heating", _text),
+}
+
+
+def parse_detail_page(html: str) -> Dict[str, Any]:
+    """
+    Parse the extra attributes of a listing from its detail page.
+
+    Extracted data includes (each only if present on the page):
+    - Floor and number of floors in the building
+    - Build year
+    - Heating
+    - Latitude and longitude
+
+    Args:
+        html (str): Detail page HTML.
+
+    Returns:
+        Dict[str, Any]: The attributes found, keyed by document field.
+    """
+    if not html.strip():
+        return {}
+
+    root = lxml_html.fromstring(html.encode("utf-8"), parser=_html_parser)
+    details: Dict[str, Any] = {}
+
+    for term in _detail_terms_xpath(root):
+        label = term.text_content().strip().rstrip(":").strip().lower()
+        value_tag = term.getnext()
+        if label not in detail_labels or value_tag is None or value_tag.tag != "dd":
+            continue
+        field, convert = detail_labels[label]
+        value = convert(value_tag.text_content())
+        if value is not None:
+            details[field] = value
+
+    map_tag = _first(_detail_map_xpath, root)
+    if map_tag is not None:
+        try:
+            details["latitude"] = float(map_tag.get("data-lat"))
+            details["longitude"] = float(map_tag.get("data-lng"))
+        except ValueError:
+            details.pop("latitude", None)
+    else:
+        match = _MAP_QUERY.search(html)
+        if match:
+            details["latitude"], details["longitude"] = float(match.group(1)), float(match.group(2))
+
+    return details
@@ -1,72 +1,534 @@
-from pymongo import MongoClient
+import time
+import hashlib
+import threading
+from pymongo import MongoClient, UpdateOne
+from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError, OperationFailure
+from .categories import DEFAULT_CATEGORY
 from .schema_validation import properties_validation_rules, saved_search_schema
+from .indexes import ensure_indexes, price_history_indexes
+from .market_stats import GroupKey, group_key, refresh_market_stats
+from .crawl_meta import bump_crawl_version, mark_properties_written
+from .mongo_settings import client_options, mongo_settings
 from datetime import datetime
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Callable, Dict, Any, List, Optional, Set, Tuple
 
+if TYPE_CHECKING:
+    # Imports the HTTP stack, which only crawls that enrich listings need
+    from .enrichment import DetailEnricher
 
-# Connect to MongoDB
-client: MongoClient = MongoClient("mongodb://localhost:27017/")
-db = client["aruodas_apartments"]
 
 # Collection names
 collection_name: str = "properties"
 saved_search_collection_name: str = "saved_searches"
+price_history_collection_name: str = "price_history"
 
-# Define collections
-collection = db[collection_name]
-saved_search_collection = db[saved_search_collection_name]
+# Clients per (URI, option overrides) and databases whose schema was already applied in this process
+_clients: Dict[Tuple[str, Tuple[Tuple[str, Any], ...]], MongoClient] = {}
+_schema_applied: Set[Tuple[int, str]] = set()
+_lock: threading.Lock = threading.Lock()
 
-# Get existing collections
-existing_collections = db.list_collection_names()
 
-# Apply schema validation to 'properties' collection
-if collection_name in existing_collections:
-    db.command(
-        "collMod",
-        collection_name,
-        validator=properties_validation_rules
-    )
-    print(f"Schema validation applied to existing collection '{collection_name}'.")
-else:
-    db.create_collection(
-        collection_name,
-        validator=properties_validation_rules
-    )
-    print(f"Collection '{collection_name}' created with schema validation.")
+def get_client(uri: Optional[str] = None, **overrides: Any) -> MongoClient:
+    """
+    Return the shared `MongoClient` for a URI, creating it on first use.
 
+    Creating a client does not contact the server; the first operation does.
 
-def save_property(property_data: Dict[str, Any]) -> None:
+    Args:
+        uri (Optional[str]): MongoDB URI, defaults to the one in `mongo_settings()`.
+        **overrides: MongoClient options (e.g. maxPoolSize, serverSelectionTimeoutMS)
+                     overriding those built from the shared settings.
+
+    Returns:
+        MongoClient: One client (and connection pool) per URI and overrides.
     """
-    Insert or update a property in the MongoDB 'properties' collection based on the property's URL.
+    uri = uri or mongo_settings()["uri"]
+    key = (uri, tuple(sorted(overrides.items())))
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = MongoClient(uri, **{**client_options(), **overrides})
+            _clients[key] = client
+    return client
+
+
+def get_db(uri: Optional[str] = None, name: Optional[str] = None, **overrides: Any) -> Database:
+    """
+    Return the scraper database without touching the server.
+
+    Args:
+        uri (Optional[str]): MongoDB URI, see `get_client`.
+        name (Optional[str]): Database name, defaults to the one in `mongo_settings()`.
+        **overrides: MongoClient options, see `get_client`.
+
+    Returns:
+        Database: The database.
+    """
+    return get_client(uri, **overrides)[name or mongo_settings()["database"]]
+
+
+def ensure_schema(db: Optional[Database] = None) -> Database:
+    """
+    Apply the collection validators and indexes, once per database and process.
+
+    Creates 'properties' and 'saved_searches' with their validators (or updates the validators
+    of existing collections), the 'price_history' time-series collection and all indexes.
+
+    Args:
+        db (Optional[Database]): Database to set up, defaults to `get_db()`.
+
+    Returns:
+        Database: The same database, ready for writes.
+    """
+    db = db if db is not None else get_db()
+    key = (id(db.client), db.name)
+    if key in _schema_applied:
+        return db
+
+    with _lock:
+        if key in _schema_applied:
+            return db
+
+        existing_collections = db.list_collection_names()
+
+        # Apply schema validation to the 'properties' and 'saved_searches' collections
+        for name, validator in ((collection_name, properties_validation_rules),
+                                (saved_search_collection_name, saved_search_schema)):
+            if name in existing_collections:
+                db.command("collMod", name, validator=validator)
+                print(f"Schema validation applied to existing collection '{name}'.")
+            else:
+                db.create_collection(name, validator=validator)
+                print(f"Collection '{name}' created with schema validation.")
+
+        # Unique 'url' index for the upserts plus compound indexes for the search filters
+        ensure_indexes(db[collection_name])
+
+        # Price history is a time-series collection: one point per price change, grouped per listing
+        if price_history_collection_name not in existing_collections:
+            try:
+                db.create_collection(
+                    price_history_collection_name,
+                    timeseries={"timeField": "ts", "metaField": "meta", "granularity": "hours"}
+                )
+                print(f"Time-series collection '{price_history_collection_name}' created.")
+            except OperationFailure as e:
+                # Servers older than MongoDB 5.0 have no time-series collections; store plain documents
+                db.create_collection(price_history_collection_name)
+                print(f"Collection '{price_history_collection_name}' created without time-series support: {e}")
+
+        ensure_indexes(db[price_history_collection_name], price_history_indexes)
+        _schema_applied.add(key)
+    return db
+
+
+def get_collection(name: str = collection_name) -> Collection:
+    """
+    Return a collection of the default database, applying the schema first if needed.
+
+    Args:
+        name (str): Collection name, defaults to 'properties'.
+
+    Returns:
+        Collection: The collection.
+    """
+    return ensure_schema()[name]
+
+
+# Fields whose changes count as a changed listing for incremental crawls
+content_hash_fields: List[str] = ["price", "price_per_m2", "size_m2", "number_of_rooms"]
+
+
+def content_hash(property_data: Dict[str, Any]) -> str:
+    """
+    Hash the fields of a property that matter for change detection.
+
+    Args:
+        property_data (Dict[str, Any]): A dictionary containing property details.
+
+    Returns:
+        str: Hex digest of price, price per m², size and number of rooms.
+    """
+    key = "|".join(str(property_data.get(field)) for field in content_hash_fields)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def load_known_hashes(
+    target_collection: Optional[Collection] = None,
+    query: Optional[Dict[str, Any]] = None
+) -> Dict[str, str]:
+    """
+    Load the URL -> content hash map of every stored property in one query.
+
+    Documents stored before content hashes were introduced get their hash computed from the
+    stored fields.
+
+    Args:
+        target_collection (Optional[Collection]): Collection to read, defaults to 'properties'.
+        query (Optional[Dict[str, Any]]): Only load matching properties, e.g. one category.
+
+    Returns:
+        Dict[str, str]: Content hash per listing URL.
+    """
+    source = target_collection if target_collection is not None else get_collection()
+    projection = {"_id": 0, "url": 1, "content_hash": 1, **{field: 1 for field in content_hash_fields}}
+
+    known: Dict[str, str] = {}
+    for doc in source.find(query or {}, projection):
+        known[doc["url"]] = doc.get("content_hash") or content_hash(doc)
+
+    print(f"Loaded {len(known)} known listings.")
+    return known
+
+
+def _upsert_operation(property_data: Dict[str, Any], seen_at: datetime) -> UpdateOne:
+    """
+    Build the upsert operation used to store a property keyed by its URL.
+
+    The property's `content_hash` is stored with it so later incremental crawls can skip it
+    while it stays unchanged. `first_seen` is only set when the listing is inserted,
+    `last_seen` on every write.
 
     Args:
         property_data (Dict[str, Any]): A dictionary containing property details.
                                         Must include a 'url' key.
+        seen_at (datetime): Time the listing was scraped.
 
     Returns:
-        None
+        UpdateOne: The bulk write operation for this property.
     """
-    collection.update_one(
+    return UpdateOne(
         {"url": property_data["url"]},
-        {"$set": property_data},
+        {
+            "$set": {**property_data, "content_hash": content_hash(property_data), "last_seen": seen_at},
+            "$setOnInsert": {"first_seen": seen_at}
+        },
         upsert=True
     )
 
 
-# Apply schema validation to 'saved_searches' collection
-if saved_search_collection_name in existing_collections:
-    db.command(
-        "collMod",
-        saved_search_collection_name,
-        validator=saved_search_schema
-    )
-    print(f"Schema validation applied to existing collection '{saved_search_collection_name}'.")
-else:
-    db.create_collection(
-        saved_search_collection_name,
-        validator=saved_search_schema
-    )
-    print(f"Collection '{saved_search_collection_name}' created with schema validation.")
+def _price_changed(stored: Optional[Dict[str, Any]], property_data: Dict[str, Any]) -> bool:
+    """Return True if the listing is new or its price or price per m² differs from the stored one."""
+    if stored is None:
+        return True
+    previous = (stored.get("price"), stored.get("price_per_m2"))
+    return previous != (property_data.get("price"), property_data.get("price_per_m2"))
+
+
+def _price_point(property_data: Dict[str, Any], seen_at: datetime) -> Dict[str, Any]:
+    """
+    Build a price history point for a listing.
+
+    Args:
+        property_data (Dict[str, Any]): The listing.
+        seen_at (datetime): Time the price was observed.
+
+    Returns:
+        Dict[str, Any]: A document for the 'price_history' time-series collection.
+    """
+    return {
+        "ts": seen_at,
+        "meta": {
+            "url": property_data["url"],
+            "city": property_data.get("city"),
+            "district": property_data.get("district"),
+        },
+        "price": property_data.get("price"),
+        "price_per_m2": property_data.get("price_per_m2"),
+    }
+
+
+class PropertyWriter:
+    """
+    Buffered writer that stores scraped properties with unordered `bulk_write` batches.
+
+    Listings are collected in memory (keyed by URL, so a listing seen twice in one batch
+    is only written once) and flushed as a single batch of `UpdateOne` upserts when the
+    buffer reaches `batch_size` or when `flush_interval` seconds have passed since the
+    last flush. Remaining listings are flushed by `close()`, which also runs when the
+    writer is used as a context manager.
+
+    When `known_hashes` is given (see `load_known_hashes`), listings whose content hash
+    matches the stored one are not rewritten; the map is updated as listings are added and
+    only their `last_seen` is refreshed, with one `update_many` per batch.
+
+    Each flush also appends a point to the price history collection for every listing that
+    is new or whose price or price per m² differs from the stored one, so the history grows
+    with the number of price changes rather than the number of crawls.
+
+    The (category, city, district, rooms) groups of the written listings are collected in
+    `touched_groups`; on `close()` only those groups of the `market_stats` cube are refreshed
+    and the crawl version stamp is bumped. If the writer touched a group of the snapshot's
+    category (`DEFAULT_CATEGORY`), a NumPy snapshot of that category's listings is then written
+    to `snapshot_dir` for the web app's analytics (see `listing_snapshot`). The directory
+    defaults to the shared `snapshot_dir` setting (see `mongo_settings`); an empty one turns
+    snapshots off.
+
+    With `match_alerts`, the feed fields (see `alerts.feed_fields`) of listings that are new or
+    whose content hash differs from the stored one are collected in `changed_listings`, and
+    `close()` matches them against every saved search and adds the hits to the users' alert
+    feeds (see `alerts`).
+
+    With an `enricher` (see `enrichment.DetailEnricher`), the URLs of new or changed listings
+    are also handed to it after each flush, for their detail pages to be fetched.
+
+    `on_flush`, if given, is called after every flush, once everything added so far is
+    stored; crawl checkpoints use it to mark pages completed (see `crawl_runs`).
+
+    Attributes:
+        batch_size (int): Number of buffered listings that triggers a flush.
+        flush_interval (float): Maximum number of seconds between flushes.
+        known_hashes (Optional[Dict[str, str]]): URL -> content hash of stored listings.
+        totals (Dict[str, int]): Upserted/matched/modified counts summed over all batches,
+                                 plus the number of unchanged listings that were skipped
+                                 and the number of price history points recorded.
+    """
+    def __init__(
+        self,
+        target_collection: Optional[Collection] = None,
+        batch_size: int = 500,
+        flush_interval: float = 5.0,
+        known_hashes: Optional[Dict[str, str]] = None,
+        history_collection: Optional[Collection] = None,
+        refresh_stats: bool = True,
+        snapshot_dir: Optional[str] = None,
+        match_alerts: bool = True,
+        on_flush: Optional[Callable[[Dict[str, int]], None]] = None,
+        enricher: Optional["DetailEnricher"] = None
+    ) -> None:
+        self.collection: Collection = target_collection if target_collection is not None else get_collection()
+        # The history lives next to the listings it describes
+        self.history_collection: Collection = (
+            history_collection if history_collection is not None
+            else self.collection.database[price_history_collection_name]
+        )
+        self.batch_size: int = batch_size
+        self.flush_interval: float = flush_interval
+        self.known_hashes: Optional[Dict[str, str]] = known_hashes
+        self.totals: Dict[str, int] = {
+            "upserted": 0, "matched": 0, "modified": 0, "errors": 0, "unchanged": 0, "price_changes": 0
+        }
+        self._buffer: Dict[str, Dict[str, Any]] = {}
+        self._unchanged_urls: List[str] = []
+        self.refresh_stats: bool = refresh_stats
+        self.snapshot_dir: str = snapshot_dir if snapshot_dir is not None else mongo_settings()["snapshot_dir"]
+        self.touched_groups: Set[GroupKey] = set()
+        self.match_alerts: bool = match_alerts
+        self.changed_listings: List[Dict[str, Any]] = []
+        self._feed_fields: List[str] = []
+        if match_alerts:
+            # NumPy is only needed by writers that match alerts
+            from .alerts import feed_fields
+
+            self._feed_fields = feed_fields
+        self.on_flush: Optional[Callable[[Dict[str, int]], None]] = on_flush
+        self.enricher: Optional["DetailEnricher"] = enricher
+        self._last_flush: float = time.monotonic()
+
+    def __enter__(self) -> "PropertyWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def add(self, property_data: Dict[str, Any]) -> bool:
+        """
+        Buffer a property and flush the buffer if it is full or due.
+
+        Args:
+            property_data (Dict[str, Any]): A dictionary containing property details.
+                                            Must include a 'url' key.
+
+        Returns:
+            bool: True if the property is new or changed, False if it was skipped as unchanged.
+        """
+        if self.known_hashes is not None:
+            digest = content_hash(property_data)
+            if self.known_hashes.get(property_data["url"]) == digest:
+                self.totals["unchanged"] += 1
+                self._unchanged_urls.append(property_data["url"])
+                self._flush_if_full()
+                return False
+            self.known_hashes[property_data["url"]] = digest
+
+        self._buffer[property_data["url"]] = property_data
+        self._flush_if_full()
+        return True
+
+    def _flush_if_full(self) -> None:
+        """Flush if the batch is full, otherwise if the flush interval has passed."""
+        if len(self._buffer) + len(self._unchanged_urls) >= self.batch_size:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self) -> Optional[Dict[str, int]]:
+        """
+        Flush the buffer if `flush_interval` seconds have passed since the last flush.
+
+        Returns:
+            Dict[str, int] or None: Batch counts if a flush happened, else None.
+        """
+        pending = self._buffer or self._unchanged_urls
+        if pending and time.monotonic() - self._last_flush >= self.flush_interval:
+            return self.flush()
+        return None
+
+    def flush(self) -> Dict[str, int]:
+        """
+        Write all buffered properties as one unordered bulk upsert and record their price changes.
+
+        Returns:
+            Dict[str, int]: Upserted, matched and modified counts for the batch.
+        """
+        self._last_flush = time.monotonic()
+        seen_at: datetime = datetime.utcnow()
+        batch_counts: Dict[str, int] = {"upserted": 0, "matched": 0, "modified": 0, "errors": 0}
+
+        if self._unchanged_urls:
+            self.collection.update_many({"url": {"$in": self._unchanged_urls}}, {"$set": {"last_seen": seen_at}})
+            self._unchanged_urls = []
+
+        if not self._buffer:
+            if self.on_flush is not None:
+                self.on_flush(batch_counts)
+            return batch_counts
+
+        listings: List[Dict[str, Any]] = list(self._buffer.values())
+        self._buffer = {}
+        stored = self._stored_listings([data["url"] for data in listings])
+        operations: List[UpdateOne] = [_upsert_operation(data, seen_at) for data in listings]
+        failed_indexes: set = set()
+
+        try:
+            result = self.collection.bulk_write(operations, ordered=False)
+            batch_counts["upserted"] = result.upserted_count
+            batch_counts["matched"] = result.matched_count
+            batch_counts["modified"] = result.modified_count
+        except BulkWriteError as e:
+            # Unordered batches keep going after a failed document, so count what did succeed
+            batch_counts["upserted"] = e.details.get("nUpserted", 0)
+            batch_counts["matched"] = e.details.get("nMatched", 0)
+            batch_counts["modified"] = e.details.get("nModified", 0)
+            batch_counts["errors"] = len(e.details.get("writeErrors", []))
+            failed_indexes = {error["index"] for error in e.details.get("writeErrors", [])}
+            print(f"Bulk write finished with {batch_counts['errors']} write errors.")
+
+        for key, value in batch_counts.items():
+            self.totals[key] += value
+
+        written = [data for index, data in enumerate(listings) if index not in failed_indexes]
+        if written:
+            mark_properties_written(self.collection.database, seen_at)
+        for data in written:
+            self.touched_groups.add(group_key(data))
+            if data["url"] in stored:
+                # A listing that moved to another group changes the old group's stats too
+                self.touched_groups.add(group_key(stored[data["url"]]))
+            if data["url"] not in stored or content_hash(stored[data["url"]]) != content_hash(data):
+                if self.match_alerts:
+                    # Only what a feed entry needs is kept until close(), not the whole listing
+                    self.changed_listings.append({field: data.get(field) for field in self._feed_fields})
+                if self.enricher is not None:
+                    self.enricher.submit(data["url"])
+
+        price_points = [
+            _price_point(data, seen_at) for data in written if _price_changed(stored.get(data["url"]), data)
+        ]
+        if price_points:
+            self.history_collection.insert_many(price_points, ordered=False)
+            self.totals["price_changes"] += len(price_points)
+
+        print(
+            f"Bulk write of {len(operations)} listings: {batch_counts['upserted']} upserted, "
+            f"{batch_counts['matched']} matched, {batch_counts['modified']} modified."
+        )
+        if self.on_flush is not None:
+            self.on_flush(batch_counts)
+        return batch_counts
+
+    def _stored_listings(self, urls: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Read the stored prices and group fields of the given listings in one query.
+
+        Args:
+            urls (List[str]): Listing URLs about to be written.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Stored price, price per m², size, category, city, district
+                                       and room count per URL, for listings already stored.
+        """
+        projection = {
+            "_id": 0, "url": 1, "price": 1, "price_per_m2": 1, "size_m2": 1,
+            "category": 1, "city": 1, "district": 1, "number_of_rooms": 1
+        }
+        return {doc["url"]: doc for doc in self.collection.find({"url": {"$in": urls}}, projection)}
+
+    def close(self) -> Dict[str, int]:
+        """
+        Flush any remaining buffered properties, refresh the market stats of the touched groups,
+        bump the crawl version stamp, write the listing snapshot if configured and match the
+        changed listings against the saved searches.
+
+        A failed refresh, snapshot or alert match is reported but does not fail the crawl; readers fall back to live
+        statistics while the cube is stale.
+
+        Returns:
+            Dict[str, int]: Totals over all batches written by this writer.
+        """
+        self.flush()
+        if self.refresh_stats and self.touched_groups:
+            try:
+                refresh_market_stats(self.collection, self.touched_groups)
+            except OperationFailure as e:
+                print(f"Could not refresh market stats: {e}")
+        if self.touched_groups:
+            version = bump_crawl_version(self.collection.database)
+            if self.snapshot_dir and any(group[0] == DEFAULT_CATEGORY for group in self.touched_groups):
+                # NumPy is only needed by crawls that write snapshots
+                from .listing_snapshot import write_snapshot
+
+                try:
+                    write_snapshot(self.collection, self.snapshot_dir, version, DEFAULT_CATEGORY)
+                except (OSError, ValueError, OperationFailure) as e:
+                    print(f"Could not write the listing snapshot: {e}")
+        if self.match_alerts and self.changed_listings:
+            from .alerts import match_saved_searches
+
+            try:
+                match_saved_searches(self.collection.database, self.changed_listings)
+            except OperationFailure as e:
+                print(f"Could not match saved searches: {e}")
+            self.changed_listings = []
+        return self.totals
+
+
+def save_property(property_data: Dict[str, Any]) -> None:
+    """
+    Insert or update a property in the MongoDB 'properties' collection based on the property's URL.
+
+    Stores the listing the same way as the scraper's batches, appends a price history point
+    if it is new or its price changed, and marks the listings as written so that the market
+    stats cube reads as stale. Unlike `PropertyWriter.close()`, it does not refresh the
+    market stats, bump the crawl version, write a snapshot or match alerts.
+
+    Args:
+        property_data (Dict[str, Any]): A dictionary containing property details.
+                                        Must include a 'url' key.
+
+    Returns:
+        None
+    """
+    collection = get_collection()
+    seen_at: datetime = datetime.utcnow()
+    stored = collection.find_one({"url": property_data["url"]}, {"_id": 0, "price": 1, "price_per_m2": 1})
+    collection.bulk_write([_upsert_operation(property_data, seen_at)])
+    mark_properties_written(collection.database, seen_at)
+    if _price_changed(stored, property_data):
+        collection.database[price_history_collection_name].insert_one(_price_point(property_data, seen_at))
 
 
 def save_search(user_id: str, name: str, query: Dict[str, Any]) -> None:
@@ -81,7 +543,7 @@ def save_search(user_id: str, name: str, query: Dict[str, Any]) -> None:
     Returns:
         None
     """
-    saved_search_collection.update_one(
+    get_collection(saved_search_collection_name).update_one(
         {"user_id": user_id, "name": name},
         {"$set": {
             "query": query,
@@ -0,0 +1,146 @@
+"""
+Crawl several listing categories at once.
+
+Every category is crawled in its own thread with its own fetchers and `PropertyWriter` (see
+`aruodas_scraper`), and all of them write into the one 'properties' collection. Their page
+loads, and the detail page requests of `--enrich`, take tokens from one shared `RateLimit`,
+so `--rate` is the request rate of the whole run and adding a category does not add load on
+the site. Each category keeps its own crawl
+checkpoint, keyed by its base URL, so `--resume` continues every category where it stopped.
+
+To crawl every registered category (see `categories`), run from the project root:
+
+    python -m scraper_mongodb.scheduler --rate 2
+
+or only some of them:
+
+    python -m scraper_mongodb.scheduler --categories houses plots --workers 2 --resume
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
+
+from .aruodas_scraper import scrape_aruodas, scrape_aruodas_parallel
+from .categories import Category, categories, get_category
+from .crawl_runs import FAILED, CheckpointStore, CrawlCheckpoint, checkpoint_store
+from .enrichment import DetailEnricher
+from .fetchers import RateLimit
+from .properties_mongo_db import get_collection
+
+
+def crawl_categories(
+    names: Optional[List[Union[str, Category]]] = None,
+    rate: float = 2.0,
+    burst: int = 2,
+    workers: int = 1,
+    max_retries: int = 2,
+    backend: str = "auto",
+    incremental: bool = False,
+    stop_after: int = 3,
+    resume: bool = False,
+    store: Optional[CheckpointStore] = None,
+    enrich: bool = False,
+    detail_workers: int = 4,
+    detail_cache: str = "detail_cache"
+) -> Dict[str, str]:
+    """
+    Crawl listing categories concurrently under one global rate limit, which also covers
+    the detail pages fetched for enrichment.
+
+    A category whose crawl raises is reported as failed; the others carry on.
+
+    Args:
+        names (Optional[List[Union[str, Category]]]): Categories or their registered names;
+                                                      None crawls every registered category.
+        rate (float): Page loads and detail requests per second, across all categories.
+        burst (int): Page loads allowed at once after an idle period.
+        workers (int): Crawl workers per category (1 = sequential crawl).
+        max_retries (int): Retries per page that fails to load, with several workers.
+        backend (str): Fetch backend: "selenium", "requests" or "auto".
+        incremental (bool): Skip unchanged listings and stop early (sequential crawls only).
+        stop_after (int): Consecutive unchanged pages that end an incremental crawl.
+        resume (bool): Continue the last unfinished run of every category.
+        store (Optional[CheckpointStore]): Where checkpoints are kept; defaults to MongoDB.
+        enrich (bool): Enrich new and changed listings from their detail pages.
+        detail_workers (int): Detail page fetches in flight, per category.
+        detail_cache (str): Directory of the detail page cache.
+
+    Returns:
+        Dict[str, str]: Final crawl status per category name.
+
+    Raises:
+        ValueError: If a category is unknown, or an incremental crawl has several workers.
+    """
+    if incremental and workers > 1:
+        raise ValueError("Incremental crawls walk pages in order; use one worker per category.")
+
+    crawled: List[Category] = [
+        get_category(name) if isinstance(name, str) else name
+        for name in (names if names is not None else list(categories))
+    ]
+    rate_limit = RateLimit(rate, burst)
+    store = store if store is not None else checkpoint_store()
+    mode = "parallel" if workers > 1 else "sequential"
+
+    def crawl(category: Category) -> str:
+        start = CrawlCheckpoint.resume if resume else CrawlCheckpoint.start
+        checkpoint = start(store, category.base_url, mode)
+        enricher: Optional[DetailEnricher] = None
+        if enrich:
+            enricher = DetailEnricher(get_collection(), cache_dir=detail_cache, workers=detail_workers,
+                                      rate_limit=rate_limit)
+
+        print(f"Crawling '{category.name}' from {category.page_url(checkpoint.next_page)}")
+        if workers > 1:
+            scrape_aruodas_parallel(workers=workers, max_retries=max_retries, backend=backend,
+                                    checkpoint=checkpoint, enricher=enricher, category=category,
+                                    rate_limit=rate_limit)
+        else:
+            scrape_aruodas(backend=backend, incremental=incremental, stop_after=stop_after,
+                           checkpoint=checkpoint, enricher=enricher, category=category, rate_limit=rate_limit)
+        return checkpoint.state["status"]
+
+    statuses: Dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=len(crawled) or 1, thread_name_prefix="category") as pool:
+        futures = {category.name: pool.submit(crawl, category) for category in crawled}
+        for name, future in futures.items():
+            try:
+                statuses[name] = future.result()
+            except Exception as e:
+                print(f"Crawl of '{name}' stopped with an error: {e}")
+                statuses[name] = FAILED
+
+    print("Category crawls: " + ", ".join(f"{name} {status}" for name, status in statuses.items()))
+    return statuses
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", nargs="+", choices=list(categories), default=None,
+                        help="Categories to crawl (default: all registered categories).")
+    parser.add_argument("--rate", type=float, default=2.0, help="Page loads and detail requests per second across all categories.")
+    parser.add_argument("--burst", type=int, default=2, help="Page loads allowed at once after an idle period.")
+    parser.add_argument("--workers", type=int, default=1, help="Crawl workers per category.")
+    parser.add_argument("--retries", type=int, default=2, help="Retries per page that fails to load.")
+    parser.add_argument("--backend", choices=["auto", "requests", "selenium"], default="auto")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Skip unchanged listings and stop after --stop-after unchanged pages.")
+    parser.add_argument("--stop-after", type=int, default=3)
+    parser.add_argument("--resume", action="store_true", help="Continue the unfinished crawl of every category.")
+    parser.add_argument("--checkpoint-file", default=None,
+                        help="Keep crawl checkpoints in this JSON file instead of the crawl_runs collection.")
+    parser.add_argument("--enrich", action="store_true", help="Also fetch the detail pages of changed listings.")
+    parser.add_argument("--detail-workers", type=int, default=4)
+    parser.add_argument("--detail-cache", default="detail_cache")
+    args = parser.parse_args()
+
+    if args.incremental and args.workers > 1:
+        parser.error("--incremental walks pages in order; run it without --workers.")
+
+    crawl_categories(
+        args.categories, rate=args.rate, burst=args.burst, workers=args.workers, max_retries=args.retries,
+        backend=args.backend, incremental=args.incremental, stop_after=args.stop_after, resume=args.resume,
+        store=checkpoint_store(args.checkpoint_file), enrich=args.enrich, detail_workers=args.detail_workers,
+        detail_cache=args.detail_cache
+    )
@@ -32,6 +32,54 @@ properties_validation_rules = {
             "size_m2": {
                 "bsonType": "double",
                 "description": f"'price_per_m2' must be a string and is required."
+            },
+            "category": {
+                "bsonType": "string",
+                "description": "'category' must be a string (listing category, e.g. 'apartments')."
+            },
+            "plot_area": {
+                "bsonType": "double",
+                "description": "'plot_area' must be a double (plot area of houses and plots, in ares)."
+            },
+            "content_hash": {
+                "bsonType": "string",
+                "description": "'content_hash' must be a string (hash of price, size and rooms)."
+            },
+            "first_seen": {
+                "bsonType": "date",
+                "description": "'first_seen' must be a date (first scrape that stored the listing)."
+            },
+            "last_seen": {
+                "bsonType": "date",
+                "description": "'last_seen' must be a date (latest scrape that saw the listing)."
+            },
+            "floor": {
+                "bsonType": "int",
+                "description": "'floor' must be an int (from the detail page)."
+            },
+            "floors_total": {
+                "bsonType": "int",
+                "description": "'floors_total' must be an int (floors in the building, from the detail page)."
+            },
+            "build_year": {
+                "bsonType": "int",
+                "description": "'build_year' must be an int (from the detail page)."
+            },
+            "heating": {
+                "bsonType": "string",
+                "description": "'heating' must be a string (from the detail page)."
+            },
+            "latitude": {
+                "bsonType": "double",
+                "description": "'latitude' must be a double (from the detail page map)."
+            },
+            "longitude": {
+                "bsonType": "double",
+                "description": "'longitude' must be a double (from the detail page map)."
+            },
+            "enriched_at": {
+                "bsonType": "date",
+                "description": "'enriched_at' must be a date (latest detail page enrichment)."
             }
         }
     }
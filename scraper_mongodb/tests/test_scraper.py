@@ -12,6 +12,15 @@ from _pytest.capture import CaptureFixture
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
 
 
+@pytest.fixture(autouse=True)
+def no_default_snapshots():
+    """Keep writers on mocked collections from writing listing snapshots to the shared directory."""
+    from scraper_mongodb.mongo_settings import mongo_settings
+
+    with patch.dict(mongo_settings(), {"snapshot_dir": ""}):
+        yield
+
+
 @pytest.fixture
 def scraper_module() -> ModuleType:
     """
@@ -48,7 +57,7 @@ def test_scraper(
         scraper_module (ModuleType): The imported scraper module.
         capfd (CaptureFixture): Captures printed output during test.
         page_url (str): The test page path.
-        expected_saved_props_count (int): Expected number of calls to `save_property`.
+        expected_saved_props_count (int): Expected number of listings queued on the `PropertyWriter`.
         expected_output_substr (str): Substring expected to appear in stdout.
     """
     from selenium.webdriver.common.by import By
@@ -110,8 +119,8 @@ def test_scraper(
 
     mock_driver.get.side_effect = mock_get
 
-    with patch("scraper_mongodb.aruodas_scraper.save_property", autospec=True) as mock_save_property, \
-         patch("scraper_mongodb.aruodas_scraper.webdriver.Chrome") as mock_webdriver:
+    with patch("scraper_mongodb.aruodas_scraper.PropertyWriter") as mock_writer_cls, \
+         patch("scraper_mongodb.fetchers.webdriver.Chrome") as mock_webdriver:
 
         mock_webdriver.return_value = mock_driver
         mock_element = MagicMock()
@@ -127,14 +136,15 @@ def test_scraper(
         def fake_until(self, condition):
             return condition(mock_driver)
 
-        with patch("Aruodas_web_scrape_project.scraper_mongodb.aruodas_scraper.WebDriverWait.until", new=fake_until), \
-             patch("Aruodas_web_scrape_project.scraper_mongodb.aruodas_scraper.EC.element_to_be_clickable",
+        with patch("Aruodas_web_scrape_project.scraper_mongodb.fetchers.WebDriverWait.until", new=fake_until), \
+             patch("Aruodas_web_scrape_project.scraper_mongodb.fetchers.EC.element_to_be_clickable",
                    side_effect=fake_element_to_be_clickable):
             scraper_module.scrape_aruodas()
 
     captured = capfd.readouterr()
     assert expected_output_substr in captured.out
-    assert mock_save_property.call_count == expected_saved_props_count
+    assert mock_writer_cls.return_value.add.call_count == expected_saved_props_count
+    mock_writer_cls.return_value.close.assert_called_once()
 
 
 def test_scraper_timeout_exception_handling(scraper_module: ModuleType, capfd: CaptureFixture) -> None:
@@ -145,8 +155,8 @@ def test_scraper_timeout_exception_handling(scraper_module: ModuleType, capfd: C
         scraper_module (ModuleType): The imported scraper module.
         capfd (CaptureFixture): Captures printed output during test.
     """
-    with patch("Aruodas_web_scrape_project.scraper_mongodb.aruodas_scraper.save_property", autospec=True), \
-         patch("Aruodas_web_scrape_project.scraper_mongodb.aruodas_scraper.webdriver.Chrome") as mock_webdriver:
+    with patch("scraper_mongodb.aruodas_scraper.PropertyWriter"), \
+         patch("Aruodas_web_scrape_project.scraper_mongodb.fetchers.webdriver.Chrome") as mock_webdriver:
         mock_driver = MagicMock()
         current_url = {"value": ""}
 
@@ -168,7 +178,7 @@ def test_scraper_timeout_exception_handling(scraper_module: ModuleType, capfd: C
                     return mock_element
             return DummyWait()
 
-        with patch("Aruodas_web_scrape_project.scraper_mongodb.aruodas_scraper.WebDriverWait", mock_wait):
+        with patch("Aruodas_web_scrape_project.scraper_mongodb.fetchers.WebDriverWait", mock_wait):
             scraper_module.scrape_aruodas()
 
 
@@ -205,9 +215,1563 @@ def test_scraper_timeout_exception_breaks_loop(scraper_module: ModuleType, capfd
 
     mock_driver.get.side_effect = mock_get
 
-    with patch("Aruodas_web_scrape_project.scraper_mongodb.aruodas_scraper.webdriver.Chrome", return_value=mock_driver), \
-         patch("Aruodas_web_scrape_project.scraper_mongodb.aruodas_scraper.save_property", autospec=True):
+    with patch("Aruodas_web_scrape_project.scraper_mongodb.fetchers.webdriver.Chrome", return_value=mock_driver), \
+         patch("scraper_mongodb.aruodas_scraper.PropertyWriter"):
         scraper_module.scrape_aruodas()
 
     captured = capfd.readouterr()
-    assert "Page failed to load or no listings found." in captured.out
\ No newline at end of file
+    assert "Page failed to load or no listings found." in captured.out
+
+
+# -------------------------- PropertyWriter Tests --------------------------
+
+def _fake_bulk_result(upserted: int, matched: int, modified: int) -> MagicMock:
+    """Build a stand-in for pymongo's BulkWriteResult."""
+    result = MagicMock()
+    result.upserted_count = upserted
+    result.matched_count = matched
+    result.modified_count = modified
+    return result
+
+
+def test_property_writer_flushes_by_size() -> None:
+    """The writer should send one unordered bulk_write per full batch."""
+    from scraper_mongodb.properties_mongo_db import PropertyWriter
+
+    mock_collection = MagicMock()
+    mock_collection.bulk_write.return_value = _fake_bulk_result(2, 0, 0)
+    writer = PropertyWriter(mock_collection, batch_size=2, flush_interval=3600)
+
+    writer.add({"url": "/a", "price": 1.0})
+    assert mock_collection.bulk_write.call_count == 0
+    writer.add({"url": "/b", "price": 2.0})
+
+    assert mock_collection.bulk_write.call_count == 1
+    operations = mock_collection.bulk_write.call_args.args[0]
+    assert len(operations) == 2
+    assert mock_collection.bulk_write.call_args.kwargs["ordered"] is False
+    assert writer.totals["upserted"] == 2
+
+
+def test_property_writer_flushes_by_time_and_on_close() -> None:
+    """Due batches are flushed on add, and close() flushes what is left."""
+    from scraper_mongodb.properties_mongo_db import PropertyWriter
+
+    mock_collection = MagicMock()
+    mock_collection.bulk_write.return_value = _fake_bulk_result(0, 1, 1)
+    writer = PropertyWriter(mock_collection, batch_size=100, flush_interval=0)
+
+    writer.add({"url": "/a", "price": 1.0})
+    assert mock_collection.bulk_write.call_count == 1
+
+    writer.flush_interval = 3600
+    writer.add({"url": "/b", "price": 2.0})
+    writer.add({"url": "/b", "price": 3.0})
+    assert mock_collection.bulk_write.call_count == 1
+
+    totals = writer.close()
+    assert mock_collection.bulk_write.call_count == 2
+    # Duplicate URLs inside one batch collapse into a single upsert
+    assert len(mock_collection.bulk_write.call_args.args[0]) == 1
+    assert totals == {"upserted": 0, "matched": 2, "modified": 2, "errors": 0, "unchanged": 0, "price_changes": 2}
+
+
+def test_property_writer_reports_partial_bulk_errors(capfd: CaptureFixture) -> None:
+    """A BulkWriteError should be reported without losing the successful counts."""
+    from pymongo.errors import BulkWriteError
+    from scraper_mongodb.properties_mongo_db import PropertyWriter
+
+    mock_collection = MagicMock()
+    mock_collection.bulk_write.side_effect = BulkWriteError({
+        "nUpserted": 1, "nMatched": 0, "nModified": 0,
+        "writeErrors": [{"index": 1, "code": 121, "errmsg": "Document failed validation"}]
+    })
+
+    with PropertyWriter(mock_collection) as writer:
+        writer.add({"url": "/a", "price": 1.0})
+        writer.add({"url": "/b", "price": "bad"})
+
+    assert writer.totals["upserted"] == 1
+    assert writer.totals["errors"] == 1
+    assert "1 write errors" in capfd.readouterr().out
+
+
+# -------------------------- Index Tests --------------------------
+
+def test_ensure_indexes_declares_unique_url() -> None:
+    """The url index must be unique and all declared indexes are created in one call."""
+    from scraper_mongodb.indexes import ensure_indexes, property_indexes
+
+    mock_collection = MagicMock()
+    mock_collection.create_indexes.return_value = [index.document["name"] for index in property_indexes]
+
+    names = ensure_indexes(mock_collection)
+
+    mock_collection.create_indexes.assert_called_once_with(property_indexes)
+    url_index = next(index.document for index in property_indexes if index.document["name"] == "url_unique")
+    assert url_index["unique"] is True
+    assert "city_district_price" in names
+
+
+@pytest.mark.parametrize("explain_output, expected_index", [
+    ({"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {
+        "stage": "IXSCAN", "indexName": "city_district_price"}}}}, "city_district_price"),
+    ({"queryPlanner": {"winningPlan": {"queryPlan": {"stage": "FETCH", "inputStage": {
+        "stage": "IXSCAN", "indexName": "url_unique"}}}}}, "url_unique"),
+    ({"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}, "COLLSCAN"),
+])
+def test_winning_index_from_explain(explain_output: dict, expected_index: str) -> None:
+    """The index name is found in classic and slot-based engine explain output."""
+    from scraper_mongodb.indexes import _winning_index
+
+    assert _winning_index(explain_output) == expected_index
+
+
+# -------------------------- Parallel Crawl Tests --------------------------
+
+LISTING_HTML = """
+<div class="list-row-v2 object-row selflat advert">
+    <div class="advert-flex">
+        <a href="/butas-{page}/"><img title="Vilnius, Senamiestis, Pilies g." /></a>
+        <span class="list-item-price-v2">150 000 €</span>
+        <span class="price-pm-v2">3 000 €/m²</span>
+        <div class="list-RoomNum-v2 list-detail-v2">2</div>
+        <div class="list-AreaOverall-v2 list-detail-v2">50</div>
+    </div>
+</div>
+"""
+
+
+def _fake_chrome_factory(last_page: int, timeouts: dict) -> tuple:
+    """
+    Build a replacement for webdriver.Chrome that serves one listing per page up to `last_page`.
+
+    Args:
+        last_page (int): Last page that has listings; later pages are empty.
+        timeouts (dict): Page number -> number of times loading it should raise TimeoutException.
+
+    Returns:
+        tuple: The factory and the list of drivers it created.
+    """
+    drivers = []
+
+    def factory(*args, **kwargs) -> MagicMock:
+        driver = MagicMock()
+        # Make the cookie button look clickable so the consent wait returns immediately
+        driver.find_element.return_value.is_displayed.return_value = True
+
+        def get(url: str) -> None:
+            page = int(url.rstrip("/").rsplit("/", 1)[-1])
+            if timeouts.get(page, 0) > 0:
+                timeouts[page] -= 1
+                raise TimeoutException("Listings did not load")
+            driver.page_source = LISTING_HTML.format(page=page) if page <= last_page else "<html></html>"
+
+        driver.get.side_effect = get
+        drivers.append(driver)
+        return driver
+
+    return factory, drivers
+
+
+class _RowWait:
+    """Stand-in for WebDriverWait that times out, like the browser, on a page without listing rows."""
+    def __init__(self, driver: MagicMock, timeout: float) -> None:
+        self.driver = driver
+
+    def until(self, condition):
+        if "advert" not in self.driver.page_source:
+            raise TimeoutException("No listing rows")
+        return MagicMock()
+
+
+def test_scrape_parallel_stops_at_last_page(scraper_module: ModuleType) -> None:
+    """All listings up to the empty page are written once and every driver is closed."""
+    factory, drivers = _fake_chrome_factory(last_page=7, timeouts={})
+
+    with patch("scraper_mongodb.aruodas_scraper.PropertyWriter") as mock_writer_cls, \
+         patch("scraper_mongodb.fetchers.webdriver.Chrome", side_effect=factory):
+        mock_writer_cls.return_value.flush_interval = 0.05
+        scraper_module.scrape_aruodas_parallel(workers=3, max_retries=0)
+
+    writer = mock_writer_cls.return_value
+    urls = sorted(call.args[0]["url"] for call in writer.add.call_args_list)
+    assert urls == sorted(f"/butas-{page}/" for page in range(1, 8))
+    writer.close.assert_called_once()
+    assert len(drivers) == 3
+    assert all(driver.quit.called for driver in drivers)
+
+
+def test_scrape_parallel_retries_timeouts(scraper_module: ModuleType, capfd: CaptureFixture) -> None:
+    """A page that times out is retried by the same worker instead of ending the crawl."""
+    factory, _ = _fake_chrome_factory(last_page=3, timeouts={2: 1})
+
+    with patch("scraper_mongodb.aruodas_scraper.PropertyWriter") as mock_writer_cls, \
+         patch("scraper_mongodb.fetchers.webdriver.Chrome", side_effect=factory):
+        mock_writer_cls.return_value.flush_interval = 0.05
+        scraper_module.scrape_aruodas_parallel(workers=2, max_retries=1)
+
+    assert mock_writer_cls.return_value.add.call_count == 3
+    assert "Page 2 failed to load" in capfd.readouterr().out
+
+
+def test_scrape_parallel_raises_writer_errors(scraper_module: ModuleType) -> None:
+    """A writer that fails stops the workers and its error is raised instead of the crawl hanging."""
+    # Enough pages to fill the listings queue if the workers kept going
+    factory, _ = _fake_chrome_factory(last_page=3000, timeouts={})
+
+    with patch("scraper_mongodb.aruodas_scraper.PropertyWriter") as mock_writer_cls, \
+         patch("scraper_mongodb.fetchers.webdriver.Chrome", side_effect=factory):
+        writer = mock_writer_cls.return_value
+        writer.flush_interval = 0.05
+        writer.add.side_effect = [None, RuntimeError("write failed")]
+        with pytest.raises(RuntimeError, match="write failed"):
+            scraper_module.scrape_aruodas_parallel(workers=3, max_retries=0)
+
+    assert writer.add.call_count == 2
+    writer.close.assert_not_called()
+
+
+def test_scrape_parallel_finishes_at_the_empty_page_without_retries(scraper_module: ModuleType, tmp_path) -> None:
+    """A page that loads without rows ends a parallel crawl as finished and is not retried."""
+    from scraper_mongodb.crawl_runs import FINISHED, CrawlCheckpoint, FileCheckpointStore
+
+    factory, drivers = _fake_chrome_factory(last_page=3, timeouts={})
+    checkpoint = CrawlCheckpoint.start(FileCheckpointStore(str(tmp_path / "crawl.json")),
+                                       "https://www.aruodas.lt/butai/", "parallel")
+    with patch("scraper_mongodb.aruodas_scraper.PropertyWriter") as mock_writer_cls, \
+         patch("scraper_mongodb.fetchers.webdriver.Chrome", side_effect=factory), \
+         patch("scraper_mongodb.fetchers.WebDriverWait", _RowWait):
+        mock_writer_cls.return_value.flush_interval = 0.05
+        scraper_module.scrape_aruodas_parallel(workers=2, max_retries=2, checkpoint=checkpoint)
+
+    loaded = [call.args[0] for driver in drivers for call in driver.get.call_args_list]
+    assert mock_writer_cls.return_value.add.call_count == 3
+    assert len(loaded) == len(set(loaded))
+    assert checkpoint.state["status"] == FINISHED and checkpoint.state["stopped_at"] is None
+
+
+def test_page_range_stops_handing_out_pages() -> None:
+    """Once the end page is known, no page at or after it is claimed."""
+    from scraper_mongodb.crawl_pages import PageRange
+
+    pages = PageRange()
+    assert [pages.claim(), pages.claim(), pages.claim()] == [1, 2, 3]
+    pages.stop_at(5)
+    pages.stop_at(4)
+    assert pages.claim() is None
+    assert pages.is_past_end(4) and not pages.is_past_end(3)
+
+
+# -------------------------- Fetcher Backend Tests --------------------------
+
+@pytest.fixture(scope="module")
+def listing_server():
+    """
+    Serve fixture listing pages over local HTTP with keep-alive and gzip, like aruodas.lt does.
+
+    Pages 1-3 have one listing each, every later page is empty. Yields the server's base URL
+    and a dict with the number of TCP connections and gzip responses served. Tests can put
+    page -> HTTP status entries in its "fail_once" dict to make the next request for that
+    page fail.
+    """
+    import gzip
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    stats = {"connections": 0, "gzip_responses": 0, "fail_once": {}}
+
+    class ListingHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self) -> None:
+            stats["connections"] += 1
+            super().setup()
+
+        def do_GET(self) -> None:
+            page = int(self.path.rstrip("/").rsplit("/", 1)[-1])
+            if page in stats["fail_once"]:
+                self.send_response(stats["fail_once"].pop(page))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            html = LISTING_HTML.format(page=page) if page <= 3 else "<html><body></body></html>"
+            body = html.encode("utf-8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body)
+                self.send_header("Content-Encoding", "gzip")
+                stats["gzip_responses"] += 1
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ListingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/butai/", stats
+    server.shutdown()
+
+
+def test_requests_fetcher_reuses_connection_with_gzip(listing_server: tuple) -> None:
+    """The pooled session keeps one connection open and decodes gzip responses."""
+    from scraper_mongodb.fetchers import RequestsFetcher
+
+    base_url, stats = listing_server
+    connections_before = stats["connections"]
+
+    with RequestsFetcher() as fetcher:
+        pages = [fetcher.fetch(f"{base_url}puslapis/{page}/") for page in (1, 2, 3)]
+
+    assert all("advert-flex" in html for html in pages)
+    assert "/butas-2/" in pages[1]
+    assert stats["connections"] - connections_before == 1
+    assert stats["gzip_responses"] >= 3
+
+
+def test_scrape_with_requests_backend_skips_selenium(scraper_module: ModuleType, listing_server: tuple) -> None:
+    """The HTTP backend scrapes the fixture pages without ever starting Chrome."""
+    base_url, _ = listing_server
+
+    with patch("scraper_mongodb.aruodas_scraper.PropertyWriter") as mock_writer_cls, \
+         patch("scraper_mongodb.fetchers.webdriver.Chrome") as mock_webdriver:
+        scraper_module.scrape_aruodas(backend="requests", base_url=base_url)
+
+    assert mock_writer_cls.return_value.add.call_count == 3
+    mock_webdriver.assert_not_called()
+
+
+def test_create_fetcher_auto_picks_backend(listing_server: tuple) -> None:
+    """The auto backend keeps plain HTTP when listings are in the HTML and falls back to Selenium otherwise."""
+    from scraper_mongodb.fetchers import create_fetcher
+
+    base_url, _ = listing_server
+
+    with patch("scraper_mongodb.fetchers.webdriver.Chrome") as mock_webdriver:
+        with create_fetcher("auto", probe_url=f"{base_url}puslapis/1/") as fetcher:
+            assert fetcher.name == "requests"
+        with create_fetcher("auto", probe_url=f"{base_url}puslapis/9/") as fetcher:
+            assert fetcher.name == "selenium"
+
+    mock_webdriver.assert_called_once()
+    with pytest.raises(ValueError):
+        create_fetcher("carrier-pigeon")
+
+
+def test_incomplete_fetcher_fails_when_created() -> None:
+    """A backend without `fetch` is rejected when it is created, not in the middle of a crawl."""
+    from scraper_mongodb.fetchers import Fetcher
+
+    class NoFetch(Fetcher):
+        name = "no-fetch"
+
+    with pytest.raises(TypeError):
+        NoFetch()
+
+
+# -------------------------- Async Crawler Tests --------------------------
+
+def test_crawl_async_backs_off_and_writes_everything(listing_server: tuple) -> None:
+    """429/5xx pages are retried and every listing reaches the writer exactly once."""
+    import asyncio
+    from scraper_mongodb.async_scraper import crawl_async
+
+    base_url, stats = listing_server
+    stats["fail_once"].update({2: 429, 3: 503})
+
+    with patch("scraper_mongodb.async_scraper.PropertyWriter") as mock_writer_cls:
+        writer = mock_writer_cls.return_value
+        writer.batch_size = 500
+        writer.flush_interval = 0.05
+        writer.close.return_value = {"upserted": 3, "matched": 0, "modified": 0, "errors": 0}
+
+        crawl_stats = asyncio.run(crawl_async(
+            base_url=base_url, concurrency=3, rate=100, burst=10, backoff_base=0.01
+        ))
+
+    urls = sorted(call.args[0]["url"] for call in writer.add.call_args_list)
+    assert urls == ["/butas-1/", "/butas-2/", "/butas-3/"]
+    assert crawl_stats["retries"] == 2
+    assert crawl_stats["listings"] == 3
+    assert crawl_stats["upserted"] == 3
+
+
+@pytest.mark.parametrize("failing_stage", ["parse", "write"])
+def test_crawl_async_raises_stage_errors(failing_stage: str) -> None:
+    """
+    A parse or write stage that fails cancels the fetchers and its error is raised instead of hanging.
+
+    After a parse error the listings parsed before it are still written and the writer is closed.
+    """
+    import asyncio
+    from scraper_mongodb.async_scraper import crawl_async
+    from scraper_mongodb.categories import Category
+
+    async def endless_pages(session, limiter, url: str, *args) -> str:
+        # Every page has listings, so only the failure can end the crawl
+        return LISTING_HTML.format(page=url.rstrip("/").rsplit("/", 1)[-1])
+
+    parse_page = Category.parse
+    parsed = []
+
+    def parse(category: Category, html: str) -> tuple:
+        if failing_stage == "parse" and len(parsed) == 2:
+            raise RuntimeError("stage failed")
+        parsed.append(html)
+        return parse_page(category, html)
+
+    writer = MagicMock()
+    writer.batch_size = 1
+    writer.flush_interval = 0.05
+    if failing_stage == "write":
+        writer.add.side_effect = RuntimeError("stage failed")
+
+    with patch("scraper_mongodb.async_scraper._fetch_with_backoff", side_effect=endless_pages), \
+         patch.object(Category, "parse", parse):
+        with pytest.raises(RuntimeError, match="stage failed"):
+            asyncio.run(asyncio.wait_for(crawl_async(concurrency=3, writer=writer), timeout=10))
+
+    if failing_stage == "parse":
+        assert writer.add.call_count == 2
+        writer.close.assert_called_once()
+    else:
+        writer.close.assert_not_called()
+
+
+def test_token_bucket_limits_rate() -> None:
+    """After the initial burst, requests are spaced out at the configured rate."""
+    import asyncio
+    import time
+    from scraper_mongodb.async_scraper import TokenBucket
+
+    async def take(count: int) -> float:
+        bucket = TokenBucket(rate=50, capacity=2)
+        start = time.monotonic()
+        for _ in range(count):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # 2 tokens are free, the other 5 need 5 / 50 = 0.1s
+    elapsed = asyncio.run(take(7))
+    assert 0.09 <= elapsed < 0.5
+
+
+# -------------------------- Parser Tests --------------------------
+
+PARSER_FIXTURE_PAGES = {
+    "single listing": LISTING_HTML.format(page=1),
+    "mixed cards": """
+    <html><body>
+    <div class="list-row-v2 object-row selflat advert">
+        <div class="advert-flex">
+            <a href="/butas-1/"><img title="Kaunas, Žaliakalnis, Savanorių pr. | 3 kambarių butas" /></a>
+            <span class="list-item-price-v2"> 1 250 000 € </span>
+            <span class="price-pm-v2">2 512 €/m²</span>
+            <div class="list-RoomNum-v2 list-detail-v2"> 3 </div>
+            <div class="list-AreaOverall-v2 list-detail-v2">49.76</div>
+        </div>
+        <div class="advert-flex">
+            <a href="/butas-2/"><img/></a>
+            <span class="list-item-price-v2">99 000 €</span>
+            <span class="price-pm-v2">1 980 €/m²</span>
+            <div class="list-RoomNum-v2 list-detail-v2">1</div>
+        </div>
+        <div class="advert-flex">
+            <a href="/butas-3/"><img title="Klaipėda" /></a>
+            <span class="list-item-price-v2">Kaina sutartinė</span>
+            <span class="price-pm-v2">—</span>
+            <div class="list-RoomNum-v2 list-detail-v2">2</div>
+        </div>
+        <div class="advert-flex">
+            <a href="/butas-4/"><img title="Vilnius, Naujamiestis, Mainų g."/></a>
+            <span class="list-item-price-v2">€120 000</span>
+            <div class="list-AreaOverall-v2 list-detail-v2">40</div>
+        </div>
+    </div>
+    </body></html>
+    """,
+    "unreadable numbers": """
+    <html><body>
+    <div class="advert-flex">
+        <a href="/butas-5/"><img title="Vilnius, Žirmūnai" /></a>
+        <span class="list-item-price-v2">80 000 €</span>
+        <span class="price-pm-v2">2 000 €/m²</span>
+        <div class="list-RoomNum-v2 list-detail-v2">2 kamb.</div>
+        <div class="list-AreaOverall-v2 list-detail-v2">40</div>
+    </div>
+    <div class="advert-flex">
+        <a href="/butas-6/"><img title="Vilnius, Žirmūnai" /></a>
+        <span class="list-item-price-v2">90 000 €</span>
+        <span class="price-pm-v2">2 250 €/m²</span>
+        <div class="list-RoomNum-v2 list-detail-v2">2</div>
+        <div class="list-AreaOverall-v2 list-detail-v2">12 a</div>
+    </div>
+    </body></html>
+    """,
+    "empty page": "<html><body></body></html>",
+    "empty document": "",
+}
+
+
+@pytest.mark.parametrize("page_name", list(PARSER_FIXTURE_PAGES))
+def test_lxml_parser_matches_bs4_reference(page_name: str) -> None:
+    """The lxml fast path returns exactly what the BeautifulSoup reference returns."""
+    from scraper_mongodb.parser import parse_page
+
+    html = PARSER_FIXTURE_PAGES[page_name]
+    assert parse_page(html, backend="lxml") == parse_page(html, backend="bs4")
+
+
+def test_parse_listing_page_fields() -> None:
+    """Prices, rooms, size and location are extracted and typed like the schema expects."""
+    from scraper_mongodb.parser import parse_listing_page, parse_page
+
+    cards, listings = parse_page(PARSER_FIXTURE_PAGES["mixed cards"])
+    assert cards == 4
+    assert parse_listing_page(PARSER_FIXTURE_PAGES["mixed cards"]) == listings
+    assert listings == [
+        {"city": "Kaunas", "district": "Žaliakalnis", "street": "Savanorių pr.", "price": 1250000.0,
+         "size_m2": 49.76, "price_per_m2": 2512, "number_of_rooms": 3, "url": "/butas-1/"},
+        {"city": "N/A", "district": "N/A", "street": "N/A", "price": 99000.0,
+         "size_m2": 0.0, "price_per_m2": 1980, "number_of_rooms": 1, "url": "/butas-2/"},
+        {"city": "Klaipėda", "district": "N/A", "street": "N/A", "price": 0.0,
+         "size_m2": 0.0, "price_per_m2": 0, "number_of_rooms": 2, "url": "/butas-3/"},
+    ]
+
+
+def test_parse_page_skips_unreadable_required_fields() -> None:
+    """Text a converter cannot read skips the card if the field is required, else uses its default."""
+    from scraper_mongodb.categories import get_category
+    from scraper_mongodb.parser import parse_page
+
+    cards, listings = parse_page(PARSER_FIXTURE_PAGES["unreadable numbers"])
+    assert cards == 2
+    assert [(listing["url"], listing["size_m2"]) for listing in listings] == [("/butas-6/", 0.0)]
+
+    plot_page = """
+    <div class="advert-flex">
+        <a href="/sklypas-1/"><img title="Vilnius, Pavilnys" /></a>
+        <span class="list-item-price-v2">30 000 €</span>
+        <div class="list-AreaOverall-v2">Sutartinis</div>
+    </div>
+    """
+    assert get_category("plots").parse(plot_page) == (1, [])
+
+
+# -------------------------- Incremental Crawl Tests --------------------------
+
+def test_property_writer_skips_unchanged_listings() -> None:
+    """With known hashes, only new or changed listings are buffered and written."""
+    from scraper_mongodb.properties_mongo_db import PropertyWriter, content_hash
+
+    unchanged = {"url": "/a", "price": 100.0, "price_per_m2": 10, "size_m2": 10.0, "number_of_rooms": 1}
+    changed = {"url": "/b", "price": 200.0, "price_per_m2": 20, "size_m2": 10.0, "number_of_rooms": 1}
+    new = {"url": "/c", "price": 300.0, "price_per_m2": 30, "size_m2": 10.0, "number_of_rooms": 1}
+    known = {"/a": content_hash(unchanged), "/b": content_hash({**changed, "price": 250.0})}
+
+    mock_collection = MagicMock()
+    mock_collection.bulk_write.return_value = _fake_bulk_result(1, 1, 1)
+
+    with PropertyWriter(mock_collection, known_hashes=known) as writer:
+        assert [writer.add(unchanged), writer.add(changed), writer.add(new)] == [False, True, True]
+
+    operations = mock_collection.bulk_write.call_args.args[0]
+    assert len(operations) == 2
+    assert writer.totals["unchanged"] == 1
+    assert known["/b"] == content_hash(changed)
+    assert known["/c"] == content_hash(new)
+
+
+def test_load_known_hashes_computes_missing_hashes() -> None:
+    """Documents written before content hashes existed get a hash from their stored fields."""
+    from scraper_mongodb.properties_mongo_db import content_hash, load_known_hashes
+
+    old_doc = {"url": "/old", "price": 1.0, "price_per_m2": 1, "size_m2": 1.0, "number_of_rooms": 1}
+    mock_collection = MagicMock()
+    mock_collection.find.return_value = [{"url": "/new", "content_hash": "abc"}, old_doc]
+
+    assert load_known_hashes(mock_collection) == {"/new": "abc", "/old": content_hash(old_doc)}
+    mock_collection.find.assert_called_once()
+
+
+def test_incremental_scrape_stops_after_unchanged_pages(
+    scraper_module: ModuleType, listing_server: tuple, capfd: CaptureFixture
+) -> None:
+    """Only the changed listing is written and the crawl ends after two unchanged pages."""
+    from scraper_mongodb.parser import parse_listing_page
+    from scraper_mongodb.properties_mongo_db import PropertyWriter, content_hash
+
+    base_url, _ = listing_server
+    known = {}
+    for page in (1, 2, 3):
+        listing = parse_listing_page(LISTING_HTML.format(page=page))[0]
+        known[listing["url"]] = content_hash(listing)
+    known["/butas-1/"] = "outdated"
+
+    mock_collection = MagicMock()
+    mock_collection.bulk_write.return_value = _fake_bulk_result(0, 1, 1)
+
+    with patch("scraper_mongodb.aruodas_scraper.load_known_hashes", return_value=known), \
+         patch("scraper_mongodb.aruodas_scraper.PropertyWriter",
+               side_effect=lambda **kwargs: PropertyWriter(mock_collection, **kwargs)):
+        scraper_module.scrape_aruodas(backend="requests", base_url=base_url, incremental=True, stop_after=2)
+
+    output = capfd.readouterr().out
+    assert "2 pages in a row without new or changed listings" in output
+    assert "Scraping page 4" not in output
+    assert len(mock_collection.bulk_write.call_args.args[0]) == 1
+
+
+# -------------------------- Price History Tests --------------------------
+
+def test_property_writer_records_only_price_changes() -> None:
+    """History points are written for new listings and price changes, not for unchanged prices."""
+    from scraper_mongodb.properties_mongo_db import PropertyWriter
+
+    mock_collection = MagicMock()
+    mock_history = MagicMock()
+    mock_collection.bulk_write.return_value = _fake_bulk_result(1, 2, 1)
+    mock_collection.find.return_value = [
+        {"url": "/same", "price": 100.0, "price_per_m2": 10},
+        {"url": "/drop", "price": 200.0, "price_per_m2": 20},
+    ]
+
+    with PropertyWriter(mock_collection, history_collection=mock_history) as writer:
+        writer.add({"url": "/same", "city": "Vilnius", "district": "A", "price": 100.0, "price_per_m2": 10})
+        writer.add({"url": "/drop", "city": "Vilnius", "district": "A", "price": 180.0, "price_per_m2": 18})
+        writer.add({"url": "/new", "city": "Kaunas", "district": "B", "price": 50.0, "price_per_m2": 5})
+
+    # One lookup of the stored prices for the whole batch
+    mock_collection.find.assert_called_once()
+    points = mock_history.insert_many.call_args.args[0]
+    assert [point["meta"]["url"] for point in points] == ["/drop", "/new"]
+    assert points[0]["price"] == 180.0
+    assert points[1]["meta"] == {"url": "/new", "city": "Kaunas", "district": "B"}
+    assert writer.totals["price_changes"] == 2
+
+    update = mock_collection.bulk_write.call_args.args[0][0]._doc
+    assert "last_seen" in update["$set"]
+    assert "first_seen" in update["$setOnInsert"]
+
+
+def test_property_writer_refreshes_last_seen_of_unchanged_listings() -> None:
+    """Skipped unchanged listings only get their last_seen bumped, in one update_many."""
+    from scraper_mongodb.properties_mongo_db import PropertyWriter, content_hash
+
+    listing = {"url": "/a", "price": 100.0, "price_per_m2": 10, "size_m2": 10.0, "number_of_rooms": 1}
+    mock_collection = MagicMock()
+    mock_history = MagicMock()
+
+    with PropertyWriter(mock_collection, known_hashes={"/a": content_hash(listing)},
+                        history_collection=mock_history) as writer:
+        writer.add(listing)
+
+    mock_collection.update_many.assert_called_once()
+    assert mock_collection.update_many.call_args.args[0] == {"url": {"$in": ["/a"]}}
+    mock_collection.bulk_write.assert_not_called()
+    mock_history.insert_many.assert_not_called()
+
+
+def test_save_property_only_upserts_and_records_price() -> None:
+    """A single save stores the listing and its price point and marks the stats stale, nothing more."""
+    import scraper_mongodb.properties_mongo_db as db
+
+    mock_collection = MagicMock()
+    mock_collection.find_one.return_value = {"price": 100.0, "price_per_m2": 10}
+    mock_history = mock_collection.database.__getitem__.return_value
+    listing = {"url": "/a", "city": "Vilnius", "district": "A", "price": 90.0, "price_per_m2": 9}
+
+    with patch.object(db, "get_collection", return_value=mock_collection), \
+            patch.object(db, "refresh_market_stats") as mock_refresh, \
+            patch.object(db, "bump_crawl_version") as mock_bump, \
+            patch.object(db, "mark_properties_written") as mock_mark:
+        db.save_property(listing)
+        mock_collection.find_one.return_value = {"price": 90.0, "price_per_m2": 9}
+        db.save_property(listing)
+
+    assert mock_collection.bulk_write.call_count == 2
+    mock_history.insert_one.assert_called_once()
+    assert mock_history.insert_one.call_args.args[0]["price"] == 90.0
+    mock_refresh.assert_not_called()
+    mock_bump.assert_not_called()
+    assert mock_mark.call_count == 2
+    assert mock_mark.call_args.args[0] is mock_collection.database
+
+
+# -------------------------- Market Stats Tests --------------------------
+
+def test_property_writer_refreshes_stats_of_touched_groups() -> None:
+    """On close the cube is refreshed for the new group of each listing and the group it left."""
+    from scraper_mongodb import properties_mongo_db
+
+    mock_collection = MagicMock()
+    mock_collection.bulk_write.return_value = _fake_bulk_result(0, 1, 1)
+    mock_collection.find.return_value = [
+        {"url": "/a", "city": "Vilnius", "district": "A", "number_of_rooms": 2, "price": 1.0}
+    ]
+
+    with patch.object(properties_mongo_db, "refresh_market_stats") as refresh:
+        with properties_mongo_db.PropertyWriter(mock_collection, history_collection=MagicMock()) as writer:
+            writer.add({"url": "/a", "city": "Vilnius", "district": "A", "number_of_rooms": 3, "price": 1.0})
+
+    refresh.assert_called_once()
+    assert refresh.call_args.args[1] == {("apartments", "Vilnius", "A", 2), ("apartments", "Vilnius", "A", 3)}
+    # The crawl version stamp is bumped once the crawl's writes are done
+    meta_update = mock_collection.database.__getitem__.return_value.find_one_and_update
+    assert meta_update.call_args.args[1]["$inc"] == {"version": 1}
+
+
+def test_refresh_market_stats_only_reads_touched_groups() -> None:
+    """Every level/metric pipeline is scoped to the touched groups and ends with a $merge."""
+    from scraper_mongodb.market_stats import refresh_market_stats, stats_cube_format, stats_levels, stats_metrics
+
+    mock_properties = MagicMock()
+    meta = mock_properties.database.__getitem__.return_value
+    meta.find_one.return_value = {"_id": "market_stats", "format": stats_cube_format}
+
+    refresh_market_stats(mock_properties, [("apartments", "Vilnius", "A", 2)])
+
+    pipelines = [call.args[0] for call in mock_properties.aggregate.call_args_list]
+    assert len(pipelines) == len(stats_levels) * len(stats_metrics)
+    assert all(pipeline[-1]["$merge"]["into"] == "market_stats" for pipeline in pipelines)
+    # Listings stored before categories existed belong to the apartment groups
+    apartments = {"category": {"$in": ["apartments", None]}}
+    first_match = pipelines[0][0]["$match"]
+    assert first_match["$or"] == [{**apartments, "city": "Vilnius", "district": "A", "number_of_rooms": 2}]
+    assert pipelines[-1][0]["$match"]["$or"] == [{**apartments, "city": "Vilnius"}]
+
+    # A cube built without categories is rebuilt from all listings
+    meta.find_one.return_value = {"_id": "market_stats"}
+    mock_properties.aggregate.reset_mock()
+    refresh_market_stats(mock_properties, [("apartments", "Vilnius", "A", 2)])
+    assert "$or" not in mock_properties.aggregate.call_args_list[0].args[0][0]["$match"]
+
+
+def test_refresh_market_stats_rebuilds_categories_above_the_group_threshold() -> None:
+    """Past `stats_full_refresh_groups` the $match holds one branch per category, not per group."""
+    from scraper_mongodb import market_stats
+
+    mock_properties = MagicMock()
+    meta = mock_properties.database.__getitem__.return_value
+    meta.find_one.return_value = {"_id": "market_stats", "format": market_stats.stats_cube_format}
+    groups = [("apartments", "Vilnius", "A", 2), ("apartments", "Kaunas", "B", 3), ("houses", "Vilnius", "C", 4)]
+
+    with patch.object(market_stats, "stats_full_refresh_groups", 2):
+        market_stats.refresh_market_stats(mock_properties, groups)
+
+    for call in mock_properties.aggregate.call_args_list:
+        branches = call.args[0][0]["$match"]["$or"]
+        assert sorted(branches, key=str) == sorted(
+            [{"category": {"$in": ["apartments", None]}}, {"category": "houses"}], key=str
+        )
+    stale_rows = mock_properties.database.__getitem__.return_value.delete_many.call_args.args[0]
+    assert len(stale_rows["$or"]) == 2
+
+
+# -------------------------- Connection Setup Tests --------------------------
+
+def test_import_does_not_connect() -> None:
+    """Importing the storage module creates no client; `get_db` creates one client per settings."""
+    from scraper_mongodb import properties_mongo_db
+
+    with patch("pymongo.MongoClient") as client_cls:
+        importlib.reload(properties_mongo_db)
+        client_cls.assert_not_called()
+
+        with patch.dict(properties_mongo_db._clients, clear=True):
+            properties_mongo_db.get_db("mongodb://example:27017/")
+            properties_mongo_db.get_db("mongodb://example:27017/")
+            client_cls.assert_called_once()
+            assert client_cls.call_args.kwargs["maxPoolSize"] == properties_mongo_db.mongo_settings()["max_pool_size"]
+
+            properties_mongo_db.get_db("mongodb://example:27017/", maxPoolSize=5)
+            assert client_cls.call_count == 2
+
+    importlib.reload(properties_mongo_db)
+
+
+def test_ensure_schema_runs_once_per_database() -> None:
+    """Validators and indexes are applied on the first call only."""
+    from scraper_mongodb import properties_mongo_db
+
+    mock_db = MagicMock()
+    mock_db.name = "aruodas_test"
+    mock_db.list_collection_names.return_value = ["properties"]
+
+    with patch.object(properties_mongo_db, "_schema_applied", set()), \
+         patch.object(properties_mongo_db, "ensure_indexes") as ensure_indexes:
+        properties_mongo_db.ensure_schema(mock_db)
+        properties_mongo_db.ensure_schema(mock_db)
+
+    mock_db.list_collection_names.assert_called_once()
+    mock_db.command.assert_called_once()
+    assert mock_db.command.call_args.args[:2] == ("collMod", "properties")
+    created = [call.args[0] for call in mock_db.create_collection.call_args_list]
+    assert created == ["saved_searches", "price_history"]
+    assert ensure_indexes.call_count == 2
+
+
+# -------------------------- Connection Settings Tests --------------------------
+
+def test_mongo_settings_precedence(tmp_path) -> None:
+    """Environment variables override the settings file, which overrides the defaults."""
+    from scraper_mongodb.mongo_settings import client_options, database_uri, default_settings, load_mongo_settings
+
+    settings_file = tmp_path / "mongo.json"
+    settings_file.write_text('{"max_pool_size": 20, "read_preference": "secondaryPreferred"}')
+    settings = load_mongo_settings({
+        "MONGO_SETTINGS_FILE": str(settings_file),
+        "MONGO_MAX_POOL_SIZE": "80",
+        "MONGO_WRITE_CONCERN": "majority",
+    })
+
+    assert settings["max_pool_size"] == 80
+    assert settings["read_preference"] == "secondaryPreferred"
+    assert settings["write_concern"] == "majority"
+    assert settings["socket_timeout_ms"] == default_settings["socket_timeout_ms"]
+
+    options = client_options(settings)
+    assert (options["maxPoolSize"], options["readPreference"], options["w"]) == (80, "secondaryPreferred", "majority")
+    assert database_uri(settings) == "mongodb://localhost:27017/aruodas_apartments"
+    assert database_uri({"uri": "mongodb://db:27017/other?replicaSet=rs0", "database": "x"}).endswith("/other?replicaSet=rs0")
+
+
+def test_pool_stats_listener_counts_checkouts() -> None:
+    """Checkouts, check-ins and failures update the pool counters."""
+    from scraper_mongodb.mongo_settings import PoolStatsListener
+
+    listener = PoolStatsListener()
+    event = MagicMock(reason="timeout")
+    listener.connection_created(event)
+    listener.connection_check_out_started(event)
+    listener.connection_checked_out(event)
+    listener.connection_check_out_started(event)
+    listener.connection_check_out_failed(event)
+
+    stats = listener.stats()
+    assert (stats["open_connections"], stats["in_use"], stats["checkouts"]) == (1, 1, 1)
+    assert stats["checkout_failures"] == {"timeout": 1}
+
+    listener.connection_checked_in(event)
+    assert listener.stats()["in_use"] == 0
+    assert listener.stats()["max_in_use"] == 1
+
+
+# -------------------------- Parquet Export Tests --------------------------
+
+def test_parquet_export_is_typed_partitioned_and_incremental(tmp_path) -> None:
+    """Listings are written per city and scrape date with validator types; reruns use the watermark."""
+    from datetime import datetime
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from scraper_mongodb.parquet_export import export_properties, read_export_state, read_properties
+
+    def listing(url: str, city: str, price: float, day: int) -> dict:
+        return {"url": url, "city": city, "district": "A", "street": "S", "price": price,
+                "price_per_m2": 1000, "number_of_rooms": 2, "size_m2": 50.0, "last_seen": datetime(2026, 1, day)}
+
+    collection = MagicMock()
+    collection.find.return_value = iter([listing("/1", "Vilnius", 100.0, 1), listing("/2", "Kaunas", 200.0, 1)])
+    totals = export_properties(collection, str(tmp_path), batch_size=1)
+
+    assert (totals["rows"], totals["batches"]) == (2, 2)
+    assert collection.find.call_args.args[0] == {}
+    files = list(tmp_path.glob("city=Vilnius/scrape_date=2026-01-01/*.parquet"))
+    assert len(files) == 1
+    schema = pq.read_schema(files[0])
+    assert schema.field("price").type == pa.float64()
+    assert schema.field("number_of_rooms").type == pa.int32()
+    assert "city" not in schema.names
+
+    # The second run only asks for listings written since the first one
+    collection.find.return_value = iter([listing("/1", "Vilnius", 90.0, 2)])
+    export_properties(collection, str(tmp_path))
+    assert collection.find.call_args.args[0] == {"last_seen": {"$gte": datetime(2026, 1, 1)}}
+    assert read_export_state(str(tmp_path))["watermark"] == datetime(2026, 1, 2)
+
+    df = read_properties(str(tmp_path), ["url", "price"])
+    assert sorted(zip(df["url"], df["price"])) == [("/1", 90.0), ("/2", 200.0)]
+    assert len(read_properties(str(tmp_path), ["price"], city="Vilnius", latest_only=False)) == 2
+
+
+# -------------------------- Listing Snapshot Tests --------------------------
+
+def _snapshot_listings() -> list:
+    """Listings over three cities with odd/even group sizes and missing values."""
+    listings = [
+        {"city": f"City{c}", "district": f"D{i % 2}", "price": float(1000 * c + 7 * i * i),
+         "size_m2": 20.0 + c + i / 2, "price_per_m2": 100 * c + i, "number_of_rooms": 1 + i % 3}
+        for c in range(1, 4) for i in range(c + 4)
+    ]
+    listings.append({"city": "City1", "district": "D0", "price": None, "size_m2": 30.0})
+    return listings
+
+
+def test_listing_snapshot_quantiles_match_pandas(tmp_path) -> None:
+    """City and district quantiles from the memory-mapped arrays equal pandas' quantiles."""
+    import numpy as np
+    import pandas as pd
+    from scraper_mongodb.listing_snapshot import ListingSnapshot, write_snapshot
+
+    collection = MagicMock()
+    collection.find.return_value = _snapshot_listings()
+    snapshot = ListingSnapshot(write_snapshot(collection, str(tmp_path), version=7))
+    df = pd.DataFrame(_snapshot_listings())
+
+    assert snapshot.version == 7
+    assert isinstance(snapshot.array("price"), np.memmap)
+
+    for metric in ("price", "number_of_rooms"):
+        expected = df.groupby("city")[metric].quantile([0.1, 0.5, 0.9]).unstack()
+        actual = snapshot.city_quantiles(metric, [0.1, 0.5, 0.9])
+        for city, row in expected.iterrows():
+            assert actual[city] == pytest.approx(list(row))
+
+    expected = df[df["city"] == "City2"].groupby("district")["price"].median()
+    actual = snapshot.district_quantiles("price", [0.5], city="City2")
+    assert {district: values[0] for (_, district), values in actual.items()} == pytest.approx(expected.to_dict())
+
+    medians = snapshot.medians_by_city("price", limit=1)
+    assert [row["city"] for row in medians] == ["City3", "City1"]
+    assert sum(snapshot.histogram("size_m2", bins=5)["counts"]) == len(df)
+
+
+def test_load_snapshot_follows_new_versions(tmp_path) -> None:
+    """Readers switch to the newest snapshot and only the last versions stay on disk."""
+    from scraper_mongodb.listing_snapshot import load_snapshot, snapshot_versions_kept, write_snapshot
+
+    collection = MagicMock()
+    collection.find.return_value = _snapshot_listings()
+    assert load_snapshot(str(tmp_path), check_interval=0) is None
+
+    for version in range(1, 4):
+        write_snapshot(collection, str(tmp_path), version)
+        assert load_snapshot(str(tmp_path), check_interval=0).version == version
+
+    versions = [entry for entry in os.listdir(tmp_path) if entry.startswith("v")]
+    assert len(versions) == snapshot_versions_kept
+
+
+def test_property_writer_writes_snapshot_after_crawl(tmp_path) -> None:
+    """
+    Closing a writer that wrote apartments writes their snapshot to the shared directory;
+    other categories leave it alone, and a snapshot that cannot be built does not fail the crawl.
+    """
+    from scraper_mongodb.mongo_settings import mongo_settings
+    from scraper_mongodb.properties_mongo_db import PropertyWriter
+
+    mock_collection = MagicMock()
+    mock_collection.bulk_write.return_value = _fake_bulk_result(1, 0, 0)
+    mock_collection.find.return_value = []
+    mock_collection.database.__getitem__.return_value.find_one_and_update.return_value = {"version": 4}
+
+    def crawl(listing: dict) -> None:
+        with PropertyWriter(mock_collection, history_collection=MagicMock(), refresh_stats=False,
+                            match_alerts=False) as writer:
+            writer.add(listing)
+
+    with patch.dict(mongo_settings(), {"snapshot_dir": str(tmp_path)}), \
+         patch("scraper_mongodb.listing_snapshot.write_snapshot") as write_snapshot:
+        crawl({"url": "/a", "city": "Vilnius", "price": 1.0})
+        write_snapshot.assert_called_once_with(mock_collection, str(tmp_path), 4, "apartments")
+
+        crawl({"url": "/h", "city": "Vilnius", "price": 1.0, "category": "houses"})
+        assert write_snapshot.call_count == 1
+
+        write_snapshot.side_effect = ValueError("cannot build snapshot")
+        crawl({"url": "/b", "city": "Vilnius", "price": 1.0, "category": "apartments"})
+        assert write_snapshot.call_count == 2
+
+
+# -------------------------- Saved Search Alert Tests --------------------------
+
+def test_compile_query_ranges_and_buckets() -> None:
+    """Form queries become a city/district bucket and closed ranges; other shapes are rejected."""
+    import math
+    from scraper_mongodb.alerts import UnsupportedQuery, compile_query
+
+    key, ranges = compile_query({"city": "Vilnius", "price": {"$gte": "100", "$lt": 200},
+                                 "number_of_rooms": 2})
+    assert key == ("apartments", "Vilnius", None)
+    assert ranges[0] == (100.0, math.nextafter(200.0, -math.inf))
+    assert ranges[1] == (-math.inf, math.inf)
+    assert ranges[3] == (2.0, 2.0)
+    assert compile_query({"category": {"$in": ["apartments", None]}})[0] == ("apartments", None, None)
+    assert compile_query({"category": "houses", "district": "A"})[0] == ("houses", None, "A")
+
+    for query in ({"filter": {"city": "Vilnius"}}, {"price": {"$in": [1, 2]}}, {"price": "cheap"},
+                  {"category": {"$ne": "plots"}}):
+        with pytest.raises(UnsupportedQuery):
+            compile_query(query)
+
+
+def test_saved_search_index_matches_like_per_query_evaluation() -> None:
+    """The bucketed interval index finds exactly the searches a per-query check would."""
+    import random
+    from scraper_mongodb.alerts import SavedSearchIndex
+
+    rng = random.Random(3)
+    cities = {"Vilnius": ["A", "B"], "Kaunas": ["C"]}
+    searches = []
+    for i in range(400):
+        query: dict = {}
+        if rng.random() < 0.8:
+            query["city"] = rng.choice(list(cities))
+            if rng.random() < 0.5:
+                query["district"] = rng.choice(cities[query["city"]])
+        if rng.random() < 0.9:
+            low = rng.randint(0, 20) * 10
+            query["price"] = {"$gte": low, "$lte": low + rng.randint(0, 80)}
+        if rng.random() < 0.3:
+            query["number_of_rooms"] = rng.randint(1, 3)
+        if rng.random() < 0.3:
+            query["size_m2"] = {"$gt": rng.randint(20, 60)}
+        searches.append({"_id": i, "user_id": "u", "query": query})
+    searches.append({"_id": "legacy", "user_id": "u", "query": {"filter": {"city": "Vilnius"}}})
+
+    def matches(listing: dict, query: dict) -> bool:
+        for field, condition in query.items():
+            value = listing.get(field)
+            if not isinstance(condition, dict):
+                if value != condition:
+                    return False
+            elif value is None or not (condition.get("$gte", -1e18) <= value <= condition.get("$lte", 1e18)
+                                       and value > condition.get("$gt", -1e18)):
+                return False
+        return True
+
+    index = SavedSearchIndex(searches)
+    assert (len(index), index.unsupported) == (400, 1)
+    for _ in range(200):
+        city = rng.choice(list(cities))
+        listing = {"city": city, "district": rng.choice(cities[city]), "price": float(rng.randint(0, 300)),
+                   "number_of_rooms": rng.randint(1, 3),
+                   "size_m2": rng.choice([None, float(rng.randint(20, 70))])}
+        expected = {search["_id"] for search in searches[:-1] if matches(listing, search["query"])}
+        assert {search["_id"] for search in index.match(listing)} == expected
+
+
+def test_saved_search_index_matches_within_the_category() -> None:
+    """Searches without a category only see apartments; a category search only sees its own listings."""
+    from scraper_mongodb.alerts import SavedSearchIndex
+
+    index = SavedSearchIndex([
+        {"_id": "flats", "user_id": "u", "query": {"city": "Vilnius", "price": {"$lte": 100}}},
+        {"_id": "houses", "user_id": "u", "query": {"category": "houses", "city": "Vilnius"}},
+    ])
+
+    def matched(listing: dict) -> list:
+        return [search["_id"] for search in index.match({"city": "Vilnius", "price": 90.0, **listing})]
+
+    assert matched({}) == ["flats"]
+    assert matched({"category": "apartments"}) == ["flats"]
+    assert matched({"category": "houses"}) == ["houses"]
+    assert matched({"category": "plots"}) == []
+
+
+def test_match_saved_searches_writes_feed() -> None:
+    """Each (saved search, listing) hit becomes an unseen feed entry upserted by search and URL."""
+    from scraper_mongodb.alerts import match_saved_searches
+
+    db = MagicMock()
+    db.__getitem__.return_value.find.return_value = [
+        {"_id": "s1", "user_id": "u1", "name": "cheap", "query": {"city": "Vilnius", "price": {"$lte": 100}}},
+        {"_id": "s2", "user_id": "u2", "name": "Kaunas", "query": {"city": "Kaunas"}},
+    ]
+    listings = [{"url": "/a", "city": "Vilnius", "price": 90.0}, {"url": "/b", "city": "Vilnius", "price": 150.0}]
+
+    totals = match_saved_searches(db, listings)
+
+    assert totals == {"searches": 2, "unsupported": 0, "listings": 2, "matches": 1}
+    operation = db.__getitem__.return_value.bulk_write.call_args.args[0][0]
+    assert operation._filter == {"search_id": "s1", "url": "/a"}
+    assert operation._doc["$set"]["user_id"] == "u1"
+    assert operation._doc["$set"]["seen"] is False
+
+
+def test_property_writer_matches_only_changed_listings() -> None:
+    """On close, new listings and listings whose content changed are matched; unchanged rewrites are not."""
+    from scraper_mongodb.properties_mongo_db import PropertyWriter
+
+    mock_collection = MagicMock()
+    mock_collection.bulk_write.return_value = _fake_bulk_result(1, 2, 1)
+    mock_collection.find.return_value = [
+        {"url": "/same", "price": 100.0, "price_per_m2": 10, "size_m2": 10.0, "number_of_rooms": 1},
+        {"url": "/drop", "price": 200.0, "price_per_m2": 20, "size_m2": 10.0, "number_of_rooms": 1},
+    ]
+
+    with patch("scraper_mongodb.alerts.match_saved_searches") as match:
+        with PropertyWriter(mock_collection, history_collection=MagicMock(), refresh_stats=False) as writer:
+            for url, price, price_per_m2 in (("/same", 100.0, 10), ("/drop", 180.0, 18), ("/new", 50.0, 5)):
+                writer.add({"url": url, "price": price, "price_per_m2": price_per_m2,
+                            "size_m2": 10.0, "number_of_rooms": 1, "description": "x" * 1000})
+
+    match.assert_called_once()
+    assert [listing["url"] for listing in match.call_args.args[1]] == ["/drop", "/new"]
+    # Only the feed fields are kept until close
+    assert "description" not in match.call_args.args[1][0]
+
+
+# -------------------------- Crawl Checkpoint Tests --------------------------
+
+def test_crawl_checkpoint_completes_pages_only_after_flush(tmp_path) -> None:
+    """Pages count as completed once the writer flushed them; resume drops in-flight and pending pages."""
+    from scraper_mongodb.crawl_runs import FAILED, CrawlCheckpoint, FileCheckpointStore
+
+    store = FileCheckpointStore(str(tmp_path / "crawl.json"))
+    checkpoint = CrawlCheckpoint.start(store, "https://example.lt/butai/", "parallel")
+    for page in (1, 2, 3, 5):
+        checkpoint.page_started(page)
+    for page in (1, 3, 5):
+        checkpoint.page_done(page, listings=20)
+    assert checkpoint.next_page == 1
+
+    checkpoint.committed()
+    checkpoint.page_done(2, listings=20)
+    assert (checkpoint.next_page, checkpoint.completed_pages) == (2, {3, 5})
+    checkpoint.page_started(6)
+    checkpoint.finish(FAILED, stopped_at=6)
+
+    saved = store.load_unfinished("https://example.lt/butai/")
+    assert (saved["pending_pages"], saved["in_flight_pages"], saved["listings"]) == ([2], [6], 80)
+
+    resumed = CrawlCheckpoint.resume(store, "https://example.lt/butai/", "sequential")
+    assert resumed.state["_id"] == checkpoint.state["_id"]
+    assert resumed.state["started_at"] == checkpoint.state["started_at"]
+    assert (resumed.next_page, resumed.completed_pages) == (2, {3, 5})
+    assert resumed.state["in_flight_pages"] == [] and resumed.state["resumes"] == 1
+
+
+def test_incomplete_checkpoint_store_fails_when_created() -> None:
+    """A store missing `save` or `load_unfinished` is rejected before any crawl uses it."""
+    from scraper_mongodb.crawl_runs import CheckpointStore
+
+    class SaveOnly(CheckpointStore):
+        def save(self, state: dict) -> None:
+            pass
+
+    with pytest.raises(TypeError):
+        SaveOnly()
+
+
+def test_page_range_skips_completed_pages_and_tracks_failures() -> None:
+    """Completed pages are not handed out again; an empty page before a failed one ends the crawl normally."""
+    from scraper_mongodb.crawl_pages import PageRange
+
+    pages = PageRange(2, skip={3, 5})
+    assert [pages.claim(), pages.claim(), pages.claim()] == [2, 4, 6]
+    pages.fail_at(7)
+    assert pages.stopped_by_failure
+    pages.stop_at(6)
+    assert not pages.stopped_by_failure and pages.claim() is None
+
+
+def test_scrape_resumes_after_failed_page(scraper_module: ModuleType, listing_server: tuple, tmp_path) -> None:
+    """A crawl stopped by a page that failed to load is resumed from that page and then finishes."""
+    from scraper_mongodb.crawl_runs import FAILED, FINISHED, CrawlCheckpoint, FileCheckpointStore
+    from scraper_mongodb.properties_mongo_db import PropertyWriter
+
+    base_url, stats = listing_server
+    store = FileCheckpointStore(str(tmp_path / "crawl.json"))
+    mock_collection = MagicMock()
+    mock_collection.bulk_write.return_value = _fake_bulk_result(1, 0, 0)
+    fetched = []
+
+    def fetch_recorder(fetcher_cls):
+        original = fetcher_cls.fetch
+
+        def fetch(self, url: str) -> str:
+            fetched.append(int(url.rstrip("/").rsplit("/", 1)[-1]))
+            return original(self, url)
+        return fetch
+
+    from scraper_mongodb.fetchers import RequestsFetcher
+
+    with patch("scraper_mongodb.aruodas_scraper.PropertyWriter",
+               side_effect=lambda **kwargs: PropertyWriter(mock_collection, match_alerts=False, **kwargs)), \
+         patch.object(RequestsFetcher, "fetch", fetch_recorder(RequestsFetcher)):
+        stats["fail_once"][2] = 403
+        checkpoint = CrawlCheckpoint.start(store, base_url, "sequential")
+        scraper_module.scrape_aruodas(backend="requests", base_url=base_url, checkpoint=checkpoint)
+        first_run = store.load_unfinished(base_url)
+        assert (first_run["status"], first_run["stopped_at"], first_run["last_completed_page"]) == (FAILED, 2, 1)
+
+        fetched.clear()
+        resumed = CrawlCheckpoint.resume(store, base_url, "sequential")
+        scraper_module.scrape_aruodas(backend="requests", base_url=base_url, checkpoint=resumed)
+
+    assert fetched == [2, 3, 4]
+    assert resumed.state["status"] == FINISHED and resumed.state["last_completed_page"] == 3
+    assert store.load_unfinished(base_url) is None
+
+
+def test_selenium_crawl_finishes_at_the_empty_page(scraper_module: ModuleType, tmp_path) -> None:
+    """The page after the last one loads without rows; the crawl ends there as finished, not failed."""
+    from scraper_mongodb.crawl_runs import FINISHED, CrawlCheckpoint, FileCheckpointStore
+
+    factory, drivers = _fake_chrome_factory(last_page=2, timeouts={})
+    store = FileCheckpointStore(str(tmp_path / "crawl.json"))
+    checkpoint = CrawlCheckpoint.start(store, "https://www.aruodas.lt/butai/", "sequential")
+    with patch("scraper_mongodb.aruodas_scraper.PropertyWriter") as mock_writer_cls, \
+         patch("scraper_mongodb.fetchers.webdriver.Chrome", side_effect=factory), \
+         patch("scraper_mongodb.fetchers.WebDriverWait", _RowWait):
+        scraper_module.scrape_aruodas(backend="selenium", checkpoint=checkpoint)
+
+    assert mock_writer_cls.return_value.add.call_count == 2
+    assert [call.args[0] for call in drivers[0].get.call_args_list][-1].endswith("puslapis/3/")
+    assert checkpoint.state["status"] == FINISHED and checkpoint.state["stopped_at"] is None
+    assert store.load_unfinished("https://www.aruodas.lt/butai/") is None
+
+
+# -------------------------- Detail Enrichment Tests --------------------------
+
+DETAIL_HTML = """
+<html><body>
+<dl class="obj-details">
+    <dt>Plotas:</dt><dd>50 m²</dd>
+    <dt>Aukštas:</dt><dd>3</dd>
+    <dt>Aukštų sk.:</dt><dd>5</dd>
+    <dt>Statybos metai:</dt><dd>1975 m., renovuotas 2012</dd>
+    <dt>Šildymas:</dt><dd> Centrinis
+        kolektorinis </dd>
+</dl>
+<div class="map" data-lat="54.6872" data-lng="25.2797"></div>
+</body></html>
+"""
+
+
+@pytest.fixture
+def detail_server():
+    """
+    Serve `DETAIL_HTML` at /detail/<n>/, honouring If-None-Match with a 304 when the page has an
+    ETag (pages under /no-etag/ send none). Yields the base URL and a list of (path, status).
+    """
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    requests_seen = []
+
+    class DetailHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            etag = None if self.path.startswith("/no-etag/") else '"v1"'
+            if etag is not None and self.headers.get("If-None-Match") == etag:
+                requests_seen.append((self.path, 304))
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            body = DETAIL_HTML.encode("utf-8")
+            requests_seen.append((self.path, 200))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            if etag is not None:
+                self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DetailHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/", requests_seen
+    server.shutdown()
+
+
+def test_parse_detail_page_fields() -> None:
+    """Floor, floors, build year, heating and coordinates are read from the details table and map."""
+    from scraper_mongodb.parser import parse_detail_page
+
+    assert parse_detail_page(DETAIL_HTML) == {
+        "floor": 3, "floors_total": 5, "build_year": 1975, "heating": "Centrinis kolektorinis",
+        "latitude": 54.6872, "longitude": 25.2797,
+    }
+    assert parse_detail_page("<html><body><a href='https://maps.google.com/?q=54.9,23.9'>map</a></body></html>") \
+        == {"latitude": 54.9, "longitude": 23.9}
+    assert parse_detail_page("") == {}
+
+
+def test_fetch_details_revalidates_instead_of_downloading(detail_server: tuple, tmp_path) -> None:
+    """A cached page with an ETag is revalidated (304, not parsed); without one, an identical body is not parsed."""
+    from scraper_mongodb.enrichment import DetailCache, _create_session, fetch_details
+
+    base_url, requests_seen = detail_server
+    cache = DetailCache(str(tmp_path))
+    session = _create_session()
+
+    with patch("scraper_mongodb.enrichment.parse_detail_page", wraps=__import__(
+            "scraper_mongodb.parser", fromlist=["parse_detail_page"]).parse_detail_page) as parse:
+        first = fetch_details(session, cache, f"{base_url}detail/1/")
+        second = fetch_details(session, cache, f"{base_url}detail/1/")
+        fetch_details(session, cache, f"{base_url}no-etag/1/")
+        third = fetch_details(session, cache, f"{base_url}no-etag/1/")
+
+    assert (first["source"], second["source"], third["source"]) == ("parsed", "not_modified", "unchanged")
+    assert second["fields"] == first["fields"] and first["fields"]["build_year"] == 1975
+    assert parse.call_count == 2
+    assert requests_seen[:2] == [("/detail/1/", 200), ("/detail/1/", 304)]
+    session.close()
+
+
+def test_detail_enricher_writes_fields_in_bulk(detail_server: tuple, tmp_path) -> None:
+    """Queued listings are enriched by the pool and written back in batches of updates by URL."""
+    from scraper_mongodb.enrichment import DetailEnricher
+
+    base_url, _ = detail_server
+    collection = MagicMock()
+    collection.bulk_write.return_value = _fake_bulk_result(0, 2, 2)
+
+    with DetailEnricher(collection, cache_dir=str(tmp_path), workers=2, batch_size=2, base_url=base_url) as enricher:
+        for number in range(3):
+            enricher.submit(f"/detail/{number}/")
+
+    assert enricher.totals["parsed"] == 3
+    operations = [operation for call in collection.bulk_write.call_args_list for operation in call.args[0]]
+    assert sorted(operation._filter["url"] for operation in operations) == [f"/detail/{n}/" for n in range(3)]
+    assert operations[0]._doc["$set"]["floor"] == 3 and "enriched_at" in operations[0]._doc["$set"]
+    assert collection.bulk_write.call_count == 2
+
+
+def test_detail_enricher_takes_a_token_per_request(detail_server: tuple, tmp_path) -> None:
+    """Every detail request, conditional ones included, waits for the crawl's shared rate limit."""
+    from scraper_mongodb.enrichment import DetailEnricher
+
+    base_url, requests_seen = detail_server
+    rate_limit = MagicMock()
+    del requests_seen[:]
+
+    for _ in range(2):
+        with DetailEnricher(MagicMock(), cache_dir=str(tmp_path), workers=2, base_url=base_url,
+                            rate_limit=rate_limit) as enricher:
+            for number in range(3):
+                enricher.submit(f"/detail/{number}/")
+
+    assert [status for _, status in requests_seen].count(304) == 3
+    assert rate_limit.acquire.call_count == len(requests_seen) == 6
+
+
+def test_detail_enricher_survives_parse_and_write_errors(detail_server: tuple, tmp_path) -> None:
+    """Parse and write errors are counted or reported without stopping the workers."""
+    from pymongo.errors import AutoReconnect
+    from scraper_mongodb.enrichment import DetailEnricher
+
+    base_url, _ = detail_server
+    collection = MagicMock()
+    collection.bulk_write.side_effect = AutoReconnect("connection lost")
+
+    with patch("scraper_mongodb.enrichment.parse_detail_page", side_effect=ValueError("bad page")):
+        # More URLs than the queue holds, so a dead worker would block submit
+        with DetailEnricher(collection, cache_dir=str(tmp_path), workers=1, queue_size=1,
+                            base_url=base_url) as enricher:
+            for number in range(3):
+                enricher.submit(f"/detail/{number}/")
+    assert enricher.totals["failed"] == 3
+
+    with DetailEnricher(collection, cache_dir=str(tmp_path / "fresh"), workers=1, queue_size=1, batch_size=1,
+                        base_url=base_url) as enricher:
+        for number in range(3):
+            enricher.submit(f"/detail/{number}/")
+    assert enricher.totals["parsed"] == 3
+    assert enricher.totals["written"] == 0
+
+
+def test_property_writer_submits_only_changed_listings_for_enrichment() -> None:
+    """Listings whose stored content is unchanged are not sent to the detail page stage."""
+    from scraper_mongodb.properties_mongo_db import PropertyWriter
+
+    mock_collection = MagicMock()
+    mock_collection.bulk_write.return_value = _fake_bulk_result(1, 1, 0)
+    mock_collection.find.return_value = [
+        {"url": "/same", "price": 100.0, "price_per_m2": 10, "size_m2": 10.0, "number_of_rooms": 1},
+    ]
+    enricher = MagicMock()
+
+    with PropertyWriter(mock_collection, history_collection=MagicMock(), refresh_stats=False,
+                        match_alerts=False, enricher=enricher) as writer:
+        for url in ("/same", "/new"):
+            writer.add({"url": url, "price": 100.0, "price_per_m2": 10, "size_m2": 10.0, "number_of_rooms": 1})
+
+    assert [call.args[0] for call in enricher.submit.call_args_list] == ["/new"]
+
+
+# -------------------------- Category Tests --------------------------
+
+HOUSE_HTML = """
+<div class="list-row-v2 object-row selhouse advert">
+    <div class="advert-flex">
+        <a href="/namas-1/"><img title="Vilnius, Pilaitė, Vydūno g." /></a>
+        <span class="list-item-price-v2">245 000 €</span>
+        <span class="price-pm-v2">1 750 €/m²</span>
+        <div class="list-RoomNum-v2 list-detail-v2">5</div>
+        <div class="list-AreaOverall-v2 list-detail-v2">140</div>
+        <div class="list-AreaLot-v2 list-detail-v2">6.5</div>
+    </div>
+    <div class="advert-flex">
+        <a href="/namas-2/"><img title="Kaunas, Romainiai" /></a>
+        <span class="list-item-price-v2">99 000 €</span>
+    </div>
+</div>
+"""
+
+PLOT_HTML = """
+<div class="list-row-v2 object-row sellot advert">
+    <div class="advert-flex">
+        <a href="/sklypas-1/"><img title="Trakų r. sav., Lentvaris" /></a>
+        <span class="list-item-price-v2">30 000 €</span>
+        <div class="list-AreaOverall-v2 list-detail-v2">12</div>
+    </div>
+    <div class="advert-flex">
+        <a href="/sklypas-2/"><img title="Trakų r. sav., Lentvaris" /></a>
+        <span class="list-item-price-v2">30 000 €</span>
+    </div>
+</div>
+"""
+
+
+def test_category_layouts_parse_their_own_fields() -> None:
+    """Each category reads its own fields; fields it does not show get the schema's defaults."""
+    from scraper_mongodb.categories import get_category
+
+    cards, houses = get_category("houses").parse(HOUSE_HTML)
+    assert cards == 2
+    assert houses == [
+        {"city": "Vilnius", "district": "Pilaitė", "street": "Vydūno g.", "price": 245000.0, "size_m2": 140.0,
+         "plot_area": 6.5, "price_per_m2": 1750, "number_of_rooms": 5, "url": "/namas-1/", "category": "houses"},
+        {"city": "Kaunas", "district": "Romainiai", "street": "N/A", "price": 99000.0, "size_m2": 0.0,
+         "price_per_m2": 0, "number_of_rooms": 0, "url": "/namas-2/", "category": "houses"},
+    ]
+
+    cards, plots = get_category("plots").parse(PLOT_HTML)
+    assert cards == 2
+    assert plots == [
+        {"city": "Trakų r. sav.", "district": "Lentvaris", "street": "N/A", "price": 30000.0, "plot_area": 12.0,
+         "size_m2": 0.0, "price_per_m2": 0, "number_of_rooms": 0, "url": "/sklypas-1/", "category": "plots"},
+    ]
+
+
+def test_category_registry_and_urls() -> None:
+    """Categories build their page URLs, filters and Selenium row selectors; unknown names are rejected."""
+    from scraper_mongodb.categories import DEFAULT_CATEGORY, categories, get_category
+
+    assert set(categories) == {"apartments", "apartments_rent", "houses", "plots", "commercial"}
+    houses = get_category("houses")
+    assert houses.page_url(3) == "https://www.aruodas.lt/namai/puslapis/3/"
+    assert houses.page_url(3, "http://localhost/mirror/") == "http://localhost/mirror/puslapis/3/"
+    assert houses.row_selector == "list-row-v2.object-row.selhouse.advert"
+    assert houses.stored_query() == {"category": "houses"}
+    # Listings stored before categories existed belong to the default category
+    assert get_category(DEFAULT_CATEGORY).stored_query() == {"category": {"$in": [DEFAULT_CATEGORY, None]}}
+
+    with pytest.raises(ValueError, match="Unknown category"):
+        get_category("castles")
+
+
+def test_auto_probe_looks_for_the_category_rows() -> None:
+    """The plain HTTP probe only accepts a page that has rows of the crawled category."""
+    from scraper_mongodb.categories import get_category
+    from scraper_mongodb.fetchers import _probe_fetcher
+
+    houses, plots = get_category("houses"), get_category("plots")
+    with patch("scraper_mongodb.fetchers.RequestsFetcher.fetch", return_value=HOUSE_HTML), \
+         patch("scraper_mongodb.fetchers.SeleniumFetcher") as mock_selenium:
+        assert _probe_fetcher("http://probe/", houses.row_selector, None).name == "requests"
+        assert _probe_fetcher("http://probe/", plots.row_selector, None) is mock_selenium.return_value
+
+    mock_selenium.assert_called_once_with(plots.row_selector)
+
+
+def test_rate_limit_is_shared_across_threads() -> None:
+    """Page loads from several threads together stay under the shared rate."""
+    import threading
+    import time
+    from scraper_mongodb.fetchers import RateLimit
+
+    rate_limit = RateLimit(rate=50.0, capacity=1)
+    started = time.monotonic()
+    threads = [threading.Thread(target=lambda: [rate_limit.acquire() for _ in range(3)]) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 9 tokens with one available at the start: at least 8 refills at 50 per second
+    assert time.monotonic() - started >= 8 / 50.0 * 0.9
+
+
+def test_crawl_categories_concurrently_into_one_collection(
+    scraper_module: ModuleType, listing_server: tuple, tmp_path
+) -> None:
+    """Every category is crawled to its end, its listings tagged with it, and each keeps its own checkpoint."""
+    from scraper_mongodb.categories import Category, get_category
+    from scraper_mongodb.crawl_runs import FINISHED, FileCheckpointStore
+    from scraper_mongodb.scheduler import crawl_categories
+
+    base_url, _ = listing_server
+    apartments = Category("apartments", base_url, "selflat", get_category("apartments").layout)
+    houses = Category("houses", base_url.replace("/butai/", "/namai/"), "selhouse", get_category("houses").layout)
+    store = FileCheckpointStore(str(tmp_path / "crawl.json"))
+
+    with patch("scraper_mongodb.aruodas_scraper.PropertyWriter") as mock_writer_cls:
+        statuses = crawl_categories([apartments, houses], rate=100.0, burst=2, backend="requests", store=store)
+
+    assert statuses == {"apartments": FINISHED, "houses": FINISHED}
+    added = [call.args[0] for call in mock_writer_cls.return_value.add.call_args_list]
+    assert sorted((listing["category"], listing["url"]) for listing in added) == sorted(
+        (name, f"/butas-{page}/") for name in ("apartments", "houses") for page in (1, 2, 3)
+    )
+    assert store.load_unfinished(apartments.base_url) is None
+    assert store.load_unfinished(houses.base_url) is None
+    assert set(store._read()) == {apartments.base_url, houses.base_url}
+
+
+def test_crawl_categories_share_the_rate_limit_with_detail_pages(listing_server: tuple, tmp_path) -> None:
+    """The enricher of every category takes its tokens from the same RateLimit as the page loads."""
+    from scraper_mongodb.categories import Category, get_category
+    from scraper_mongodb.crawl_runs import FileCheckpointStore
+    from scraper_mongodb.fetchers import RateLimit
+    from scraper_mongodb.scheduler import crawl_categories
+
+    base_url, _ = listing_server
+    apartments = Category("apartments", base_url, "selflat", get_category("apartments").layout)
+    houses = Category("houses", base_url.replace("/butai/", "/namai/"), "selhouse", get_category("houses").layout)
+
+    with patch("scraper_mongodb.aruodas_scraper.PropertyWriter"), \
+         patch("scraper_mongodb.scheduler.get_collection"), \
+         patch("scraper_mongodb.scheduler.DetailEnricher") as mock_enricher_cls:
+        crawl_categories([apartments, houses], rate=100.0, backend="requests", enrich=True,
+                         store=FileCheckpointStore(str(tmp_path / "crawl.json")))
+
+    limits = [call.kwargs["rate_limit"] for call in mock_enricher_cls.call_args_list]
+    assert len(limits) == 2 and isinstance(limits[0], RateLimit) and limits[0] is limits[1]
+
+
+def test_incremental_category_crawl_loads_only_its_known_listings(scraper_module: ModuleType) -> None:
+    """An incremental crawl of a category reads the hashes of that category's listings only."""
+    from scraper_mongodb.properties_mongo_db import load_known_hashes
+
+    mock_collection = MagicMock()
+    mock_collection.find.return_value = []
+    load_known_hashes(mock_collection, query={"category": "houses"})
+    assert mock_collection.find.call_args.args[0] == {"category": "houses"}
+
+    with patch("scraper_mongodb.aruodas_scraper.load_known_hashes", return_value={}) as mock_load, \
+         patch("scraper_mongodb.aruodas_scraper.create_fetcher") as mock_create_fetcher, \
+         patch("scraper_mongodb.aruodas_scraper.PropertyWriter"):
+        mock_create_fetcher.return_value.fetch.return_value = "<html></html>"
+        scraper_module.scrape_aruodas(backend="requests", incremental=True, category="plots")
+
+    mock_load.assert_called_once_with(query={"category": "plots"})
+    assert mock_create_fetcher.call_args.kwargs["row_selector"] == "list-row-v2.object-row.sellot.advert"
+    mock_create_fetcher.return_value.fetch.assert_called_once_with("https://www.aruodas.lt/sklypai/puslapis/1/")